@@ -0,0 +1,25 @@
+# --- START OF FILE backend/app/api/v1/endpoints/market_data.py ---
+from fastapi import APIRouter
+from typing import Dict, Any
+from app.services.data_cache import data_cache
+from app.services.eod_sync import eod_sync_job
+
+router = APIRouter()
+
+@router.get("/cache_stats")
+async def get_cache_stats_endpoint() -> Dict[str, Any]:
+    """数据缓存的命中/未命中计数和内存占用"""
+    return data_cache.stats()
+
+@router.get("/sync_status")
+async def get_sync_status_endpoint() -> Dict[str, Any]:
+    """收盘数据同步 (EOD sync) 的进度"""
+    checkpoint = eod_sync_job.load_checkpoint()
+    return {
+        "latest_trade_date": eod_sync_job.latest_committed_date(),
+        "committed_dates": len(checkpoint.get("committed_dates") or []),
+        "periods": sorted((checkpoint.get("periods") or {}).keys()),
+        "last_run_at": checkpoint.get("last_run_at"),
+        "is_fresh": eod_sync_job.is_fresh(),
+    }
+# --- END OF FILE backend/app/api/v1/endpoints/market_data.py ---
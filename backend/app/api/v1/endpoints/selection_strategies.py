@@ -1,9 +1,13 @@
 # --- START OF FILE backend/app/api/v1/endpoints/selection_strategies.py ---
 from fastapi import APIRouter, HTTPException, Body
+from fastapi.responses import StreamingResponse
 from typing import List, Dict, Any
+import asyncio
+import json
 from app.models.strategy import StrategyConfig, SelectionPoolRequest, SelectionPoolResponse
 from app.models.strategy import StrategyConfig, StrategyParam
 from app.services.strategy_service import StrategyService
+from app.services.pool_pagination import DEFAULT_PAGE_LIMIT, InvalidCursorError
 from datetime import datetime
 
 router = APIRouter()
@@ -32,6 +36,7 @@ PRESET_SELECTION_STRATEGIES = [
             StrategyParam(name="min_momentum_percent", label="最小动量阈值", value=5.0, type="number", min_value=-50, max_value=200, step=1, unit="%"),
             StrategyParam(name="roe_threshold_percent", label="ROE阈值", value=10.0, type="number", min_value=0, max_value=50, step=1, unit="%"),
             StrategyParam(name="max_pb_value", label="最大PB", value=2.5, type="number", min_value=0.1, max_value=10, step=0.1, unit="倍"),
+            StrategyParam(name="top_k", label="入选数量", value=10, type="number", min_value=1, max_value=200, step=1, unit="只", description="按综合得分取前K名，同分按股票列表顺序"),
         ],
         tags=["价值", "动量", "质量", "ROE", "PB"]
     )
@@ -41,19 +46,41 @@ PRESET_SELECTION_STRATEGIES = [
 async def get_selection_strategies_endpoint():
     return PRESET_SELECTION_STRATEGIES
 
+STREAM_CHUNK_ROWS = 50 # NDJSON 每次写出的行数
+
 @router.post("/generate_pool", response_model=SelectionPoolResponse)
 async def generate_selection_pool_endpoint(request: SelectionPoolRequest = Body(...)):
     try:
-        pool_items_data = await strategy_service.generate_pool_for_selection(
+        if request.sort_by is None and request.cursor is None and request.limit is None:
+            pool_items_data = await strategy_service.generate_pool_for_selection(
+                strategy_id=request.strategy_id,
+                params=request.params
+            )
+            return SelectionPoolResponse(
+                items=pool_items_data,
+                strategy_used=request.strategy_id,
+                params_used=request.params,
+                timestamp=datetime.now().isoformat()
+            )
+        page, next_cursor, total, trade_date = await strategy_service.generate_pool_page(
             strategy_id=request.strategy_id,
-            params=request.params
+            params=request.params,
+            sort_by=request.sort_by,
+            sort_order=request.sort_order,
+            cursor=request.cursor,
+            limit=request.limit or DEFAULT_PAGE_LIMIT
         )
         return SelectionPoolResponse(
-            items=pool_items_data,
+            items=page,
             strategy_used=request.strategy_id,
             params_used=request.params,
-            timestamp=datetime.now().isoformat()
+            timestamp=datetime.now().isoformat(),
+            trade_date=trade_date,
+            total=total,
+            next_cursor=next_cursor
         )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -61,4 +88,40 @@ async def generate_selection_pool_endpoint(request: SelectionPoolRequest = Body(
         print(f"Error in generate_selection_pool_endpoint: {e}")
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Error generating selection pool: {str(e)}")
+
+@router.post("/generate_pool/stream")
+async def stream_selection_pool_endpoint(request: SelectionPoolRequest = Body(...)):
+    """
+    NDJSON 流式返回：第一行为 {"type": "meta", ...}（总数、交易日、下一页游标），之后每行一只股票 {"type": "item", ...}。
+    排序与分页参数与 /generate_pool 相同；limit 为空时返回游标之后的全部结果。
+    """
+    try:
+        page, next_cursor, total, trade_date = await strategy_service.generate_pool_page(
+            strategy_id=request.strategy_id,
+            params=request.params,
+            sort_by=request.sort_by,
+            sort_order=request.sort_order,
+            cursor=request.cursor,
+            limit=request.limit
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        import traceback
+        print(f"Error in stream_selection_pool_endpoint: {e}")
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Error generating selection pool: {str(e)}")
+
+    async def ndjson_lines():
+        meta = {"type": "meta", "strategy_used": request.strategy_id, "params_used": request.params,
+                "timestamp": datetime.now().isoformat(), "trade_date": trade_date, "total": total, "next_cursor": next_cursor}
+        yield json.dumps(meta, ensure_ascii=False) + "\n"
+        for start in range(0, len(page), STREAM_CHUNK_ROWS):
+            yield "".join(json.dumps({"type": "item", **item.dict()}, ensure_ascii=False) + "\n"
+                          for item in page[start:start + STREAM_CHUNK_ROWS])
+            await asyncio.sleep(0) # 让出事件循环，先写出的行可以立即发送
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
 # --- END OF FILE backend/app/api/v1/endpoints/selection_strategies.py ---
\ No newline at end of file
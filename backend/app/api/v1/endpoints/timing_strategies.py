@@ -1,9 +1,9 @@
 # --- START OF FILE backend/app/api/v1/endpoints/timing_strategies.py ---
 from fastapi import APIRouter, HTTPException, Body
 from typing import List, Dict, Any
-from app.models.timing import TimingStrategyConfig, TimingSignalRequest, TimingSignalResponse # 从新模型导入
+from app.models.timing import TimingStrategyConfig, TimingSignalRequest, TimingSignalResponse, TimingSignalHistoryRequest, TimingSignalHistoryResponse, TimingBatchSignalRequest, TimingBatchSignalResponse, TimingCombinationResult # 从新模型导入
 # 假设我们也会创建一个 TimingService
-from app.services.timing_service import TimingService 
+from app.services.timing_service import InvalidDateRangeError, TimingService
 from datetime import datetime
 from app.models.strategy import StrategyParam
 
@@ -24,7 +24,7 @@ PRESET_TIMING_STRATEGIES = [
         tags=["技术指标", "反转", "RSI"]
     ),
     TimingStrategyConfig(
-        id="ma_cross", # 之前可能是 ma_golden_cross，统一为 ma_cross，具体金叉死叉由信号类型区分
+        id="ma_cross", # 注册表中 ma_golden_cross 为其别名，具体金叉死叉由信号类型区分
         name="均线交叉",
         description="当短期均线上穿或下穿长期均线时产生信号。",
         params=[
@@ -69,4 +69,62 @@ async def generate_timing_signals_endpoint(request: TimingSignalRequest = Body(.
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Error generating timing signals: {str(e)}")
 
+@router.post("/generate_signals_batch", response_model=TimingBatchSignalResponse)
+async def generate_timing_signals_batch_endpoint(request: TimingBatchSignalRequest = Body(...)):
+    """一次评估多个策略/参数组合（支持参数网格），行情只加载一次，结果按组合分组返回"""
+    try:
+        current_time = datetime.now()
+        combinations = [
+            (combo.strategy_id, params)
+            for combo in request.combinations
+            for params in timing_service.expand_param_grid(combo.params, combo.param_grid)
+        ]
+        outcomes = await timing_service.evaluate_strategies(request.target_tickers, combinations)
+        results = [
+            TimingCombinationResult(strategy_id=strategy_id, params=params, signals=signal_items, data_timestamp=data_last_date, error=error)
+            for (strategy_id, params), (signal_items, data_last_date, error) in zip(combinations, outcomes)
+        ]
+        data_dates = [r.data_timestamp for r in results if r.data_timestamp]
+        return TimingBatchSignalResponse(
+            results=results,
+            request_timestamp=current_time.isoformat(),
+            data_timestamp=max(data_dates) if data_dates else None
+        )
+    except ValueError as e:
+        # 例如策略ID不存在或组合数超限
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        import traceback
+        print(f"Error in generate_timing_signals_batch_endpoint: {e}")
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Error generating batch timing signals: {str(e)}")
+
+@router.post("/signal_history", response_model=TimingSignalHistoryResponse)
+async def scan_signal_history_endpoint(request: TimingSignalHistoryRequest = Body(...)):
+    """在一段历史区间内逐日评估择时策略（默认全市场），返回列式稀疏事件表"""
+    try:
+        current_time = datetime.now()
+        table = await timing_service.scan_signal_history(
+            strategy_id=request.strategy_id,
+            params=request.params,
+            start_date=request.start_date,
+            end_date=request.end_date,
+            target_tickers=request.target_tickers
+        )
+        return TimingSignalHistoryResponse(
+            strategy_used=request.strategy_id,
+            params_used=request.params,
+            request_timestamp=current_time.isoformat(),
+            **table
+        )
+    except InvalidDateRangeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        import traceback
+        print(f"Error in scan_signal_history_endpoint: {e}")
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Error scanning signal history: {str(e)}")
+
 # --- END OF FILE backend/app/api/v1/endpoints/timing_strategies.py ---
\ No newline at end of file
@@ -24,6 +24,29 @@ class Settings(BaseSettings):
     TUSHARE_TOKEN: Optional[str] = Field(default=None, env="TUSHARE_TOKEN")
     # 新增数据库配置
     SQLALCHEMY_DATABASE_URL: str = "sqlite:///./quant_assistant.db" # SQLite 文件将创建在项目根目录
+    # 本地行情存储目录 (日线分区文件等)，与 SQLite 文件一样默认放在项目根目录
+    MARKET_DATA_DIR: str = Field(default="./market_data", env="MARKET_DATA_DIR")
+    # Tushare 调用限流与并发
+    TUSHARE_RATE_LIMIT_PER_MINUTE: int = Field(default=200, env="TUSHARE_RATE_LIMIT_PER_MINUTE") # 按账号积分对应的每分钟配额调整
+    TUSHARE_MAX_WORKERS: int = Field(default=8, env="TUSHARE_MAX_WORKERS") # 异步网关线程池大小
+    SELECTION_ENRICH_CONCURRENCY: int = Field(default=8, env="SELECTION_ENRICH_CONCURRENCY") # 选股逐只回退时同时在途的财务指标请求数，超过网关线程池大小没有意义
+    TUSHARE_MAX_RETRIES: int = Field(default=3, env="TUSHARE_MAX_RETRIES")
+    TUSHARE_RETRY_BACKOFF_SECONDS: float = Field(default=1.0, env="TUSHARE_RETRY_BACKOFF_SECONDS")
+    # Tushare 数据后端: live (在线) / record (在线并录制响应) / replay (回放录制) / synthetic (合成全市场数据)
+    TUSHARE_BACKEND: str = Field(default="live", env="TUSHARE_BACKEND")
+    TUSHARE_RECORD_DIR: str = Field(default="./tushare_records", env="TUSHARE_RECORD_DIR") # record / replay 模式的响应文件目录
+    TUSHARE_SYNTHETIC_TICKERS: int = Field(default=5000, env="TUSHARE_SYNTHETIC_TICKERS")
+    TUSHARE_SYNTHETIC_START: str = Field(default="20190101", env="TUSHARE_SYNTHETIC_START") # 合成行情的起始日期
+    TUSHARE_SYNTHETIC_SEED: int = Field(default=42, env="TUSHARE_SYNTHETIC_SEED")
+    TUSHARE_SYNTHETIC_LATENCY_MS: float = Field(default=0.0, env="TUSHARE_SYNTHETIC_LATENCY_MS") # 每次调用模拟的网络延迟
+    DATA_CACHE_MAX_MB: int = Field(default=256, env="DATA_CACHE_MAX_MB") # 数据缓存的内存上限 (按估算字节数淘汰)
+    SELECTION_CACHE_MAX_ENTRIES: int = Field(default=256, env="SELECTION_CACHE_MAX_ENTRIES") # 选股结果缓存的条目上限 (LRU)
+    SELECTION_CACHE_PERSIST: bool = Field(default=False, env="SELECTION_CACHE_PERSIST") # 选股结果是否同时写入磁盘，重启后仍可命中
+    # 收盘数据同步 (EOD sync)
+    EOD_PUBLISH_TIME: str = Field(default="17:00", env="EOD_PUBLISH_TIME") # 当日行情在 Tushare 可用的大致时间 (HH:MM)
+    EOD_SYNC_SCHEDULE_ENABLED: bool = Field(default=False, env="EOD_SYNC_SCHEDULE_ENABLED") # 是否在 API 进程内定时同步
+    EOD_SYNC_TIME: str = Field(default="17:30", env="EOD_SYNC_TIME") # 进程内定时同步的触发时间 (HH:MM)
+    EOD_SYNC_LOOKBACK_DAYS: int = Field(default=400, env="EOD_SYNC_LOOKBACK_DAYS") # 首次同步时回溯的自然日数
 
 
     @property
@@ -45,6 +45,24 @@ app.include_router(api_v1_router, prefix=settings.API_V1_STR)
 async def root():
     return {"message": f"Welcome to {settings.PROJECT_NAME}!"}
 
+# 启动时在线程池中加载交易日历（可能请求 trade_cal），并定期在线程池中刷新；
+# 请求处理中的 latest_trade_date / shift 等查询只读内存，不会在事件循环上访问 Tushare
+@app.on_event("startup")
+async def load_trading_calendar():
+    import asyncio
+    from app.services.trading_calendar import run_calendar_refresher, trading_calendar
+    await asyncio.get_running_loop().run_in_executor(None, trading_calendar.reload)
+    app.state.calendar_refresh_task = asyncio.create_task(run_calendar_refresher())
+
+# 可选：在 API 进程内按 EOD_SYNC_TIME 定时执行收盘数据同步
+# 也可以不开启，改用 cron 调用 `python -m app.services.eod_sync`
+@app.on_event("startup")
+async def start_eod_sync_scheduler():
+    if settings.EOD_SYNC_SCHEDULE_ENABLED:
+        import asyncio
+        from app.services.eod_sync import run_scheduler
+        app.state.eod_sync_task = asyncio.create_task(run_scheduler())
+
 # (可选) 在应用启动时初始化Tushare客户端等
 # @app.on_event("startup")
 # async def startup_event():
@@ -1,4 +1,4 @@
-from pydantic import BaseModel,Field
+from pydantic import BaseModel,Field,validator
 from typing import Any, Optional, Literal, Union,List,Dict
 
 class StrategyParam(BaseModel):
@@ -55,9 +55,23 @@ class SelectedPoolItem(BaseModel):
 class SelectionPoolRequest(BaseModel):
     strategy_id: str
     params: Dict[str, Any] # 用户调整后的参数键值对
+    # 以下任一字段非空时按分页模式返回（在完整排名上排序/分页），否则保持原来的前 top_k 名
+    sort_by: Optional[str] = Field(None, description="排序字段，如 roe / pb / composite_score；为空时按策略排名")
+    sort_order: Literal["asc", "desc"] = "desc"
+    cursor: Optional[str] = Field(None, description="上一页返回的 next_cursor；给出时排序方式以游标为准")
+    limit: Optional[int] = Field(None, ge=1, le=500, description="每页条数，分页模式下默认 50")
+
+    @validator('sort_by')
+    def sort_by_must_be_item_field(cls, v):
+        if v is not None and v not in SelectedPoolItem.__fields__:
+            raise ValueError(f"sort_by must be one of {list(SelectedPoolItem.__fields__)}")
+        return v
 
 class SelectionPoolResponse(BaseModel):
     items: List[SelectedPoolItem]
     strategy_used: str
     params_used: Dict[str, Any]
-    timestamp: str
\ No newline at end of file
+    timestamp: str
+    trade_date: Optional[str] = None # 结果所依据的交易日
+    total: Optional[int] = None # 分页模式下入选股票总数
+    next_cursor: Optional[str] = None # 分页模式下的下一页游标，最后一页为空
\ No newline at end of file
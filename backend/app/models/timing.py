@@ -33,4 +33,52 @@ class TimingSignalResponse(BaseModel):
     params_used: Dict[str, Any]
     request_timestamp: str # 请求处理时间
     data_timestamp: Optional[str] = None # 所用行情数据的最新日期
+
+class TimingStrategyCombination(BaseModel):
+    strategy_id: str = Field(..., description="选择的择时策略ID")
+    params: Dict[str, Any] = Field(default_factory=dict, description="固定的策略参数")
+    param_grid: Dict[str, List[Any]] = Field(default_factory=dict, description="参数网格，如 {\"rsi_period\": [6, 14, 21]}，与 params 合并后展开为笛卡尔积")
+
+class TimingBatchSignalRequest(BaseModel):
+    target_tickers: List[str] = Field(..., description="需要进行择时分析的股票代码列表", min_items=1)
+    combinations: List[TimingStrategyCombination] = Field(..., description="策略及参数组合", min_items=1)
+
+class TimingCombinationResult(BaseModel):
+    strategy_id: str
+    params: Dict[str, Any] # 展开网格后的实际参数
+    signals: List[TimingSignalItem] = []
+    data_timestamp: Optional[str] = None
+    error: Optional[str] = None # 参数非法时的原因，此时 signals 为空
+
+class TimingBatchSignalResponse(BaseModel):
+    results: List[TimingCombinationResult] # 按展开后的组合顺序
+    request_timestamp: str
+    data_timestamp: Optional[str] = None # 所有组合所用行情数据的最新日期
+
+class TimingSignalHistoryRequest(BaseModel):
+    strategy_id: str = Field(..., description="选择的择时策略ID")
+    params: Dict[str, Any] = Field(default_factory=dict, description="用户调整后的策略参数")
+    start_date: str = Field(..., description="扫描起始日期 YYYYMMDD 或 YYYY-MM-DD")
+    end_date: Optional[str] = Field(None, description="扫描结束日期，默认最新交易日")
+    target_tickers: Optional[List[str]] = Field(None, description="股票代码列表，为空时扫描全市场")
+
+class TimingSignalHistoryResponse(BaseModel):
+    """
+    稀疏事件表（列式）：第 i 个事件发生在 dates[date_index[i]]，标的为 tickers[ticker_index[i]]，
+    类型为 signal_types[signal_type_index[i]]；values 中每一列与事件一一对应。
+    """
+    strategy_used: str
+    params_used: Dict[str, Any]
+    start_date: str
+    end_date: str
+    dates: List[str] # YYYY-MM-DD
+    tickers: List[str]
+    signal_types: List[str]
+    date_index: List[int]
+    ticker_index: List[int]
+    signal_type_index: List[int]
+    price: List[Optional[float]] # 信号当日前复权收盘价
+    values: Dict[str, List[Optional[float]]] # 触发时的指标值，如 {"rsi": [...], "prev_rsi": [...]}
+    n_events: int
+    request_timestamp: str
 # --- END OF FILE backend/app/models/timing.py ---
\ No newline at end of file
@@ -0,0 +1,223 @@
+# --- START OF FILE backend/app/services/bar_store.py ---
+"""
+本地日线行情存储 (OHLCV + 复权因子)。
+
+只保存未复权价格和复权因子，前/后复权在读取时用一次向量化乘法完成。
+分红送转只会追加一行复权因子，不需要重新下载历史行情。
+
+目录布局（按股票代码 + 年份分区）：
+    <MARKET_DATA_DIR>/ticker/daily/<ts_code>/<YYYY>.npy       未复权日线，按 trade_date 升序
+    <MARKET_DATA_DIR>/ticker/adj_factor/<ts_code>/<YYYY>.npy  复权因子，按 trade_date 升序
+    <MARKET_DATA_DIR>/ticker/coverage/<ts_code>.json          已从 Tushare 拉取过的日期区间
+    <MARKET_DATA_DIR>/ticker/coverage/_market.json            EOD 同步已覆盖全市场的日期区间
+
+coverage 记录的是“问过 Tushare 的区间”而不是“有数据的日期”，
+这样停牌日不会被当成缺口反复请求。
+"""
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.services.columnar_io import load_records, save_records_atomic
+
+BAR_FIELDS: Tuple[str, ...] = ('open', 'high', 'low', 'close', 'pre_close', 'change', 'pct_chg', 'vol', 'amount')
+PRICE_FIELDS: Tuple[str, ...] = ('open', 'high', 'low', 'close', 'pre_close')
+TABLE_DTYPES: Dict[str, np.dtype] = {
+    'daily': np.dtype([('trade_date', '<i4')] + [(f, '<f8') for f in BAR_FIELDS]),
+    'adj_factor': np.dtype([('trade_date', '<i4'), ('adj_factor', '<f8')]),
+}
+
+DateRange = Tuple[int, int]  # 闭区间 [start, end]，YYYYMMDD 整数
+MARKET_COVERAGE_KEY = '_market'
+
+
+def _to_int_date(value) -> int:
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (datetime, pd.Timestamp)):
+        return int(value.strftime('%Y%m%d'))
+    return int(str(value).replace('-', '')[:8])
+
+
+def _next_day(d: int) -> int:
+    return int((pd.Timestamp(str(d)) + pd.Timedelta(days=1)).strftime('%Y%m%d'))
+
+
+def _prev_day(d: int) -> int:
+    return int((pd.Timestamp(str(d)) - pd.Timedelta(days=1)).strftime('%Y%m%d'))
+
+
+def merge_ranges(ranges: List[DateRange]) -> List[DateRange]:
+    """合并重叠或相邻的日期区间。"""
+    merged: List[DateRange] = []
+    for start, end in sorted(ranges):
+        if merged and start <= _next_day(merged[-1][1]):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_ranges(wanted: DateRange, covered: List[DateRange]) -> List[DateRange]:
+    """返回 wanted 中未被 covered 覆盖的子区间。"""
+    gaps: List[DateRange] = []
+    cursor = wanted[0]
+    for start, end in merge_ranges(covered):
+        if end < cursor:
+            continue
+        if start > wanted[1]:
+            break
+        if start > cursor:
+            gaps.append((cursor, _prev_day(start)))
+        cursor = max(cursor, _next_day(end))
+        if cursor > wanted[1]:
+            break
+    if cursor <= wanted[1]:
+        gaps.append((cursor, wanted[1]))
+    return gaps
+
+
+def apply_adj_factor(bars: pd.DataFrame, factors: pd.Series, adj: Optional[str]) -> pd.DataFrame:
+    """
+    对单只股票的未复权日线做复权（向量化）。
+    qfq: price * factor / 区间内最后一个复权因子（与 pro_bar 的前复权口径一致）
+    hfq: price * factor
+    复权后按 pro_bar 的做法重新计算 change / pct_chg。
+    """
+    if adj not in ('qfq', 'hfq') or bars.empty:
+        return bars
+    factors = factors.dropna()
+    if factors.empty:
+        return bars
+    aligned = factors.reindex(factors.index.union(bars.index)).ffill().bfill().reindex(bars.index)
+    scale = aligned if adj == 'hfq' else aligned / factors.iloc[-1]
+    bars = bars.copy()
+    for field in PRICE_FIELDS:
+        bars[field] = bars[field] * scale
+    bars['change'] = bars['close'] - bars['pre_close']
+    bars['pct_chg'] = bars['change'] / bars['pre_close'] * 100
+    return bars
+
+
+class BarStore:
+    def __init__(self, root: Optional[str] = None):
+        self.root = os.path.join(root or settings.MARKET_DATA_DIR, 'ticker')
+        self._lock = threading.Lock()
+
+    def _table_dir(self, table: str, ts_code: str) -> str:
+        return os.path.join(self.root, table, ts_code)
+
+    def _coverage_path(self, ts_code: str) -> str:
+        return os.path.join(self.root, 'coverage', f'{ts_code}.json')
+
+    # --- coverage ---
+    def get_coverage(self, ts_code: str) -> List[DateRange]:
+        path = self._coverage_path(ts_code)
+        if not os.path.exists(path):
+            return []
+        with open(path, 'r', encoding='utf-8') as f:
+            return [tuple(r) for r in json.load(f)]
+
+    def mark_covered(self, ts_code: str, start: int, end: int) -> None:
+        if end < start:
+            return
+        with self._lock:
+            ranges = merge_ranges(self.get_coverage(ts_code) + [(start, end)])
+            path = self._coverage_path(ts_code)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump([list(r) for r in ranges], f)
+            os.replace(tmp_path, path)
+
+    def get_market_coverage(self) -> List[DateRange]:
+        return self.get_coverage(MARKET_COVERAGE_KEY)
+
+    def mark_market_covered(self, start, end) -> None:
+        """EOD 同步写完全市场横截面后调用，之后所有股票在该区间内都不再按需拉取。"""
+        self.mark_covered(MARKET_COVERAGE_KEY, _to_int_date(start), _to_int_date(end))
+
+    def missing_ranges(self, ts_code: str, start, end) -> List[DateRange]:
+        covered = self.get_coverage(ts_code) + self.get_market_coverage()
+        return subtract_ranges((_to_int_date(start), _to_int_date(end)), covered)
+
+    # --- 分区读写 ---
+    def _write_table(self, table: str, ts_code: str, df: pd.DataFrame) -> None:
+        """把 Tushare 返回的数据合并进年份分区（同一 trade_date 以新数据为准）。"""
+        if df is None or df.empty:
+            return
+        dtype = TABLE_DTYPES[table]
+        dates = df['trade_date'] if 'trade_date' in df.columns else pd.Series(df.index, index=df.index)
+        new = np.empty(len(df), dtype=dtype)
+        new['trade_date'] = [_to_int_date(d) for d in dates]
+        for field in dtype.names[1:]:
+            new[field] = pd.to_numeric(df[field], errors='coerce').to_numpy(dtype='float64') if field in df.columns else np.nan
+
+        years = new['trade_date'] // 10000
+        with self._lock:
+            for year in np.unique(years):
+                path = os.path.join(self._table_dir(table, ts_code), f'{int(year)}.npy')
+                chunk = new[years == year]
+                existing = load_records(path, mmap=False)
+                if existing is not None and len(existing):
+                    keep = ~np.isin(existing['trade_date'], chunk['trade_date'])
+                    chunk = np.concatenate([existing[keep], chunk])
+                chunk = chunk[np.argsort(chunk['trade_date'], kind='stable')]
+                save_records_atomic(path, chunk)
+
+    def _read_table(self, table: str, ts_code: str, start_i: int, end_i: int) -> Optional[np.ndarray]:
+        parts = []
+        for year in range(start_i // 10000, end_i // 10000 + 1):
+            records = load_records(os.path.join(self._table_dir(table, ts_code), f'{year}.npy'))
+            if records is None or not len(records):
+                continue
+            lo = np.searchsorted(records['trade_date'], start_i, side='left')
+            hi = np.searchsorted(records['trade_date'], end_i, side='right')
+            if hi > lo:
+                parts.append(np.array(records[lo:hi]))
+        return np.concatenate(parts) if parts else None
+
+    def write_bars(self, ts_code: str, df: pd.DataFrame) -> None:
+        self._write_table('daily', ts_code, df)
+
+    def write_adj_factors(self, ts_code: str, df: pd.DataFrame) -> None:
+        self._write_table('adj_factor', ts_code, df)
+
+    def write_cross_sections(self, table: str, df: pd.DataFrame) -> int:
+        """把多个交易日的全市场横截面按股票拆开写入各自分区，返回涉及的股票数。"""
+        if df is None or df.empty:
+            return 0
+        n_tickers = 0
+        for ts_code, group in df.groupby('ts_code', sort=False):
+            self._write_table(table, str(ts_code), group)
+            n_tickers += 1
+        return n_tickers
+
+    def read_adj_factors(self, ts_code: str, start, end) -> pd.Series:
+        records = self._read_table('adj_factor', ts_code, _to_int_date(start), _to_int_date(end))
+        if records is None:
+            return pd.Series(dtype='float64')
+        return pd.Series(records['adj_factor'], index=pd.to_datetime(records['trade_date'].astype(str), format='%Y%m%d'))
+
+    def read_bars(self, ts_code: str, start, end, adj: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """读取 [start, end] 区间的日线并按 adj 复权，返回格式与 TushareClient.get_daily_data 一致。"""
+        records = self._read_table('daily', ts_code, _to_int_date(start), _to_int_date(end))
+        if records is None:
+            return None
+        df = pd.DataFrame({field: records[field] for field in BAR_FIELDS})
+        df.insert(0, 'ts_code', ts_code)
+        df.index = pd.to_datetime(records['trade_date'].astype(str), format='%Y%m%d')
+        df.index.name = 'trade_date'
+        if adj in ('qfq', 'hfq'):
+            df = apply_adj_factor(df, self.read_adj_factors(ts_code, start, end), adj)
+        return df
+
+
+bar_store = BarStore()
+# --- END OF FILE backend/app/services/bar_store.py ---
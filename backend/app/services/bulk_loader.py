@@ -0,0 +1,157 @@
+# --- START OF FILE backend/app/services/bulk_loader.py ---
+"""
+按交易日批量拉取全市场日线 (daily + adj_factor)，并转成 日期×股票 的面板。
+
+逐只股票拉取日线时，请求数随股票数增长；按 trade_date 拉取横截面后，
+N 日回溯只需要 2N 次请求（daily + adj_factor），且每个交易日的横截面
+落盘后不再变化，可以永久复用。
+
+目录布局：
+    <MARKET_DATA_DIR>/xsection/<table>/<YYYYMMDD>.npy
+"""
+import logging
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.services.bar_store import PRICE_FIELDS
+from app.services.columnar_io import frame_to_records, load_records, save_records_atomic
+
+logger = logging.getLogger(__name__)
+
+
+class CrossSectionStore:
+    """按 (表名, 交易日) 分区保存的全市场横截面。"""
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = os.path.join(root or settings.MARKET_DATA_DIR, 'xsection')
+        self._lock = threading.Lock()
+
+    def _path(self, table: str, trade_date: str) -> str:
+        return os.path.join(self.root, table, f'{trade_date}.npy')
+
+    def has(self, table: str, trade_date: str) -> bool:
+        return os.path.exists(self._path(table, trade_date))
+
+    def read(self, table: str, trade_date: str) -> Optional[np.ndarray]:
+        return load_records(self._path(table, trade_date))
+
+    def modified_at(self, table: str, trade_date: str) -> Optional[float]:
+        """分区文件的写入时间 (epoch 秒)，不存在时为 None。"""
+        path = self._path(table, trade_date)
+        return os.path.getmtime(path) if os.path.exists(path) else None
+
+    def write(self, table: str, trade_date: str, df: pd.DataFrame) -> None:
+        records = frame_to_records(df.sort_values('ts_code').reset_index(drop=True))
+        with self._lock:
+            save_records_atomic(self._path(table, trade_date), records)
+
+    def missing_dates(self, table: str, trade_dates: Iterable[str]) -> List[str]:
+        return [d for d in trade_dates if not self.has(table, d)]
+
+
+def adjust_panel(prices: pd.DataFrame, factors: pd.DataFrame, adj: Optional[str]) -> pd.DataFrame:
+    """
+    对价格面板做复权（向量化）。
+    qfq: price * factor / 区间内最后一个复权因子（与 pro_bar 的前复权口径一致）
+    hfq: price * factor
+    """
+    if adj not in ('qfq', 'hfq'):
+        return prices
+    factors = factors.reindex(index=prices.index, columns=prices.columns).ffill()
+    if adj == 'hfq':
+        return prices * factors
+    if factors.empty:
+        return prices
+    return prices * factors / factors.iloc[-1]
+
+
+class BulkBarLoader:
+    def __init__(self, client=None, store: Optional[CrossSectionStore] = None):
+        self._client = client
+        self.store = store or CrossSectionStore()
+
+    @property
+    def client(self):
+        # 延迟导入，避免与 tushare_client 的循环依赖
+        if self._client is None:
+            from app.services.tushare_client import ts_client
+            self._client = ts_client
+        return self._client
+
+    def estimated_requests(self, trade_dates: Sequence[str]) -> int:
+        """补齐这些交易日的横截面还需要多少次 Tushare 请求。"""
+        return len(self.store.missing_dates('daily', trade_dates)) + len(self.store.missing_dates('adj_factor', trade_dates))
+
+    def prefers_bulk(self, per_ticker_requests: int, trade_dates: Sequence[str]) -> bool:
+        """按日批量拉取是否比逐只拉取的请求更少。"""
+        return self.estimated_requests(trade_dates) <= per_ticker_requests
+
+    def ensure_dates(self, trade_dates: Sequence[str]) -> None:
+        """把缺失的交易日横截面从 Tushare 补齐到本地。空结果（例如当日尚未收盘）不落盘。"""
+        for table, fetch in (('daily', self.client.get_daily_cross_section),
+                             ('adj_factor', self.client.get_adj_factor_cross_section)):
+            for trade_date in self.store.missing_dates(table, trade_dates):
+                df = fetch(trade_date)
+                if df is None or df.empty:
+                    logger.info(f"BulkBarLoader: no {table} data for {trade_date} yet, skipping.")
+                    continue
+                self.store.write(table, trade_date, df)
+
+    def _pivot(self, table: str, trade_dates: Sequence[str], fields: Sequence[str],
+               ts_codes: Optional[Sequence[str]]) -> Dict[str, pd.DataFrame]:
+        sections = [(d, self.store.read(table, d)) for d in trade_dates]
+        sections = [(d, r) for d, r in sections if r is not None and len(r)]
+        if ts_codes is not None:
+            columns = pd.Index(ts_codes).unique()
+        elif sections:
+            columns = pd.Index(np.unique(np.concatenate([np.asarray(r['ts_code']) for _, r in sections])))
+        else:
+            columns = pd.Index([])
+        index = pd.to_datetime([d for d, _ in sections], format='%Y%m%d')
+        data = {f: np.full((len(sections), len(columns)), np.nan) for f in fields}
+        for row, (_, records) in enumerate(sections):
+            col_pos = columns.get_indexer(np.asarray(records['ts_code']))
+            hit = col_pos >= 0
+            for f in fields:
+                data[f][row, col_pos[hit]] = np.asarray(records[f])[hit]
+        panel = {f: pd.DataFrame(values, index=index, columns=columns) for f, values in data.items()}
+        for frame in panel.values():
+            frame.index.name = 'trade_date'
+        return panel
+
+    def load_panel(self, trade_dates: Sequence[str], fields: Sequence[str] = ('close', 'vol'),
+                   adj: Optional[str] = 'qfq', ts_codes: Optional[Sequence[str]] = None) -> Dict[str, pd.DataFrame]:
+        """
+        返回 {field: DataFrame(index=trade_date, columns=ts_code)}。
+        价格类字段按 adj 复权，成交量等字段保持原值。
+        """
+        trade_dates = sorted(trade_dates)
+        self.ensure_dates(trade_dates)
+        panel = self._pivot('daily', trade_dates, fields, ts_codes)
+        price_fields = [f for f in fields if f in PRICE_FIELDS]
+        if price_fields and adj in ('qfq', 'hfq'):
+            columns = next(iter(panel.values())).columns
+            factors = self._pivot('adj_factor', trade_dates, ('adj_factor',), list(columns))['adj_factor']
+            for f in price_fields:
+                panel[f] = adjust_panel(panel[f], factors, adj)
+        return panel
+
+    def load_frames(self, trade_dates: Sequence[str], ts_codes: Sequence[str],
+                    fields: Sequence[str] = ('close', 'vol'), adj: Optional[str] = 'qfq') -> Dict[str, pd.DataFrame]:
+        """把面板拆回逐只股票的 DataFrame（index 为 trade_date），停牌日被丢弃。"""
+        panel = self.load_panel(trade_dates, fields=fields, adj=adj, ts_codes=ts_codes)
+        frames: Dict[str, pd.DataFrame] = {}
+        for ts_code in ts_codes:
+            df = pd.DataFrame({f: panel[f][ts_code] for f in fields}).dropna(subset=[fields[0]])
+            if not df.empty:
+                frames[ts_code] = df
+        return frames
+
+
+bulk_loader = BulkBarLoader()
+# --- END OF FILE backend/app/services/bulk_loader.py ---
@@ -0,0 +1,66 @@
+# --- START OF FILE backend/app/services/columnar_io.py ---
+"""
+本地列式文件读写工具。
+
+所有行情/指标分区都以 NumPy 结构化数组 (.npy) 的形式落盘：
+- 写入时先写临时文件再 os.replace，保证读者永远看不到半个文件；
+- 读取时使用 mmap_mode='r'，只把真正访问到的页读入内存。
+"""
+import os
+import tempfile
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def frame_to_records(df: pd.DataFrame) -> np.ndarray:
+    """把 DataFrame 转为可 mmap 的结构化数组（object 列转为定长 unicode）。"""
+    dtypes = []
+    columns = []
+    for col in df.columns:
+        series = df[col]
+        if series.dtype == object or pd.api.types.is_string_dtype(series.dtype):
+            values = series.fillna('').astype(str).to_numpy()
+            width = max((len(v) for v in values), default=1) or 1
+            dtypes.append((str(col), f'U{width}'))
+            columns.append(values.astype(f'U{width}'))
+        elif pd.api.types.is_integer_dtype(series.dtype):
+            dtypes.append((str(col), series.dtype.str))
+            columns.append(series.to_numpy())
+        else:
+            values = pd.to_numeric(series, errors='coerce').astype('float64').to_numpy()
+            dtypes.append((str(col), '<f8'))
+            columns.append(values)
+    records = np.empty(len(df), dtype=dtypes)
+    for (name, _), values in zip(dtypes, columns):
+        records[name] = values
+    return records
+
+
+def save_records_atomic(path: str, records: np.ndarray) -> None:
+    """原子写入结构化数组：同目录临时文件 + os.replace。"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, records, allow_pickle=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_records(path: str, mmap: bool = True) -> Optional[np.ndarray]:
+    if not os.path.exists(path):
+        return None
+    return np.load(path, mmap_mode='r' if mmap else None, allow_pickle=False)
+
+
+def records_to_frame(records: np.ndarray, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """结构化数组 -> DataFrame，columns 用于列投影（只复制需要的字段）。"""
+    names: List[str] = list(columns) if columns is not None else list(records.dtype.names)
+    return pd.DataFrame({name: np.asarray(records[name]) for name in names})
+# --- END OF FILE backend/app/services/columnar_io.py ---
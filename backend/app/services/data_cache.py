@@ -0,0 +1,163 @@
+# --- START OF FILE backend/app/services/data_cache.py ---
+"""
+按数据集配置 TTL 的内存缓存，替代 TushareClient 上的 lru_cache。
+
+- “最新”类的键（例如 trade_date=None 的 daily_basic、stock_basic）在下一次收盘数据发布时过期，
+  并且在观察到新的交易日发布时立即失效；
+- 指定历史交易日的键按数据集 TTL 过期；
+- 总容量按估算的内存字节数限制 (LRU 淘汰)，而不是按条目数；
+- 记录每个数据集的命中/未命中次数。
+"""
+import functools
+import inspect
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import pandas as pd
+
+from app.core.config import settings
+from app.services.trading_calendar import next_publish_time
+
+# 各数据集的 TTL (秒)。“最新”类键另外受下一次发布时间约束。
+DATASET_TTLS: Dict[str, float] = {
+    'stock_basic': 24 * 3600,
+    'daily_basic': 7 * 24 * 3600,
+    'fina_indicator': 24 * 3600,
+    'trade_dates': 24 * 3600,
+}
+DEFAULT_TTL = 3600.0
+
+
+def estimate_size(value: Any) -> int:
+    """粗略估算对象占用的字节数。"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(sys.getsizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class _Entry:
+    __slots__ = ('value', 'size', 'expires_at', 'dataset', 'is_latest')
+
+    def __init__(self, value: Any, size: int, expires_at: float, dataset: str, is_latest: bool):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.dataset = dataset
+        self.is_latest = is_latest
+
+
+class DatasetCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits: Dict[str, int] = {}
+        self._misses: Dict[str, int] = {}
+        self.latest_trade_date: Optional[str] = None
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def get(self, dataset: str, key: Hashable) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.time():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self._misses[dataset] = self._misses.get(dataset, 0) + 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._hits[dataset] = self._hits.get(dataset, 0) + 1
+            return True, entry.value
+
+    def put(self, dataset: str, key: Hashable, value: Any, is_latest: bool) -> None:
+        now = time.time()
+        expires_at = now + DATASET_TTLS.get(dataset, DEFAULT_TTL)
+        if is_latest:
+            expires_at = min(expires_at, next_publish_time().timestamp())
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(value, size, expires_at, dataset, is_latest)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+
+    def publish_trade_date(self, trade_date: Optional[str]) -> None:
+        """观察到新的交易日数据已发布时调用：所有“最新”类键立即失效。"""
+        if not trade_date:
+            return
+        trade_date = str(trade_date)
+        with self._lock:
+            if self.latest_trade_date is not None and trade_date <= self.latest_trade_date:
+                return
+            previous, self.latest_trade_date = self.latest_trade_date, trade_date
+            if previous is None:
+                return
+            for key in [k for k, e in self._entries.items() if e.is_latest]:
+                self._remove(key)
+
+    def invalidate(self, dataset: Optional[str] = None) -> None:
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if dataset is None or e.dataset == dataset]:
+                self._remove(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            datasets = sorted(set(self._hits) | set(self._misses) | {e.dataset for e in self._entries.values()})
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'latest_trade_date': self.latest_trade_date,
+                'datasets': {
+                    d: {
+                        'hits': self._hits.get(d, 0),
+                        'misses': self._misses.get(d, 0),
+                        'entries': sum(1 for e in self._entries.values() if e.dataset == d),
+                    } for d in datasets
+                },
+            }
+
+
+data_cache = DatasetCache(max_bytes=settings.DATA_CACHE_MAX_MB * 1024 * 1024)
+
+
+def cached_dataset(dataset: str, is_latest: Optional[Callable[[Dict[str, Any]], bool]] = None):
+    """
+    实例方法缓存装饰器。参数按函数签名归一化后作为键（位置参数与关键字参数等价）。
+    is_latest 接收归一化后的参数字典，返回该次调用是否为“最新”类查询；默认视为最新。
+    返回 None（调用失败）时不缓存，下次重试。
+    """
+    def decorator(method: Callable[..., Any]) -> Callable[..., Any]:
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            arguments = {k: v for k, v in bound.arguments.items() if k != 'self'}
+            key = (dataset, id(self), tuple(arguments.items()))
+            hit, value = data_cache.get(dataset, key)
+            if hit:
+                return value
+            value = method(self, *args, **kwargs)
+            if value is not None:
+                data_cache.put(dataset, key, value, is_latest=is_latest(arguments) if is_latest else True)
+            return value
+        return wrapper
+    return decorator
+# --- END OF FILE backend/app/services/data_cache.py ---
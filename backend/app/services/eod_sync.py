@@ -0,0 +1,288 @@
+# --- START OF FILE backend/app/services/eod_sync.py ---
+"""
+收盘后增量同步 (EOD sync)。
+
+找出本地缺失的交易日 / 报告期，按交易日批量拉取全市场数据并落盘：
+    daily, adj_factor, daily_basic   -> xsection/<table>/<YYYYMMDD>.npy
+    fina_indicator (按报告期)         -> xsection/fina_indicator/<period>.npy，并合并进时点财务表
+再把日线和复权因子拆分写入按股票分区的 bar_store，标记全市场覆盖区间，并滚动已有的增量指标状态；
+最后为最新交易日构建选股因子表 (factors/<YYYYMMDD>.npy)，并清空选股结果缓存。
+请求处理时因此只需要读本地数据。
+
+断点续传：每个表分区单独原子写入；一批交易日全部写完并拆分后，才把这些日期
+记入 checkpoint。中途失败时，已落盘的分区在下次运行时直接跳过。
+
+命令行用法（在 backend 目录下）：
+    python -m app.services.eod_sync                 # 增量同步到最新交易日
+    python -m app.services.eod_sync --start 20240101 --end 20240630
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from app.core.config import settings
+from app.services.bar_store import BarStore, bar_store
+from app.services.bulk_loader import CrossSectionStore
+from app.services.columnar_io import records_to_frame
+from app.services.data_cache import data_cache
+from app.services.fundamentals_store import FUNDAMENTAL_TABLE, FundamentalsStore, fundamentals_store, period_is_open, report_periods
+from app.services.factor_table import FactorTable
+from app.services.indicator_state import IndicatorStateStore, indicator_states
+from app.services.selection_cache import selection_cache
+from app.services.selection_engine import SelectionEngine, selection_engine
+from app.services.trading_calendar import TradingCalendar, _parse_hhmm, latest_publishable_date, trading_calendar
+
+logger = logging.getLogger(__name__)
+
+DAILY_TABLES = ('daily', 'adj_factor', 'daily_basic')
+
+
+class EODSyncJob:
+    def __init__(self, client=None, xsection_store: Optional[CrossSectionStore] = None,
+                 store: Optional[BarStore] = None, root: Optional[str] = None,
+                 calendar: Optional[TradingCalendar] = None):
+        self._client = client
+        self.calendar = calendar or trading_calendar
+        self.xsection_store = xsection_store or CrossSectionStore(root)
+        self.bar_store = store or (BarStore(root) if root else bar_store)
+        self.indicator_states = IndicatorStateStore(root, self.xsection_store) if root else indicator_states
+        self.fundamentals = FundamentalsStore(root, self.xsection_store, client) if root else fundamentals_store
+        self.selection_engine = SelectionEngine(client, fundamentals=self.fundamentals, factors=FactorTable(root)) \
+            if root else selection_engine
+        self.checkpoint_path = os.path.join(root or settings.MARKET_DATA_DIR, 'sync', 'checkpoint.json')
+        self._run_lock = threading.Lock()
+
+    @property
+    def client(self):
+        # 延迟导入，避免与 tushare_client 的循环依赖
+        if self._client is None:
+            from app.services.tushare_client import ts_client
+            self._client = ts_client
+        return self._client
+
+    # --- checkpoint ---
+    def load_checkpoint(self) -> Dict[str, Any]:
+        if not os.path.exists(self.checkpoint_path):
+            return {'committed_dates': [], 'periods': {}, 'last_run_at': None}
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_checkpoint(self, checkpoint: Dict[str, Any]) -> None:
+        os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def latest_committed_date(self) -> Optional[str]:
+        committed = self.load_checkpoint().get('committed_dates') or []
+        return max(committed) if committed else None
+
+    def is_fresh(self, now: Optional[datetime] = None) -> bool:
+        """
+        本地是否已提交最新一个已发布收盘数据的交易日（即本地数据就是“最新”）。
+        按交易日比较，周末 / 节假日不运行同步也仍然是新鲜的。
+        """
+        committed = self.latest_committed_date()
+        return committed is not None and committed >= self.calendar.latest_trade_date(now)
+
+    # --- 计划 ---
+    def _resolve_range(self, start_date: Optional[str], end_date: Optional[str]) -> Tuple[str, str]:
+        end_date = min(end_date or latest_publishable_date(), latest_publishable_date())
+        if start_date is None:
+            committed = self.load_checkpoint().get('committed_dates') or []
+            start_date = min(committed) if committed else \
+                (datetime.now() - timedelta(days=settings.EOD_SYNC_LOOKBACK_DAYS)).strftime('%Y%m%d')
+        return start_date, end_date
+
+    def pending_trade_dates(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[str]:
+        start_date, end_date = self._resolve_range(start_date, end_date)
+        committed = set(self.load_checkpoint().get('committed_dates') or [])
+        return [d for d in self.calendar.dates_between(start_date, end_date) if d not in committed]
+
+    def pending_periods(self, start_date: str, end_date: str) -> List[str]:
+        done = self.load_checkpoint().get('periods') or {}
+        return [p for p in report_periods(start_date, end_date)
+                if p not in done or period_is_open(p) or not self.xsection_store.has(FUNDAMENTAL_TABLE, p)]
+
+    # --- 执行 ---
+    def _fetch_table(self, table: str, trade_date: str) -> Optional[pd.DataFrame]:
+        fetchers = {
+            'daily': self.client.get_daily_cross_section,
+            'adj_factor': self.client.get_adj_factor_cross_section,
+            'daily_basic': self.client.get_daily_basic_cross_section,
+        }
+        return fetchers[table](trade_date)
+
+    def _sync_date(self, trade_date: str) -> bool:
+        """补齐一个交易日的所有表分区。任何一张表尚无数据时返回 False (例如当日尚未发布)。"""
+        for table in DAILY_TABLES:
+            if self.xsection_store.has(table, trade_date):
+                continue
+            df = self._fetch_table(table, trade_date)
+            if df is None or df.empty:
+                logger.info(f"EODSync: {table} for {trade_date} not available yet.")
+                return False
+            self.xsection_store.write(table, trade_date, df)
+        return True
+
+    def _commit_batch(self, trade_dates: Sequence[str]) -> None:
+        """把一批已落盘的交易日拆分到按股票分区的存储，然后写 checkpoint。"""
+        if not trade_dates:
+            return
+        for table in ('daily', 'adj_factor'):
+            frames = []
+            for trade_date in trade_dates:
+                records = self.xsection_store.read(table, trade_date)
+                if records is not None and len(records):
+                    frames.append(records_to_frame(records))
+            if frames:
+                self.bar_store.write_cross_sections(table, pd.concat(frames, ignore_index=True))
+
+        checkpoint = self.load_checkpoint()
+        checkpoint['committed_dates'] = sorted(set(checkpoint.get('committed_dates') or []) | set(trade_dates))
+        self._save_checkpoint(checkpoint)
+        logger.info(f"EODSync: committed {len(trade_dates)} trade dates ({min(trade_dates)} - {max(trade_dates)}).")
+
+    def _mark_market_coverage(self, calendar: Sequence[str], start_date: str, end_date: str) -> None:
+        """
+        从 start_date 起，把连续已提交的交易日（连同其间的非交易日）标记为全市场已覆盖。
+        整个区间都已提交时覆盖到 end_date，这样周末/节假日也不会触发按需拉取。
+        """
+        committed = set(self.load_checkpoint().get('committed_dates') or [])
+        covered_until = None
+        for trade_date in calendar:
+            if trade_date not in committed:
+                break
+            covered_until = trade_date
+        else:
+            covered_until = end_date
+        if covered_until is not None:
+            self.bar_store.mark_market_covered(start_date, covered_until)
+
+    def _sync_periods(self, periods: Sequence[str]) -> List[str]:
+        synced = []
+        for period in periods:
+            df = self.client.get_fina_indicator_for_period(period)
+            if df is None or df.empty:
+                continue
+            self.xsection_store.write(FUNDAMENTAL_TABLE, period, df)
+            self.fundamentals.ingest(df, persist=False)
+            synced.append(period)
+        self.fundamentals.flush()
+        if synced:
+            checkpoint = self.load_checkpoint()
+            periods_done = checkpoint.get('periods') or {}
+            now_str = datetime.now().isoformat(timespec='seconds')
+            periods_done.update({p: now_str for p in synced})
+            checkpoint['periods'] = periods_done
+            self._save_checkpoint(checkpoint)
+        return synced
+
+    def _build_factors(self, committed: Sequence[str], periods_synced: Sequence[str]) -> Optional[str]:
+        """
+        为最新已提交交易日构建因子表：有新交易日、有新财报、或当日因子表尚不存在时构建。
+        构建失败只记录日志，不影响本次同步的结果。
+        """
+        latest = self.latest_committed_date()
+        if latest is None:
+            return None
+        if not committed and not periods_synced and self.selection_engine.factors.has(latest):
+            return None
+        try:
+            return latest if self.selection_engine.build_factors(latest) is not None else None
+        except Exception as e:
+            logger.exception(f"EODSync: failed to build factor table for {latest}: {e}")
+            return None
+
+    def run(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+            batch_size: int = 20, include_fundamentals: bool = True) -> Dict[str, Any]:
+        """执行一次增量同步，返回本次同步的摘要。同一进程内不会并发执行两次。"""
+        if not self._run_lock.acquire(blocking=False):
+            logger.warning("EODSync: a sync is already running, skipping.")
+            return {'status': 'skipped'}
+        try:
+            start_date, end_date = self._resolve_range(start_date, end_date)
+            calendar = self.calendar.dates_between(start_date, end_date)
+            pending = self.pending_trade_dates(start_date, end_date)
+            logger.info(f"EODSync: {len(pending)} pending trade dates in {start_date} - {end_date}.")
+            committed: List[str] = []
+            batch: List[str] = []
+            for trade_date in pending:
+                if not self._sync_date(trade_date):
+                    break  # 后面的日期更不可能有数据
+                batch.append(trade_date)
+                if len(batch) >= batch_size:
+                    self._commit_batch(batch)
+                    committed.extend(batch)
+                    batch = []
+            self._commit_batch(batch)
+            committed.extend(batch)
+            if committed:
+                # 已有的增量指标状态各滚动一根 K 线（横截面已在本地，不产生请求）
+                self.indicator_states.update_all(max(committed))
+                data_cache.publish_trade_date(max(committed))
+            if calendar:
+                self._mark_market_coverage(calendar, start_date, end_date)
+
+            periods_synced: List[str] = []
+            if include_fundamentals:
+                periods_synced = self._sync_periods(self.pending_periods(start_date, end_date))
+            factors_date = self._build_factors(committed, periods_synced)
+            if committed or periods_synced or factors_date:
+                selection_cache.invalidate() # 选股结果依赖的行情/财报/因子表已更新
+
+            checkpoint = self.load_checkpoint()
+            checkpoint['last_run_at'] = datetime.now().isoformat(timespec='seconds')
+            self._save_checkpoint(checkpoint)
+            return {'status': 'ok', 'trade_dates': committed, 'periods': periods_synced,
+                    'factors_date': factors_date, 'latest_trade_date': self.latest_committed_date()}
+        finally:
+            self._run_lock.release()
+
+
+eod_sync_job = EODSyncJob()
+
+
+async def run_scheduler(job: EODSyncJob = eod_sync_job) -> None:
+    """进程内定时器：每天 EOD_SYNC_TIME 在线程池中执行一次同步。"""
+    hour, minute = _parse_hhmm(settings.EOD_SYNC_TIME)
+    loop = asyncio.get_running_loop()
+    while True:
+        now = datetime.now()
+        next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        logger.info(f"EODSync scheduler: next run at {next_run.isoformat(timespec='minutes')}")
+        await asyncio.sleep((next_run - now).total_seconds())
+        try:
+            summary = await loop.run_in_executor(None, job.run)
+            logger.info(f"EODSync scheduler: run finished: {summary.get('status')}, latest={summary.get('latest_trade_date')}")
+        except Exception as e:
+            logger.exception(f"EODSync scheduler: run failed: {e}")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Incremental end-of-day market data sync.")
+    parser.add_argument('--start', help="起始日期 YYYYMMDD (默认：checkpoint 或 EOD_SYNC_LOOKBACK_DAYS)")
+    parser.add_argument('--end', help="结束日期 YYYYMMDD (默认：最新可发布交易日)")
+    parser.add_argument('--batch-size', type=int, default=20, help="每批提交的交易日数")
+    parser.add_argument('--no-fundamentals', action='store_true', help="不同步 fina_indicator")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    summary = eod_sync_job.run(start_date=args.start, end_date=args.end, batch_size=args.batch_size,
+                               include_fundamentals=not args.no_fundamentals)
+    print(json.dumps(summary, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
+# --- END OF FILE backend/app/services/eod_sync.py ---
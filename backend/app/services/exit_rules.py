@@ -0,0 +1,113 @@
+# --- START OF FILE backend/app/services/exit_rules.py ---
+"""
+向量化的退出规则引擎。
+
+整个持仓簿装成 NumPy 数组（成本价 / 数量 / 最新价），每条规则一次性在全部持仓上求出
+触发掩码和目标价，之后只为触发的持仓构造 ExitSignalItem。
+
+规则按 EXIT_RULES[strategy_id] 中的顺序排优先级：一个持仓只取第一条触发的规则
+（例如同时满足止盈和止损时记为止盈）。新增退出策略时注册一个返回 ExitRuleHit 列表的函数即可。
+"""
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.models.exit import ExitSignalItem
+from app.services.price_snapshot import PriceSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+class HoldingBook:
+    """一批持仓的列式视图；prices 中缺价的持仓为 NaN，不会触发任何规则。"""
+
+    def __init__(self, holdings: Sequence[Any], snapshot: PriceSnapshot):
+        self.ids = [h.id for h in holdings]
+        self.ts_codes = [h.ts_code for h in holdings]
+        self.cost_price = np.array([h.cost_price for h in holdings], dtype=np.float64)
+        self.quantity = np.array([h.quantity for h in holdings], dtype=np.float64)
+        self.prices = snapshot.prices(self.ts_codes)
+        self.trade_dates = [snapshot.price_of(code)[1] for code in self.ts_codes]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def priced(self) -> np.ndarray:
+        return ~np.isnan(self.prices)
+
+    def latest_trade_date(self) -> Optional[str]:
+        """有价持仓中最新的行情日期（YYYYMMDD）。"""
+        return max((d for d in self.trade_dates if d is not None), default=None)
+
+
+class ExitRuleHit:
+    """一条规则在整个持仓簿上的结果：触发掩码、各持仓的目标价，以及为触发行生成备注的函数。"""
+
+    def __init__(self, signal_type: str, mask: np.ndarray, target_prices: np.ndarray,
+                 notes: Callable[[float, float], str]):
+        self.signal_type = signal_type
+        self.mask = mask
+        self.target_prices = target_prices
+        self.notes = notes # (成本价, 目标价) -> 备注
+
+
+def fixed_profit_loss(book: HoldingBook, params: Dict[str, Any]) -> List[ExitRuleHit]:
+    take_profit_percent = params.get("take_profit_percent", 20.0) / 100.0 # 转为小数
+    stop_loss_percent = params.get("stop_loss_percent", -10.0) / 100.0   # 转为小数 (通常是负数)
+
+    profit_target_prices = book.cost_price * (1 + take_profit_percent)
+    loss_target_prices = book.cost_price * (1 + stop_loss_percent) # stop_loss_percent是负数
+    with np.errstate(invalid='ignore'): # 缺价 (NaN) 的比较为 False
+        take_profit = book.prices >= profit_target_prices
+        stop_loss = book.prices <= loss_target_prices
+
+    return [
+        ExitRuleHit("TAKE_PROFIT_FIXED", take_profit, profit_target_prices,
+                    lambda cost, target: f"达到固定止盈目标 ({params.get('take_profit_percent')}%)。成本价: {cost:.2f}, 目标价: {target:.2f}"),
+        ExitRuleHit("STOP_LOSS_FIXED", stop_loss, loss_target_prices,
+                    lambda cost, target: f"触发固定止损 ({params.get('stop_loss_percent')}%)。成本价: {cost:.2f}, 止损价: {target:.2f}"),
+    ]
+
+
+EXIT_RULES: Dict[str, Callable[[HoldingBook, Dict[str, Any]], List[ExitRuleHit]]] = {
+    "fixed_profit_loss": fixed_profit_loss,
+}
+
+
+def evaluate_exit_rules(strategy_id: str, book: HoldingBook, params: Dict[str, Any], trigger_date: str,
+                        name_of: Callable[[str], Optional[str]]) -> List[ExitSignalItem]:
+    """按持仓顺序返回触发的信号；未知策略不产生信号。"""
+    rule = EXIT_RULES.get(strategy_id)
+    if rule is None:
+        logger.warning(f"ExitRules: unknown exit strategy '{strategy_id}', no signals generated.")
+        return []
+    if len(book) == 0:
+        return []
+
+    hits = rule(book, params)
+    # 每个持仓取第一条触发的规则：逆序覆盖，优先级高的规则最后写入
+    fired = np.full(len(book), -1, dtype=np.int64)
+    for rule_index in range(len(hits) - 1, -1, -1):
+        fired[hits[rule_index].mask] = rule_index
+
+    signals: List[ExitSignalItem] = []
+    for row in np.flatnonzero(fired >= 0):
+        hit = hits[fired[row]]
+        cost = float(book.cost_price[row])
+        target = float(hit.target_prices[row])
+        signals.append(ExitSignalItem(
+            holding_id=book.ids[row],
+            ts_code=book.ts_codes[row],
+            name=name_of(book.ts_codes[row]),
+            signal_type=hit.signal_type,
+            trigger_date=trigger_date, # 用当前检查日期作为信号日期
+            trigger_price=float(book.prices[row]),
+            target_price=round(target, 2),
+            notes=hit.notes(cost, target),
+        ))
+    logger.info(f"ExitRules: '{strategy_id}' checked {int(book.priced.sum())}/{len(book)} priced holdings, "
+                f"{len(signals)} signals ({', '.join(f'{h.signal_type}={int((fired == i).sum())}' for i, h in enumerate(hits))}).")
+    return signals
+# --- END OF FILE backend/app/services/exit_rules.py ---
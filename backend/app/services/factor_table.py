@@ -0,0 +1,90 @@
+# --- START OF FILE backend/app/services/factor_table.py ---
+"""
+按交易日物化的全市场因子表：factors/<YYYYMMDD>.npy，每只上市股票一行（行序与证券主表一致）。
+
+列：close / pe_ttm / pb / dv_ratio / total_mv（当日 daily_basic），
+    roe / fina_pb（截至当日已公告的最新一期财报，roe 为小数），
+    momentum_1m / momentum_3m / momentum_6m / momentum_12m（前复权区间涨跌幅）。
+由 EOD 同步在最新交易日收盘数据落地后构建一次（SelectionEngine.build_factors）。
+
+选股时用 scan 读取：文件以 mmap 打开，where 中的条件逐列求掩码（谓词下推，NaN 不满足任何比较），
+只把通过的行、且只把 columns 中的列复制出来（列投影）。
+"""
+import logging
+import os
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.services.columnar_io import frame_to_records, load_records, save_records_atomic
+
+logger = logging.getLogger(__name__)
+
+FACTOR_MOMENTUM_MONTHS = (1, 3, 6, 12)
+FACTOR_OPS = {
+    '>': np.greater, '>=': np.greater_equal, '<': np.less, '<=': np.less_equal,
+    '==': np.equal, '!=': np.not_equal,
+}
+
+Predicate = Tuple[str, str, float] # (列名, 比较符, 值)，如 ('pb', '<=', 2.0)
+
+
+def momentum_column(window_months: int) -> str:
+    return f'momentum_{int(window_months)}m'
+
+
+class FactorTable:
+    def __init__(self, root: Optional[str] = None):
+        self.root = os.path.join(root or settings.MARKET_DATA_DIR, 'factors')
+
+    def _path(self, trade_date: str) -> str:
+        return os.path.join(self.root, f'{trade_date}.npy')
+
+    def has(self, trade_date: str) -> bool:
+        return os.path.exists(self._path(trade_date))
+
+    def version(self, trade_date: str) -> Optional[str]:
+        """当日因子表的版本（文件修改时间），不存在时为 None；重建后版本变化。"""
+        path = self._path(trade_date)
+        return str(os.path.getmtime(path)) if os.path.exists(path) else None
+
+    def dates(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name[:-4] for name in os.listdir(self.root) if name.endswith('.npy'))
+
+    def write(self, trade_date: str, factors: pd.DataFrame) -> None:
+        """factors 的 index 为 ts_code；保持传入的行序。"""
+        save_records_atomic(self._path(trade_date), frame_to_records(factors.rename_axis('ts_code').reset_index()))
+
+    def read(self, trade_date: str) -> Optional[np.ndarray]:
+        return load_records(self._path(trade_date))
+
+    def has_values(self, trade_date: str, column: str) -> bool:
+        """某列是否至少有一个非空值（例如财报接口不可用时 roe 整列为 NaN）。"""
+        records = self.read(trade_date)
+        return records is not None and column in records.dtype.names and bool(np.isfinite(records[column]).any())
+
+    def scan(self, trade_date: str, columns: Optional[Sequence[str]] = None,
+             where: Sequence[Predicate] = ()) -> Optional[pd.DataFrame]:
+        """
+        满足 where 中全部条件的行，index 为 ts_code，列为 columns（默认全部因子），保持表内行序。
+        当日因子表不存在时返回 None。
+        """
+        records = self.read(trade_date)
+        if records is None:
+            return None
+        mask = np.ones(len(records), dtype=bool)
+        with np.errstate(invalid='ignore'):
+            for column, op, value in where:
+                mask &= FACTOR_OPS[op](records[column], value)
+        rows = np.flatnonzero(mask)
+        names = list(columns) if columns is not None else [n for n in records.dtype.names if n != 'ts_code']
+        index = pd.Index(np.asarray(records['ts_code'][rows]).astype(object), name='ts_code')
+        return pd.DataFrame({name: np.asarray(records[name][rows]) for name in names}, index=index)
+
+
+factor_table = FactorTable()
+# --- END OF FILE backend/app/services/factor_table.py ---
@@ -0,0 +1,232 @@
+# --- START OF FILE backend/app/services/fundamentals_store.py ---
+"""
+时点 (point-in-time) 财务指标表。
+
+由按报告期的全市场批量拉取 (fina_indicator_vip，落盘在 xsection/fina_indicator/<period>.npy) 合并而成，
+每行以 (ts_code, ann_date, end_date) 为键，保存为一个列式文件 fundamentals/fina_indicator_pit.npy：
+- 同一报告期的更正公告是新的一行（ann_date 不同），旧版本保留，回测时可以看到当时实际公布的数字；
+- 表按 (ts_code, end_date, ann_date) 排序，“截至 D 日已知的最新一期” 是一次向量化的 as-of 连接：
+  过滤 ann_date <= D 后取每只股票的最后一行（报告期最新，同一报告期取最新公告）。
+- 缺少 ann_date 的行按 end_date 视为公告日。
+
+EOD 同步每拉取一个报告期就合并进来；请求处理时缺失的报告期按需拉取一次，
+接口返回空的报告期在下一次收盘数据发布前不会重复请求。
+仍在公告窗口内的报告期（结束后 PERIOD_REFRESH_DAYS 天内）随时会有新公司公告，
+拉取到的数据在下一次收盘数据发布后过期，之后再用到时重新拉取，而不是把第一次拉到的部分数据当作最终结果。
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.services.bulk_loader import CrossSectionStore
+from app.services.columnar_io import frame_to_records, load_records, records_to_frame, save_records_atomic
+from app.services.trading_calendar import next_publish_time
+
+logger = logging.getLogger(__name__)
+
+FUNDAMENTAL_TABLE = 'fina_indicator'
+PIT_KEY_FIELDS = ('ts_code', 'ann_date', 'end_date')
+PIT_VALUE_FIELDS = ('roe', 'roe_yearly', 'roe_waa', 'q_roe', 'pb')
+# 报告期结束后约 4 个月内 (年报截止 4 月 30 日) 仍可能有新公告，这段时间内的数据需要定期重新拉取
+PERIOD_REFRESH_DAYS = 125
+
+
+def report_periods(start_date: str, end_date: str) -> List[str]:
+    """[start_date, end_date] 内已经结束的季度报告期 (YYYYMMDD)。"""
+    periods = []
+    for year in range(int(start_date[:4]), int(end_date[:4]) + 1):
+        for month_day in ('0331', '0630', '0930', '1231'):
+            period = f'{year}{month_day}'
+            if start_date <= period <= end_date:
+                periods.append(period)
+    return periods
+
+
+def period_is_open(period: str, now: Optional[datetime] = None) -> bool:
+    """报告期是否仍在公告窗口内。"""
+    return period >= ((now or datetime.now()) - timedelta(days=PERIOD_REFRESH_DAYS)).strftime('%Y%m%d')
+
+
+def normalize_fina_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    fina_indicator 结果 -> 时点表的行：ts_code 为字符串，ann_date / end_date 为 int (YYYYMMDD)，指标列为 float。
+    按 (ts_code, end_date, ann_date) 排序并按键去重（后出现的优先）。
+    """
+    out = pd.DataFrame({'ts_code': df['ts_code'].astype(str).to_numpy()})
+    end_date = pd.to_numeric(df['end_date'], errors='coerce').to_numpy(dtype=np.float64)
+    ann_date = pd.to_numeric(df['ann_date'], errors='coerce').to_numpy(dtype=np.float64) \
+        if 'ann_date' in df.columns else np.full(len(df), np.nan)
+    out['ann_date'] = np.where(np.isnan(ann_date), end_date, ann_date)
+    out['end_date'] = end_date
+    for field in PIT_VALUE_FIELDS:
+        out[field] = pd.to_numeric(df[field], errors='coerce').to_numpy(dtype=np.float64) \
+            if field in df.columns else np.nan
+    out = out[~np.isnan(out['end_date'].to_numpy())]
+    out['ann_date'] = out['ann_date'].astype(np.int32)
+    out['end_date'] = out['end_date'].astype(np.int32)
+    out = out.drop_duplicates(list(PIT_KEY_FIELDS), keep='last')
+    return out.sort_values(['ts_code', 'end_date', 'ann_date'], kind='mergesort').reset_index(drop=True)
+
+
+def last_known_positions(code_ids: np.ndarray, ann_dates: np.ndarray, as_of: int) -> np.ndarray:
+    """
+    按 (代码, end_date, ann_date) 排好序的表中，每只股票 ann_date <= as_of 的最后一行的位置。
+    一次布尔过滤 + 相邻比较，O(N)。
+    """
+    idx = np.flatnonzero(ann_dates <= as_of)
+    if not len(idx):
+        return idx
+    group = code_ids[idx]
+    return idx[np.append(group[1:] != group[:-1], True)]
+
+
+def roe_and_pb(rows: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """roe 依次取 roe_yearly、roe_waa、roe 中第一个非空值并换算为小数；pb 原样返回。"""
+    roe = np.full(len(rows), np.nan)
+    for column in ('roe', 'roe_waa', 'roe_yearly'): # 后写入的优先级更高
+        if column in rows.columns:
+            values = rows[column].to_numpy(dtype=np.float64)
+            roe = np.where(np.isnan(values), roe, values)
+    pb = rows['pb'].to_numpy(dtype=np.float64) if 'pb' in rows.columns else np.full(len(rows), np.nan)
+    return roe / 100.0, pb
+
+
+class PointInTimeTable:
+    """某一时刻的时点表（不可变，合并新数据时整体替换）。"""
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame
+        code_ids, codes = pd.factorize(frame['ts_code'], sort=True) # 表已按 ts_code 排序，id 单调
+        self.code_ids = code_ids.astype(np.int32)
+        self.codes = np.asarray(codes, dtype=object)
+        self.ann_dates = frame['ann_date'].to_numpy(dtype=np.int32)
+        self.end_dates = frame['end_date'].to_numpy(dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def as_of(self, as_of: str, ts_codes: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        截至 as_of (YYYYMMDD，含当日公告) 每只股票已知的最新一期，index 为 ts_code，
+        列为 ann_date / end_date (字符串) 与 PIT_VALUE_FIELDS。ts_codes 不为 None 时按其重排，未知的行为 NaN。
+        """
+        rows = self.frame.iloc[last_known_positions(self.code_ids, self.ann_dates, int(as_of))]
+        out = rows.set_index('ts_code')
+        out.index.name = 'ts_code'
+        out['ann_date'] = out['ann_date'].astype(str)
+        out['end_date'] = out['end_date'].astype(str)
+        return out.reindex(pd.Index(ts_codes, dtype=object, name='ts_code')) if ts_codes is not None else out
+
+
+class FundamentalsStore:
+    def __init__(self, root: Optional[str] = None, xsection_store: Optional[CrossSectionStore] = None, client=None):
+        self._client = client
+        self.xsection_store = xsection_store or CrossSectionStore(root)
+        self.path = os.path.join(root or settings.MARKET_DATA_DIR, 'fundamentals', 'fina_indicator_pit.npy')
+        self._lock = threading.RLock()
+        self._table: Optional[PointInTimeTable] = None
+        self._mtime: Optional[float] = None # 已加载文件的修改时间；其它进程（命令行同步）写入后重新加载
+        self._dirty = False
+        self._unavailable: Dict[str, float] = {} # 报告期 -> 重试时间（接口返回空）
+        self._fetched_at: Dict[str, float] = {} # 报告期 -> 本进程最近一次拉取的时间
+
+    @property
+    def client(self):
+        # 延迟导入，避免与 tushare_client 的循环依赖
+        if self._client is None:
+            from app.services.tushare_client import ts_client
+            self._client = ts_client
+        return self._client
+
+    def _file_mtime(self) -> Optional[float]:
+        return os.path.getmtime(self.path) if os.path.exists(self.path) else None
+
+    def table(self) -> PointInTimeTable:
+        if self._table is None or (not self._dirty and self._file_mtime() != self._mtime):
+            with self._lock:
+                mtime = self._file_mtime()
+                if self._table is None or (not self._dirty and mtime != self._mtime):
+                    records = load_records(self.path, mmap=False)
+                    frame = records_to_frame(records) if records is not None and len(records) else \
+                        normalize_fina_frame(pd.DataFrame(columns=list(PIT_KEY_FIELDS)))
+                    self._table = PointInTimeTable(frame)
+                    self._mtime = mtime
+        return self._table
+
+    def ingest(self, df: Optional[pd.DataFrame], persist: bool = True) -> int:
+        """把一批 fina_indicator 行合并进时点表（同键以新数据为准），返回新增/更新的行数。"""
+        if df is None or df.empty:
+            return 0
+        rows = normalize_fina_frame(df)
+        with self._lock:
+            merged = normalize_fina_frame(pd.concat([self.table().frame, rows], ignore_index=True))
+            self._table = PointInTimeTable(merged)
+            self._dirty = True
+            if persist:
+                self.flush()
+        return len(rows)
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            save_records_atomic(self.path, frame_to_records(self._table.frame))
+            self._mtime = self._file_mtime()
+            self._dirty = False
+
+    def _is_expired(self, period: str) -> bool:
+        """仍在公告窗口内的报告期，上次拉取（本进程或 EOD 同步写入的横截面）之后已有新的收盘数据发布。"""
+        if not period_is_open(period):
+            return False
+        fetched_at = self._fetched_at.get(period) or self.xsection_store.modified_at(FUNDAMENTAL_TABLE, period)
+        if fetched_at is None:
+            return True
+        return time.time() >= next_publish_time(datetime.fromtimestamp(fetched_at)).timestamp()
+
+    def _load_period(self, period: str) -> bool:
+        """
+        把某报告期并入时点表：优先读本地横截面，没有或已过期时拉取一次并落盘。
+        接口无数据时退回本地已有的横截面；两者都没有时返回 False。
+        """
+        records = self.xsection_store.read(FUNDAMENTAL_TABLE, period)
+        has_local = records is not None and len(records) > 0
+        if has_local and not self._is_expired(period):
+            self.ingest(records_to_frame(records), persist=False)
+            return True
+        df = None
+        if time.time() >= self._unavailable.get(period, 0.0):
+            df = self.client.get_fina_indicator_for_period(period)
+            if df is None or df.empty:
+                self._unavailable[period] = next_publish_time().timestamp()
+                df = None
+        if df is None:
+            if has_local:
+                self.ingest(records_to_frame(records), persist=False)
+            return has_local
+        self.xsection_store.write(FUNDAMENTAL_TABLE, period, df)
+        self._fetched_at[period] = time.time()
+        self.ingest(df, persist=False)
+        return True
+
+    def ensure_periods(self, periods: Sequence[str]) -> List[str]:
+        """确保这些报告期已并入时点表（公告窗口内的报告期过期后重新拉取），返回有批量数据的报告期。"""
+        with self._lock:
+            present = set(self.table().end_dates.astype(str))
+            available = [p for p in periods
+                         if (p in present and not self._is_expired(p)) or self._load_period(p) or p in present]
+            self.flush()
+        return available
+
+    def as_of(self, as_of: str, ts_codes: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        return self.table().as_of(as_of, ts_codes)
+
+
+fundamentals_store = FundamentalsStore()
+# --- END OF FILE backend/app/services/fundamentals_store.py ---
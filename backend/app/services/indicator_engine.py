@@ -0,0 +1,128 @@
+# --- START OF FILE backend/app/services/indicator_engine.py ---
+"""
+面板指标引擎：输入 date x ticker 的 float64 矩阵，对所有列一次性计算指标。
+
+- sma:          简单移动平均，与 talib.SMA 一致（窗口内有 NaN 时结果为 NaN）；
+- rsi:          Wilder RSI，与 talib.RSI 一致（前 period 个差分取均值作为种子，之后递推平滑）；
+- cross_above / cross_below: 均线金叉 / 死叉；lag: 取前 N 根 K 线的值；
+- align_right:  把每列的有效值压到矩阵底部。逐只计算时停牌日没有 K 线行，
+                对齐后面板最后一行就是每只股票自己的最新 K 线，指标结果与逐只计算相同；
+                source_rows 给出对齐后每个格子原来的行号，用于历史扫描时还原事件日期。
+
+RSI 的递推只能按时间顺序进行，这里按行循环、每一步对所有股票向量化，循环次数等于回溯的 K 线数。
+"""
+from typing import Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Wilder 平滑的 RSI 依赖全部历史，在最少所需的 K 线之外再多取这么多根用于收敛
+RSI_WARMUP_BARS = 60
+
+
+def align_right(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    把每列的有效值（非 NaN）按原顺序移到底部，上方补 NaN。
+    返回 (对齐后的矩阵, 每列有效值个数, 每列最后一个有效值在原矩阵中的行号；没有有效值时为 -1)。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n_rows, n_cols = values.shape
+    valid = ~np.isnan(values)
+    counts = valid.sum(axis=0)
+    aligned = np.full_like(values, np.nan)
+    rows, cols = np.nonzero(valid)
+    # np.nonzero 按行优先返回，同一列内的有效值保持时间顺序
+    rank = np.cumsum(valid, axis=0)[rows, cols] - 1
+    aligned[n_rows - counts[cols] + rank, cols] = values[rows, cols]
+    last_rows = np.full(n_cols, -1, dtype=np.int64)
+    has_rows = counts > 0 # 空面板（0 行）或整列无数据时 argmax 没有意义，保持 -1
+    if has_rows.any():
+        last_rows[has_rows] = n_rows - 1 - np.argmax(valid[::-1][:, has_rows], axis=0)
+    return aligned, counts, last_rows
+
+
+def source_rows(values: np.ndarray) -> np.ndarray:
+    """align_right 之后每个格子对应的原矩阵行号（上方补齐的格子为 -1），用于把对齐空间里的事件映射回交易日。"""
+    values = np.asarray(values, dtype=np.float64)
+    n_rows = values.shape[0]
+    valid = ~np.isnan(values)
+    counts = valid.sum(axis=0)
+    out = np.full(values.shape, -1, dtype=np.int64)
+    if n_rows == 0:
+        return out
+    rows, cols = np.nonzero(valid)
+    rank = np.cumsum(valid, axis=0)[rows, cols] - 1
+    out[n_rows - counts[cols] + rank, cols] = rows
+    return out
+
+
+def sma(values: np.ndarray, period: int) -> np.ndarray:
+    """按列计算 period 日简单移动平均，前 period - 1 行为 NaN。"""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full_like(values, np.nan)
+    if period < 1 or values.shape[0] < period:
+        return out
+    out[period - 1:] = sliding_window_view(values, period, axis=0).mean(axis=-1)
+    return out
+
+
+def rsi(values: np.ndarray, period: int = 14) -> np.ndarray:
+    """
+    按列计算 Wilder RSI。每列从第一个有效值开始计算（与 talib 跳过开头 NaN 的行为一致），
+    第一个 RSI 出现在第一个有效值之后第 period 行。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n_rows, n_cols = values.shape
+    out = np.full_like(values, np.nan)
+    if period < 1 or n_rows <= period:
+        return out
+    valid = ~np.isnan(values)
+    start = np.where(valid.any(axis=0), np.argmax(valid, axis=0), n_rows)
+    diff = np.diff(values, axis=0)
+    gains = np.where(diff > 0, diff, 0.0)
+    losses = np.where(diff < 0, -diff, 0.0)
+    avg_gain = np.zeros(n_cols)
+    avg_loss = np.zeros(n_cols)
+    for row in range(1, n_rows):
+        gain, loss = gains[row - 1], losses[row - 1]
+        k = row - start # 当前是该列的第 k 个差分
+        seeding = (k >= 1) & (k <= period)
+        avg_gain[seeding] += gain[seeding]
+        avg_loss[seeding] += loss[seeding]
+        seeded = k == period
+        avg_gain[seeded] /= period
+        avg_loss[seeded] /= period
+        smoothing = k > period
+        avg_gain[smoothing] = (avg_gain[smoothing] * (period - 1) + gain[smoothing]) / period
+        avg_loss[smoothing] = (avg_loss[smoothing] * (period - 1) + loss[smoothing]) / period
+        emit = k >= period
+        total = avg_gain[emit] + avg_loss[emit]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out[row, emit] = np.where(total != 0, 100.0 * avg_gain[emit] / total, 0.0)
+    return out
+
+
+def lag(values: np.ndarray, periods: int = 1) -> np.ndarray:
+    """整体下移 periods 行，上方补 NaN。在对齐空间里即每只股票前 periods 根 K 线的值。"""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full_like(values, np.nan)
+    if 0 < periods < values.shape[0]:
+        out[periods:] = values[:-periods]
+    return out
+
+
+def cross_above(fast: np.ndarray, slow: np.ndarray) -> np.ndarray:
+    """fast 在当行上穿 slow：前一行 fast < slow 且当行 fast >= slow。第一行恒为 False。"""
+    out = np.zeros(np.shape(fast), dtype=bool)
+    with np.errstate(invalid='ignore'):
+        out[1:] = (fast[:-1] < slow[:-1]) & (fast[1:] >= slow[1:])
+    return out
+
+
+def cross_below(fast: np.ndarray, slow: np.ndarray) -> np.ndarray:
+    """fast 在当行下穿 slow：前一行 fast > slow 且当行 fast <= slow。第一行恒为 False。"""
+    out = np.zeros(np.shape(fast), dtype=bool)
+    with np.errstate(invalid='ignore'):
+        out[1:] = (fast[:-1] > slow[:-1]) & (fast[1:] <= slow[1:])
+    return out
+# --- END OF FILE backend/app/services/indicator_engine.py ---
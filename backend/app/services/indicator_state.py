@@ -0,0 +1,277 @@
+# --- START OF FILE backend/app/services/indicator_state.py ---
+"""
+增量指标状态：每个 (指标, 字段, 周期) 一份全市场状态文件，每个交易日每只股票只喂入一根新 K 线。
+
+- rsi:  Wilder 平滑的平均涨幅 / 平均跌幅（与 indicator_engine.rsi 的递推完全相同）；
+- sma:  最近 period 个值的环形缓冲区 + 滑动和，缓冲区每转一圈用精确求和校正一次累计误差。
+
+价格按后复权 (close * adj_factor) 喂入：后复权序列不会因为新的除权而改写历史，
+而 RSI 与缩放无关，SMA 除以最新复权因子 (scale) 即为前复权值，与按 qfq 逐只计算的结果一致。
+
+目录布局：
+    <MARKET_DATA_DIR>/indicator_state/<kind>_<field>_<period>.npy
+
+状态按股票记录 last_date，只接受更晚的交易日，重复喂入同一天是幂等的；
+EOD 同步提交新交易日后调用 update_all 滚动所有已有的状态文件。
+"""
+import logging
+import os
+import re
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.services.bulk_loader import CrossSectionStore
+from app.services.columnar_io import load_records, save_records_atomic
+from app.services.indicator_engine import RSI_WARMUP_BARS
+from app.services.trading_calendar import trading_calendar
+
+logger = logging.getLogger(__name__)
+
+KINDS = ('rsi', 'sma')
+FIELDS = ('close', 'vol')
+_STATE_FILE = re.compile(r'^(rsi|sma)_(close|vol)_(\d+)\.npy$')
+SMA_BOOTSTRAP_BUFFER = 10 # 首次建立 SMA 状态时多回溯的交易日，覆盖短暂停牌
+
+
+class IndicatorState:
+    """一个 (kind, field, period) 的全市场状态，各数组按股票行对齐。"""
+
+    def __init__(self, kind: str, field: str, period: int, path: str):
+        if kind not in KINDS or field not in FIELDS or period < 1:
+            raise ValueError(f"Unsupported indicator state: {kind}/{field}/{period}")
+        self.kind = kind
+        self.field = field
+        self.period = period
+        self.path = path
+        self.codes = np.array([], dtype=object)
+        self._rows: Dict[str, int] = {}
+        self.arrays: Dict[str, np.ndarray] = self._empty(0)
+
+    def _empty(self, n: int) -> Dict[str, np.ndarray]:
+        arrays = {
+            'last_date': np.zeros(n, dtype=np.int32), # 最后一次喂入的交易日 (YYYYMMDD)
+            'count': np.zeros(n, dtype=np.int64), # 已喂入的 K 线数
+            'last_input': np.full(n, np.nan), # 最后一次喂入的值（后复权价 / 成交量）
+            'scale': np.ones(n), # 最后一次喂入时的复权因子，value / scale 为前复权口径
+            'value': np.full(n, np.nan), # 当前指标值
+            'prev_value': np.full(n, np.nan), # 前一根 K 线的指标值
+        }
+        if self.kind == 'rsi':
+            arrays['avg_gain'] = np.zeros(n)
+            arrays['avg_loss'] = np.zeros(n)
+        else:
+            arrays['ring'] = np.full((n, self.period), np.nan)
+            arrays['total'] = np.zeros(n)
+        return arrays
+
+    @property
+    def as_of(self) -> Optional[str]:
+        """状态已经滚动到的最新交易日。"""
+        if not len(self.codes) or not self.arrays['last_date'].max():
+            return None
+        return str(int(self.arrays['last_date'].max()))
+
+    # --- 持久化 ---
+    def load(self) -> 'IndicatorState':
+        records = load_records(self.path, mmap=False)
+        if records is None:
+            return self
+        self.codes = records['ts_code'].astype(object)
+        self._rows = {c: i for i, c in enumerate(self.codes)}
+        self.arrays = {name: np.array(records[name]) for name in self._empty(0)}
+        return self
+
+    def save(self) -> None:
+        columns = [('ts_code', f'U{max((len(c) for c in self.codes), default=1)}')]
+        columns += [(name, values.dtype.str, values.shape[1:]) for name, values in self.arrays.items()]
+        records = np.empty(len(self.codes), dtype=columns)
+        records['ts_code'] = self.codes
+        for name, values in self.arrays.items():
+            records[name] = values
+        save_records_atomic(self.path, records)
+
+    # --- 更新 ---
+    def _rows_for(self, codes: np.ndarray) -> np.ndarray:
+        new_codes = [c for c in dict.fromkeys(codes) if c not in self._rows]
+        if new_codes:
+            start = len(self.codes)
+            self.codes = np.concatenate([self.codes, np.array(new_codes, dtype=object)])
+            self._rows.update({c: start + i for i, c in enumerate(new_codes)})
+            extra = self._empty(len(new_codes))
+            self.arrays = {name: np.concatenate([values, extra[name]]) for name, values in self.arrays.items()}
+        return np.fromiter((self._rows[c] for c in codes), dtype=np.int64, count=len(codes))
+
+    def update(self, trade_date: str, codes: np.ndarray, values: np.ndarray, scales: np.ndarray) -> int:
+        """喂入一个交易日的横截面；只更新 last_date 早于 trade_date 的股票，返回更新的股票数。"""
+        date_int = int(trade_date)
+        usable = ~np.isnan(values)
+        rows = self._rows_for(np.asarray(codes)[usable])
+        values, scales = values[usable], scales[usable]
+        a = self.arrays
+        fresh = a['last_date'][rows] < date_int
+        rows, values, scales = rows[fresh], values[fresh], scales[fresh]
+        if not len(rows):
+            return 0
+
+        a['prev_value'][rows] = a['value'][rows]
+        if self.kind == 'rsi':
+            self._update_rsi(rows, values)
+        else:
+            self._update_sma(rows, values)
+        a['count'][rows] += 1
+        a['last_input'][rows] = values
+        a['scale'][rows] = scales
+        a['last_date'][rows] = date_int
+        return len(rows)
+
+    def _update_rsi(self, rows: np.ndarray, values: np.ndarray) -> None:
+        a, period = self.arrays, self.period
+        k = a['count'][rows] # 本次是该股票的第 k 个差分（第一根 K 线 k = 0，只记录价格）
+        diff = values - a['last_input'][rows]
+        gain = np.where(diff > 0, diff, 0.0)
+        loss = np.where(diff < 0, -diff, 0.0)
+        avg_gain, avg_loss = a['avg_gain'][rows], a['avg_loss'][rows]
+        seeding = (k >= 1) & (k <= period)
+        avg_gain[seeding] += gain[seeding]
+        avg_loss[seeding] += loss[seeding]
+        seeded = k == period
+        avg_gain[seeded] /= period
+        avg_loss[seeded] /= period
+        smoothing = k > period
+        avg_gain[smoothing] = (avg_gain[smoothing] * (period - 1) + gain[smoothing]) / period
+        avg_loss[smoothing] = (avg_loss[smoothing] * (period - 1) + loss[smoothing]) / period
+        a['avg_gain'][rows], a['avg_loss'][rows] = avg_gain, avg_loss
+        emit = k >= period
+        total = avg_gain[emit] + avg_loss[emit]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            a['value'][rows[emit]] = np.where(total != 0, 100.0 * avg_gain[emit] / total, 0.0)
+
+    def _update_sma(self, rows: np.ndarray, values: np.ndarray) -> None:
+        a, period = self.arrays, self.period
+        pos = a['count'][rows] % period
+        evicted = a['ring'][rows, pos]
+        a['total'][rows] += values - np.where(np.isnan(evicted), 0.0, evicted)
+        a['ring'][rows, pos] = values
+        wrapped = rows[pos == period - 1] # 缓冲区写满一圈：用精确求和消除滑动和的累计误差
+        a['total'][wrapped] = a['ring'][wrapped].sum(axis=1)
+        full = a['count'][rows] + 1 >= period
+        a['value'][rows[full]] = a['total'][rows[full]] / period
+
+    # --- 读取 ---
+    def snapshot(self, ts_codes: Sequence[str]) -> pd.DataFrame:
+        """
+        按 ts_codes 顺序返回 count / last_date / last_input / scale / value / prev_value。
+        不在状态中的股票 count 为 0。与 update 并发时须经 IndicatorStateStore.snapshot 在锁内调用。
+        """
+        rows = np.fromiter((self._rows.get(c, -1) for c in ts_codes), dtype=np.int64, count=len(ts_codes))
+        known = rows >= 0
+        empty = self._empty(len(ts_codes))
+        data = {}
+        for name in ('count', 'last_date', 'last_input', 'scale', 'value', 'prev_value'):
+            column = empty[name]
+            column[known] = self.arrays[name][rows[known]]
+            data[name] = column
+        return pd.DataFrame(data, index=pd.Index(ts_codes, name='ts_code'))
+
+
+class IndicatorStateStore:
+    def __init__(self, root: Optional[str] = None, xsection_store: Optional[CrossSectionStore] = None):
+        self.root = os.path.join(root or settings.MARKET_DATA_DIR, 'indicator_state')
+        self.xsection_store = xsection_store or CrossSectionStore(root)
+        self._states: Dict[Tuple[str, str, int], IndicatorState] = {}
+        self._short_history: Dict[Tuple[str, str, int], str] = {} # 本地历史不足以建立状态的 (指标, as_of)
+        self._lock = threading.RLock()
+
+    def _path(self, kind: str, field: str, period: int) -> str:
+        return os.path.join(self.root, f'{kind}_{field}_{period}.npy')
+
+    def get(self, kind: str, field: str, period: int) -> IndicatorState:
+        key = (kind, field, int(period))
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                state = IndicatorState(kind, field, int(period), self._path(*key)).load()
+                self._states[key] = state
+            return state
+
+    def snapshot(self, kind: str, field: str, period: int, ts_codes: Sequence[str]) -> pd.DataFrame:
+        """
+        在存储锁内读取状态快照（见 IndicatorState.snapshot）。EOD 同步在另一个线程里原地更新状态数组，
+        不加锁读取可能得到 prev_value / value / count 新旧混杂的一行。
+        """
+        with self._lock:
+            return self.get(kind, field, period).snapshot(ts_codes)
+
+    def tracked(self) -> Sequence[Tuple[str, str, int]]:
+        """磁盘上已有的状态文件 (kind, field, period)。"""
+        if not os.path.isdir(self.root):
+            return []
+        matches = (_STATE_FILE.match(name) for name in sorted(os.listdir(self.root)))
+        return [(m.group(1), m.group(2), int(m.group(3))) for m in matches if m]
+
+    def _cross_section(self, field: str, trade_date: str) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """某交易日横截面的 (ts_code, 喂入值, scale)。价格为后复权价，scale 为当日复权因子。"""
+        bars = self.xsection_store.read('daily', trade_date)
+        if bars is None or not len(bars):
+            return None
+        codes = np.asarray(bars['ts_code'])
+        values = np.asarray(bars[field], dtype=np.float64)
+        if field != 'close':
+            return codes, values, np.ones(len(codes))
+        factors = self.xsection_store.read('adj_factor', trade_date)
+        if factors is None or not len(factors):
+            return None
+        factor_index = pd.Index(np.asarray(factors['ts_code']))
+        pos = factor_index.get_indexer(codes)
+        scales = np.where(pos >= 0, np.asarray(factors['adj_factor'], dtype=np.float64)[pos], np.nan)
+        return codes, values * scales, scales
+
+    def _bootstrap_length(self, kind: str, period: int) -> int:
+        return period + 1 + RSI_WARMUP_BARS if kind == 'rsi' else period + SMA_BOOTSTRAP_BUFFER
+
+    def ensure_current(self, kind: str, field: str, period: int, as_of: str) -> Optional[IndicatorState]:
+        """
+        把状态滚动到 as_of。只读取本地横截面；as_of 的横截面尚未落盘时返回 None。
+        新建的状态从 as_of 之前足够长的窗口开始喂入；本地同步的历史不够这个窗口时（例如 eod_sync --start
+        从最近的日期开始）不建立状态、返回 None，由调用方改用按面板计算，直到本地历史足够。
+        """
+        key = (kind, field, int(period))
+        with self._lock:
+            state = self.get(kind, field, period)
+            if state.as_of is not None and state.as_of >= as_of:
+                return state
+            if not self.xsection_store.has('daily', as_of) or self._short_history.get(key) == as_of:
+                return None
+            bootstrapping = state.as_of is None
+            bootstrap_length = self._bootstrap_length(kind, period)
+            start = trading_calendar.next_trade_date(state.as_of) if not bootstrapping else \
+                trading_calendar.shift(as_of, -(bootstrap_length - 1))
+            fed = 0
+            for trade_date in trading_calendar.dates_between(start, as_of):
+                section = self._cross_section(field, trade_date)
+                if section is None:
+                    continue
+                state.update(trade_date, *section)
+                fed += 1
+            if bootstrapping and fed < bootstrap_length:
+                logger.warning(f"IndicatorState: only {fed}/{bootstrap_length} local trade dates up to {as_of} "
+                               f"for {kind}_{field}_{period}, not building the state.")
+                self._states.pop(key, None) # 丢弃不完整的状态，下次从头建立
+                self._short_history[key] = as_of # 同一交易日内不再重复尝试
+                return None
+            state.save()
+            logger.info(f"IndicatorState: {kind}_{field}_{period} advanced {fed} trade dates to {state.as_of}.")
+            return state
+
+    def update_all(self, as_of: str) -> None:
+        """EOD 同步提交新交易日后，滚动所有已有的状态文件。"""
+        for kind, field, period in self.tracked():
+            self.ensure_current(kind, field, period, as_of)
+
+
+indicator_states = IndicatorStateStore()
+# --- END OF FILE backend/app/services/indicator_state.py ---
@@ -0,0 +1,74 @@
+# --- START OF FILE backend/app/services/pool_pagination.py ---
+"""
+选股结果的服务端排序与游标分页。
+
+排名结果整体缓存在 selection_cache 中，分页只是在同一份结果上切片：
+- 游标是 base64url(JSON)，记录结果快照（缓存键前缀）、排序键、排序方向和偏移量；
+- 数据更新（新交易日 / 因子表重建 / 参数不同）后快照变化，旧游标报 InvalidCursorError，客户端从第一页重新开始；
+- 排序键为 SelectedPoolItem 的字段，值为空的行无论升降序都排在最后，同值保持排名顺序。
+"""
+import base64
+import binascii
+import json
+from typing import List, Optional, Tuple
+
+from app.models.strategy import SelectedPoolItem
+
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 500
+SORT_ORDERS = ('asc', 'desc')
+SORT_KEYS = tuple(SelectedPoolItem.__fields__) # 可排序字段：ts_code / name / roe / pb / ... / composite_score
+_SNAPSHOT_PREFIX = 16 # 游标中只保存缓存键的前 16 位
+
+
+class InvalidCursorError(ValueError):
+    """游标无法解析，或者对应的结果快照已经过期。"""
+
+
+def sort_pool_items(items: List[SelectedPoolItem], sort_by: Optional[str], sort_order: str = 'desc') -> List[SelectedPoolItem]:
+    """sort_by 为 None 时保持策略的排名顺序。"""
+    if sort_by is None:
+        return items
+    if sort_by not in SORT_KEYS:
+        raise ValueError(f"Unknown sort key '{sort_by}', expected one of {SORT_KEYS}")
+    if sort_order not in SORT_ORDERS:
+        raise ValueError(f"Unknown sort order '{sort_order}', expected one of {SORT_ORDERS}")
+    present = [item for item in items if getattr(item, sort_by) is not None]
+    missing = [item for item in items if getattr(item, sort_by) is None]
+    present.sort(key=lambda item: getattr(item, sort_by), reverse=sort_order == 'desc') # sort 是稳定的，reverse 也不打乱同值顺序
+    return present + missing
+
+
+def encode_cursor(snapshot: str, sort_by: Optional[str], sort_order: str, offset: int) -> str:
+    payload = json.dumps({'k': snapshot[:_SNAPSHOT_PREFIX], 's': sort_by, 'd': sort_order, 'o': offset}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, snapshot: str) -> Tuple[Optional[str], str, int]:
+    """返回 (sort_by, sort_order, offset)；游标损坏或快照不一致时抛 InvalidCursorError。"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8'))
+        sort_by, sort_order, offset, key = payload['s'], payload['d'], int(payload['o']), payload['k']
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError):
+        raise InvalidCursorError("Malformed cursor.")
+    if key != snapshot[:_SNAPSHOT_PREFIX]:
+        raise InvalidCursorError("Cursor is stale: the selection result has been refreshed, restart from the first page.")
+    if offset < 0:
+        raise InvalidCursorError("Malformed cursor.")
+    return sort_by, sort_order, offset
+
+
+def paginate(snapshot: str, items: List[SelectedPoolItem], sort_by: Optional[str] = None, sort_order: str = 'desc',
+             cursor: Optional[str] = None, limit: Optional[int] = DEFAULT_PAGE_LIMIT) -> Tuple[List[SelectedPoolItem], Optional[str]]:
+    """
+    返回 (本页, 下一页游标)。给出 cursor 时排序键与方向以游标为准；limit 为 None 时返回剩余全部。
+    最后一页的下一页游标为 None。
+    """
+    offset = 0
+    if cursor:
+        sort_by, sort_order, offset = decode_cursor(cursor, snapshot)
+    ordered = sort_pool_items(items, sort_by, sort_order)
+    end = len(ordered) if limit is None else offset + min(max(int(limit), 1), MAX_PAGE_LIMIT)
+    next_cursor = encode_cursor(snapshot, sort_by, sort_order, end) if end < len(ordered) else None
+    return ordered[offset:end], next_cursor
+# --- END OF FILE backend/app/services/pool_pagination.py ---
@@ -0,0 +1,96 @@
+# --- START OF FILE backend/app/services/price_snapshot.py ---
+"""
+持仓最新价快照：一次性解析一批股票的最新收盘价及其交易日，供同一请求内的持仓展示、盈亏计算和退出信号检查共用。
+
+- 先取最新交易日的全市场 daily_basic（本地横截面或一次请求，带缓存），覆盖绝大多数持仓；
+- 当日没有 daily_basic 的股票（停牌等）再用一张最近 5 个交易日的未复权日线面板补齐，取各自最后一根 K 线。
+一个持仓簿因此只需要一到两次数据调用，而不是每只股票一到两次。
+"""
+import logging
+from datetime import datetime
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.trading_calendar import trading_calendar
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_LOOKBACK_TRADE_DAYS = 4 # 回退面板覆盖今天及之前 4 个交易日
+
+
+class PriceSnapshot:
+    """ts_code -> (最新收盘价, 交易日 YYYYMMDD)；不可变。"""
+
+    def __init__(self, prices: Dict[str, Tuple[float, str]]):
+        self._prices = prices
+
+    def __len__(self) -> int:
+        return len(self._prices)
+
+    def price_of(self, ts_code: str) -> Tuple[Optional[float], Optional[str]]:
+        return self._prices.get(ts_code, (None, None))
+
+    def prices(self, ts_codes: Sequence[str]) -> np.ndarray:
+        """按 ts_codes 顺序的价格向量，缺失为 NaN。"""
+        return np.array([self._prices.get(c, (np.nan, None))[0] for c in ts_codes], dtype=np.float64)
+
+    def latest_trade_date(self) -> Optional[str]:
+        return max((d for _, d in self._prices.values()), default=None)
+
+
+class PriceSnapshotService:
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def client(self):
+        # 延迟导入，避免与 tushare_client 的循环依赖
+        if self._client is None:
+            from app.services.tushare_client import ts_client
+            self._client = ts_client
+        return self._client
+
+    def _from_daily_basic(self, ts_codes: Sequence[str]) -> Dict[str, Tuple[float, str]]:
+        df = self.client.get_daily_basic_for_date(trade_date=None)
+        if df is None or df.empty or 'close' not in df.columns or 'trade_date' not in df.columns:
+            return {}
+        df = df[df['ts_code'].isin(ts_codes) & df['close'].notna() & df['trade_date'].notna()]
+        df = df.sort_values('trade_date').drop_duplicates('ts_code', keep='last')
+        return {code: (float(close), str(trade_date))
+                for code, close, trade_date in zip(df['ts_code'], df['close'], df['trade_date'])}
+
+    def _from_daily_bars(self, ts_codes: Sequence[str]) -> Dict[str, Tuple[float, str]]:
+        today_str = datetime.now().strftime('%Y%m%d')
+        start_date = trading_calendar.shift(today_str, -FALLBACK_LOOKBACK_TRADE_DAYS)
+        closes = self.client.get_daily_panel(list(ts_codes), start_date, today_str, adj=None, fields=('close',))['close']
+        prices: Dict[str, Tuple[float, str]] = {}
+        if closes.empty:
+            return prices
+        values = closes.to_numpy(dtype=np.float64)
+        valid = ~np.isnan(values)
+        last_rows = len(values) - 1 - np.argmax(valid[::-1], axis=0)
+        dates = closes.index.strftime('%Y%m%d')
+        for col, code in enumerate(closes.columns):
+            if valid[:, col].any():
+                prices[code] = (float(values[last_rows[col], col]), dates[last_rows[col]])
+        return prices
+
+    def snapshot(self, ts_codes: Sequence[str]) -> PriceSnapshot:
+        ts_codes = list(dict.fromkeys(ts_codes))
+        if not ts_codes:
+            return PriceSnapshot({})
+        prices = self._from_daily_basic(ts_codes)
+        missing = [c for c in ts_codes if c not in prices]
+        if missing:
+            logger.info(f"PriceSnapshot: {len(missing)} tickers missing from daily_basic, reading recent daily bars.")
+            prices.update(self._from_daily_bars(missing))
+        unresolved = [c for c in ts_codes if c not in prices]
+        if unresolved:
+            logger.warning(f"PriceSnapshot: could not resolve current price for {unresolved}")
+        return PriceSnapshot(prices)
+
+
+price_snapshots = PriceSnapshotService()
+# --- END OF FILE backend/app/services/price_snapshot.py ---
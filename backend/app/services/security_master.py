@@ -0,0 +1,129 @@
+# --- START OF FILE backend/app/services/security_master.py ---
+"""
+进程内共享的证券主表，由 stock_basic 构建一次，供各服务按代码查名称 / 行业等静态信息。
+
+- 每只股票一个整数 id（在主表中的行号），ts_code -> id 既有 dict 的 O(1) 单点查询，
+  也有 pd.Index.get_indexer 的批量向量化映射 (ids)；
+- 名称、行业等列存为按 id 对齐的 numpy 数组，字符串经 sys.intern 驻留；
+  行业另外编码为 industry_ids + industries 词表，便于按行业分组；
+- 快照整体不可变，刷新时整体替换；在下一次收盘数据发布时间（交易日历推算）过期后重建，
+  拉取失败时保留旧快照并在 SECURITY_MASTER_RETRY_SECONDS 后重试。
+
+热路径应先取一次 snapshot()，再对数组做批量操作，而不是逐只调用 name_of。
+"""
+import logging
+import sys
+import threading
+import time
+from typing import Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.trading_calendar import next_publish_time
+
+logger = logging.getLogger(__name__)
+
+SECURITY_MASTER_FIELDS = 'ts_code,symbol,name,area,industry,list_date'
+SECURITY_MASTER_RETRY_SECONDS = 60.0
+
+
+def _interned(values: Iterable) -> np.ndarray:
+    """对象数组，字符串经 sys.intern 驻留，缺失值为 None。"""
+    return np.array([sys.intern(str(v)) if isinstance(v, str) and v else None for v in values], dtype=object)
+
+
+class SecuritySnapshot:
+    """某一时刻的证券主表；所有数组按 id 对齐。"""
+
+    def __init__(self, df: Optional[pd.DataFrame]):
+        df = df if df is not None else pd.DataFrame(columns=SECURITY_MASTER_FIELDS.split(','))
+        df = df.drop_duplicates('ts_code')
+        self.codes = _interned(df['ts_code'])
+        self.index = pd.Index(self.codes, name='ts_code')
+        self._ids = {code: i for i, code in enumerate(self.codes)}
+        self.names = _interned(df['name']) if 'name' in df else np.full(len(df), None, dtype=object)
+        self.areas = _interned(df['area']) if 'area' in df else np.full(len(df), None, dtype=object)
+        self.list_dates = _interned(df['list_date']) if 'list_date' in df else np.full(len(df), None, dtype=object)
+        industry_ids, industries = pd.factorize(pd.Series(df['industry'] if 'industry' in df else [None] * len(df), dtype=object))
+        self.industry_ids = industry_ids.astype(np.int32) # -1 表示行业缺失
+        self.industries = _interned(industries)
+        self.industry_names = np.append(self.industries, None)[self.industry_ids] # -1 落在末尾的 None 上
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def id_of(self, ts_code: str) -> int:
+        return self._ids.get(ts_code, -1)
+
+    def ids(self, ts_codes: Sequence[str]) -> np.ndarray:
+        """批量把 ts_code 映射为 id，不在主表中的为 -1。"""
+        return self.index.get_indexer(pd.Index(ts_codes, dtype=object))
+
+    def take(self, column: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        """按 id 取某一列，id 为 -1 的位置为 None。"""
+        out = np.full(len(ids), None, dtype=object)
+        known = ids >= 0
+        out[known] = column[ids[known]]
+        return out
+
+    def name_of(self, ts_code: str) -> Optional[str]:
+        i = self.id_of(ts_code)
+        return self.names[i] if i >= 0 else None
+
+    def name_and_industry(self, ts_code: str) -> Tuple[Optional[str], Optional[str]]:
+        i = self.id_of(ts_code)
+        return (self.names[i], self.industry_names[i]) if i >= 0 else (None, None)
+
+
+class SecurityMaster:
+    def __init__(self, client=None):
+        self._client = client
+        self._lock = threading.Lock()
+        self._snapshot: Optional[SecuritySnapshot] = None
+        self._expires_at = 0.0
+
+    @property
+    def client(self):
+        # 延迟导入，避免与 tushare_client 的循环依赖
+        if self._client is None:
+            from app.services.tushare_client import ts_client
+            self._client = ts_client
+        return self._client
+
+    def _build(self) -> None:
+        df = self.client.get_stock_basic(list_status='L', fields=SECURITY_MASTER_FIELDS)
+        if df is None or df.empty:
+            logger.warning("SecurityMaster: stock_basic unavailable, keeping the previous snapshot.")
+            self._expires_at = time.time() + SECURITY_MASTER_RETRY_SECONDS
+            if self._snapshot is None:
+                self._snapshot = SecuritySnapshot(None)
+            return
+        self._snapshot = SecuritySnapshot(df)
+        self._expires_at = next_publish_time().timestamp()
+        logger.info(f"SecurityMaster: loaded {len(self._snapshot)} securities, {len(self._snapshot.industries)} industries.")
+
+    def snapshot(self) -> SecuritySnapshot:
+        if self._snapshot is None or time.time() >= self._expires_at:
+            with self._lock:
+                if self._snapshot is None or time.time() >= self._expires_at:
+                    self._build()
+        return self._snapshot
+
+    def refresh(self) -> None:
+        with self._lock:
+            self._build()
+
+    # --- 便捷查询（逐只调用；批量请用 snapshot()） ---
+    def ids(self, ts_codes: Sequence[str]) -> np.ndarray:
+        return self.snapshot().ids(ts_codes)
+
+    def name_of(self, ts_code: str) -> Optional[str]:
+        return self.snapshot().name_of(ts_code)
+
+    def name_and_industry(self, ts_code: str) -> Tuple[Optional[str], Optional[str]]:
+        return self.snapshot().name_and_industry(ts_code)
+
+
+security_master = SecurityMaster()
+# --- END OF FILE backend/app/services/security_master.py ---
@@ -0,0 +1,141 @@
+# --- START OF FILE backend/app/services/selection_cache.py ---
+"""
+选股结果缓存。
+
+同一交易日内，给定策略和参数的选股结果不会变化，所以按
+    sha256(strategy_id, 归一化参数, 最新交易日, 因子表版本)
+缓存 generate_pool 的结果：
+- 参数归一化：补齐策略默认值，键排序，整数值的浮点数与整数视为相同 (6 与 6.0)；
+- 因子表版本为当日因子表文件的修改时间，同一交易日内因子表重建（例如补到新财报）后自动换键；
+- 内存中按条目数 LRU 淘汰；SELECTION_CACHE_PERSIST 打开时同时写入 <MARKET_DATA_DIR>/selection_cache/<key>.json，
+  重启后可以直接命中；
+- EOD 同步落地新交易日或新财报后调用 invalidate() 清空内存与磁盘上的旧结果。
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.models.strategy import SelectedPoolItem
+
+logger = logging.getLogger(__name__)
+
+
+def _canonical_value(value: Any) -> Any:
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return int(value) if float(value).is_integer() else float(value)
+    if isinstance(value, dict):
+        return {str(k): _canonical_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical_value(v) for v in value]
+    return str(value)
+
+
+def normalize_params(params: Optional[Dict[str, Any]], defaults: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """补齐默认值并把数值规整为可比较的形式；值为 None 的参数视为未传，使用默认值。"""
+    merged = dict(defaults or {})
+    merged.update({k: v for k, v in (params or {}).items() if v is not None})
+    return {k: _canonical_value(merged[k]) for k in sorted(merged)}
+
+
+def selection_cache_key(strategy_id: str, params: Dict[str, Any], trade_date: str, version: Optional[str] = None) -> str:
+    payload = json.dumps([strategy_id, params, trade_date, version], sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SelectionResultCache:
+    def __init__(self, max_entries: int, directory: Optional[str] = None):
+        self.max_entries = max_entries
+        self.directory = directory
+        self._entries: "OrderedDict[str, Tuple[str, List[SelectedPoolItem]]]" = OrderedDict() # key -> (trade_date, items)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.json')
+
+    def _load(self, key: str) -> Optional[Tuple[str, List[SelectedPoolItem]]]:
+        if not self.directory or not os.path.exists(self._path(key)):
+            return None
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+            return payload['trade_date'], [SelectedPoolItem(**item) for item in payload['items']]
+        except Exception as e:
+            logger.warning(f"SelectionResultCache: failed to read {key}: {e}")
+            return None
+
+    def _save(self, key: str, strategy_id: str, params: Dict[str, Any], trade_date: str,
+              items: List[SelectedPoolItem]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self._path(key) + '.tmp'
+        payload = {'strategy_id': strategy_id, 'params': params, 'trade_date': trade_date,
+                   'items': [item.dict() for item in items]}
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path(key))
+
+    def _remember(self, key: str, trade_date: str, items: List[SelectedPoolItem]) -> None:
+        with self._lock:
+            self._entries[key] = (trade_date, items)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[List[SelectedPoolItem]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return list(entry[1])
+        entry = self._load(key)
+        with self._lock:
+            if entry is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+        self._remember(key, *entry)
+        return list(entry[1])
+
+    def put(self, key: str, strategy_id: str, params: Dict[str, Any], trade_date: str,
+            items: List[SelectedPoolItem]) -> None:
+        items = list(items)
+        self._remember(key, trade_date, items)
+        if self.directory:
+            try:
+                self._save(key, strategy_id, params, trade_date, items)
+            except OSError as e:
+                logger.warning(f"SelectionResultCache: failed to persist {key}: {e}")
+
+    def invalidate(self) -> None:
+        """清空所有缓存结果（内存与磁盘）。"""
+        with self._lock:
+            self._entries.clear()
+        if self.directory and os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith('.json'):
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except OSError:
+                        pass
+        logger.info("SelectionResultCache: invalidated.")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'entries': len(self._entries), 'max_entries': self.max_entries,
+                    'hits': self._hits, 'misses': self._misses, 'persist': bool(self.directory)}
+
+
+selection_cache = SelectionResultCache(
+    max_entries=settings.SELECTION_CACHE_MAX_ENTRIES,
+    directory=os.path.join(settings.MARKET_DATA_DIR, 'selection_cache') if settings.SELECTION_CACHE_PERSIST else None,
+)
+# --- END OF FILE backend/app/services/selection_cache.py ---
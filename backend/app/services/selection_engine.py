@@ -0,0 +1,209 @@
+# --- START OF FILE backend/app/services/selection_engine.py ---
+"""
+全市场选股引擎：一次性加载整个 A 股的截面数据，筛选条件全部按列向量化计算。
+
+- universe:            证券主表中的全部上市股票 + 全市场 daily_basic 快照（一次请求或读本地横截面），
+                       index 为 ts_code，缺少当日指标的股票对应列为 NaN；
+- latest_fundamentals: 时点财务表 (fundamentals_store) 上的 as-of 查询：截至某日每只股票已公告的最新一期，
+                       缺失的报告期按需批量拉取一次 (fina_indicator_vip，一期一次请求)；
+- momentum:            按交易日回溯的前复权收盘价面板，逐列计算区间涨跌幅；
+- build_factors / scan_factors: 把以上三者物化为当日因子表 (factor_table)，选股时按列投影 + 谓词下推扫描；
+- composite_scores / rank_by_score: 分档打分（np.select，按档位从高到低取第一个满足的档）与按得分的稳定排名。
+
+各方法都是同步的，请求处理中经 ts_gateway.run 在线程池里调用。
+"""
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.factor_table import FACTOR_MOMENTUM_MONTHS, FactorTable, Predicate, factor_table, momentum_column
+from app.services.fundamentals_store import FundamentalsStore, fundamentals_store, report_periods, roe_and_pb
+from app.services.security_master import SecurityMaster, security_master
+from app.services.trading_calendar import trading_calendar
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS_PER_MONTH = 21
+FUNDAMENTAL_LOOKBACK_YEARS = 2 # 最新一期财报最多回看两年（8 个报告期），覆盖迟披露和停牌公司
+UNIVERSE_FIELDS = ('close', 'pe_ttm', 'pb', 'dv_ratio', 'total_mv')
+
+# value_momentum 分档规则：(阈值, 得分)，从高档到低档依次判断；None 表示用户参数（最大 PB / 最小动量）
+ROE_SCORE_BUCKETS = ((0.20, 40), (0.15, 30), (0.10, 20)) # ROE >= 阈值，满分 40
+PB_SCORE_BUCKETS = ((1.0, 30), (1.5, 20), (2.0, 10), (None, 5)) # 0 < PB <= 阈值，满分 30，通过筛选的至少 5 分
+MOMENTUM_SCORE_BUCKETS = ((0.20, 30), (0.10, 20), (None, 10)) # 动量 >= 阈值，满分 30，通过筛选的至少 10 分
+
+
+def momentum_date_range(window_months: int, end_date: Optional[str] = None) -> Tuple[str, str]:
+    """动量窗口：最近一个已发布交易日，以及其之前 21 * window_months 个交易日。"""
+    end_date_str = end_date or trading_calendar.latest_trade_date()
+    start_date_str = trading_calendar.shift(end_date_str, -int(window_months * TRADING_DAYS_PER_MONTH))
+    return start_date_str, end_date_str
+
+
+def window_returns(closes: np.ndarray) -> np.ndarray:
+    """
+    逐列区间涨跌幅 (end - start) / start：起点为窗口内第一根有效 K 线，终点为最后一根；
+    K 线不足两根或起点价格为 0 时为 NaN。closes 形状为 (交易日, 股票)。
+    """
+    if not len(closes):
+        return np.full(closes.shape[1], np.nan)
+    valid = ~np.isnan(closes)
+    counts = valid.sum(axis=0)
+    cols = np.arange(closes.shape[1])
+    first = closes[np.argmax(valid, axis=0), cols]
+    last = closes[len(closes) - 1 - np.argmax(valid[::-1], axis=0), cols]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where((counts >= 2) & (first != 0), (last - first) / first, np.nan)
+
+
+def bucket_scores(values: np.ndarray, buckets: Sequence[Tuple[float, int]], higher_is_better: bool = True) -> np.ndarray:
+    """按档位给每个值打分：取第一个满足的档（>= 阈值或 <= 阈值），都不满足或 NaN 时为 0。"""
+    values = np.asarray(values, dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        conditions = [values >= t if higher_is_better else values <= t for t, _ in buckets]
+    return np.select(conditions, [points for _, points in buckets], default=0)
+
+
+def composite_scores(roe: np.ndarray, pb: np.ndarray, momentum: np.ndarray,
+                     min_momentum_ratio: float, max_pb_value: float) -> np.ndarray:
+    """
+    动量质量策略的综合得分（ROE 40 + PB 30 + 动量 30）。
+    roe, pb, momentum 为小数；min_momentum_ratio 为用户设定的最小动量（小数），max_pb_value 为最大 PB。
+    """
+    pb = np.asarray(pb, dtype=np.float64)
+    pb_buckets = [(max_pb_value if t is None else t, points) for t, points in PB_SCORE_BUCKETS]
+    momentum_buckets = [(min_momentum_ratio if t is None else t, points) for t, points in MOMENTUM_SCORE_BUCKETS]
+    with np.errstate(invalid='ignore'):
+        pb_score = np.where(pb > 0, bucket_scores(pb, pb_buckets, higher_is_better=False), 0) # PB 必须大于 0
+    return bucket_scores(roe, ROE_SCORE_BUCKETS) + pb_score + bucket_scores(momentum, momentum_buckets)
+
+
+def rank_by_score(scores: np.ndarray) -> np.ndarray:
+    """按得分降序排列的位置；同分按原始位置升序（稳定排序）。选股结果整体缓存、按页截取，所以总是完整排名。"""
+    return np.argsort(-np.asarray(scores), kind='stable')
+
+
+class SelectionEngine:
+    def __init__(self, client=None, master: Optional[SecurityMaster] = None,
+                 fundamentals: Optional[FundamentalsStore] = None, factors: Optional[FactorTable] = None):
+        self._client = client
+        self.master = master or security_master
+        self.fundamentals = fundamentals or fundamentals_store
+        self.factors = factors or factor_table
+
+    @property
+    def client(self):
+        # 延迟导入，避免与 tushare_client 的循环依赖
+        if self._client is None:
+            from app.services.tushare_client import ts_client
+            self._client = ts_client
+        return self._client
+
+    def universe(self, trade_date: Optional[str] = None) -> pd.DataFrame:
+        """
+        全部上市股票及其 daily_basic 指标：name / industry / trade_date / close / pe_ttm / pb / dv_ratio / total_mv。
+        trade_date 为 None 时取最新交易日。
+        """
+        master = self.master.snapshot()
+        universe = pd.DataFrame({'name': master.names, 'industry': master.industry_names}, index=master.index)
+        daily_basic_df = self.client.get_daily_basic_for_date(trade_date=trade_date)
+        if daily_basic_df is None or daily_basic_df.empty:
+            logger.warning(f"SelectionEngine: daily_basic unavailable for {trade_date or 'latest'}, indicators are NaN.")
+            universe['trade_date'] = None
+            for field in UNIVERSE_FIELDS:
+                universe[field] = np.nan
+            return universe
+        if 'trade_date' in daily_basic_df.columns:
+            daily_basic_df = daily_basic_df.sort_values('trade_date')
+        daily_basic_df = daily_basic_df.drop_duplicates('ts_code', keep='last')
+        pos = pd.Index(daily_basic_df['ts_code']).get_indexer(master.index)
+        known = pos >= 0
+        trade_dates = np.full(len(pos), None, dtype=object)
+        if 'trade_date' in daily_basic_df.columns:
+            trade_dates[known] = daily_basic_df['trade_date'].astype(str).to_numpy()[pos[known]]
+        universe['trade_date'] = trade_dates
+        for field in UNIVERSE_FIELDS:
+            values = pd.to_numeric(daily_basic_df[field], errors='coerce').to_numpy(dtype=np.float64) \
+                if field in daily_basic_df.columns else np.full(len(daily_basic_df), np.nan)
+            universe[field] = np.where(known, values[np.maximum(pos, 0)], np.nan)
+        return universe
+
+    def _fundamental_periods(self, as_of: str) -> List[str]:
+        start = f'{int(as_of[:4]) - FUNDAMENTAL_LOOKBACK_YEARS}{as_of[4:]}'
+        return report_periods(start, as_of)
+
+    def latest_fundamentals(self, as_of: Optional[str] = None) -> pd.DataFrame:
+        """
+        截至 as_of（默认最新交易日）每只股票已公告的最新一期财务指标，index 为 ts_code，列为 ann_date / end_date / roe / pb。
+        roe 依次取 roe_yearly、roe_waa、roe 中第一个非空值，并换算为小数。回看期内没有任何批量数据时返回空表。
+        """
+        as_of = as_of or trading_calendar.latest_trade_date()
+        if not self.fundamentals.ensure_periods(self._fundamental_periods(as_of)):
+            logger.warning("SelectionEngine: no bulk fundamentals available.")
+            return pd.DataFrame(columns=['ann_date', 'end_date', 'roe', 'pb'], index=pd.Index([], name='ts_code'))
+        rows = self.fundamentals.as_of(as_of)
+        roe, pb = roe_and_pb(rows)
+        return pd.DataFrame({'ann_date': rows['ann_date'].to_numpy(), 'end_date': rows['end_date'].to_numpy(),
+                             'roe': roe, 'pb': pb}, index=rows.index)
+
+    def momentum(self, ts_codes: Sequence[str], window_months: int) -> pd.Series:
+        """
+        区间涨跌幅 (end - start) / start，index 为 ts_code。起点取窗口内第一根 K 线（通常是窗口起始交易日），
+        终点取最后一根；K 线不足两根或起点价格无效时为 NaN。
+        """
+        if not len(ts_codes):
+            return pd.Series(dtype='float64')
+        start_date_str, end_date_str = momentum_date_range(window_months)
+        panel = self.client.get_daily_panel(ts_codes, start_date_str, end_date_str, adj='qfq', fields=('close',))
+        closes = panel['close']
+        return pd.Series(window_returns(closes.to_numpy(dtype=np.float64)), index=closes.columns)
+
+    def window_momentum(self, trade_date: str, windows: Sequence[int] = FACTOR_MOMENTUM_MONTHS) -> pd.DataFrame:
+        """
+        全市场多个窗口的动量，列为 momentum_<n>m，index 为 ts_code。
+        只加载最长窗口的一张前复权面板（本地横截面），较短窗口取其末尾若干行；区间涨跌幅与复权基准无关。
+        """
+        start_date_str, end_date_str = momentum_date_range(max(windows), trade_date)
+        closes = self.client.get_daily_panel(None, start_date_str, end_date_str, adj='qfq', fields=('close',))['close']
+        values = closes.to_numpy(dtype=np.float64)
+        out = pd.DataFrame(index=closes.columns)
+        for window_months in windows:
+            window_start = pd.Timestamp(momentum_date_range(window_months, trade_date)[0])
+            out[momentum_column(window_months)] = window_returns(values[closes.index >= window_start])
+        return out
+
+    def build_factors(self, trade_date: str) -> Optional[pd.DataFrame]:
+        """构建并落盘 trade_date 的因子表；当日 daily_basic 不可用时不写入，返回 None。"""
+        universe = self.universe(trade_date)
+        if universe['trade_date'].isna().all():
+            logger.warning(f"SelectionEngine: daily_basic for {trade_date} unavailable, factor table not built.")
+            return None
+        fundamentals = self.latest_fundamentals(trade_date).reindex(universe.index)
+        momentum = self.window_momentum(trade_date).reindex(universe.index)
+        factors = pd.DataFrame({field: universe[field].to_numpy() for field in UNIVERSE_FIELDS}, index=universe.index)
+        factors['roe'] = fundamentals['roe'].to_numpy(dtype=np.float64)
+        factors['fina_pb'] = fundamentals['pb'].to_numpy(dtype=np.float64)
+        for column in momentum.columns:
+            factors[column] = momentum[column].to_numpy()
+        self.factors.write(trade_date, factors)
+        logger.info(f"SelectionEngine: factor table for {trade_date} built ({len(factors)} stocks).")
+        return factors
+
+    def scan_factors(self, columns: Sequence[str], where: Sequence[Predicate] = (),
+                     trade_date: Optional[str] = None, require: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """
+        扫描最新交易日（或 trade_date）的因子表，附加 name 列。
+        因子表尚未构建、或 require 列整列为空（例如财报接口不可用）时返回 None，由调用方走实时计算。
+        """
+        trade_date = trade_date or trading_calendar.latest_trade_date()
+        if not self.factors.has(trade_date) or (require is not None and not self.factors.has_values(trade_date, require)):
+            return None
+        rows = self.factors.scan(trade_date, columns, where)
+        master = self.master.snapshot()
+        rows.insert(0, 'name', master.take(master.names, master.ids(rows.index)))
+        return rows
+
+selection_engine = SelectionEngine()
+# --- END OF FILE backend/app/services/selection_engine.py ---
@@ -0,0 +1,70 @@
+# --- START OF FILE backend/app/services/single_flight.py ---
+"""
+Single-flight：相同参数的并发请求只真正执行一次，其余调用方等待并共享结果。
+
+lru_cache 只能在结果返回后命中，多个并发的未命中仍会各自请求 Tushare；
+仪表盘、择时页、退出页同时加载时，这会重复消耗配额。
+网关把调用放到线程池执行，所以这里按线程实现（threading.Event）。
+"""
+import functools
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error', 'followers')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.followers = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.shared_count = 0 # 被合并掉的重复请求数，便于观察效果
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                self.shared_count += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+data_flight = SingleFlight()
+
+
+def single_flight(method: Callable[..., Any]) -> Callable[..., Any]:
+    """实例方法装饰器：以 (方法名, 实例, 参数) 为键合并并发调用。参数必须可哈希。"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__qualname__, id(self), args, tuple(sorted(kwargs.items())))
+        return data_flight.do(key, method, self, *args, **kwargs)
+    return wrapper
+# --- END OF FILE backend/app/services/single_flight.py ---
@@ -1,38 +1,54 @@
 # --- START OF FILE backend/app/services/strategy_service.py ---
 from typing import List, Dict, Any, Optional, Tuple
+from app.core.config import settings
 from app.services.tushare_client import ts_client
+from app.services.tushare_gateway import ts_gateway
+from app.services.selection_engine import composite_scores, momentum_date_range, selection_engine, rank_by_score
+from app.services.factor_table import FACTOR_MOMENTUM_MONTHS, FACTOR_OPS, momentum_column
+from app.services.fundamentals_store import normalize_fina_frame, roe_and_pb
+from app.services.pool_pagination import DEFAULT_PAGE_LIMIT, paginate
+from app.services.selection_cache import normalize_params, selection_cache, selection_cache_key
+from app.services.trading_calendar import trading_calendar
 from app.models.strategy import SelectedPoolItem
 import pandas as pd
 import asyncio
-from datetime import datetime, timedelta
+
+DEFAULT_TOP_K = 10 # value_momentum 默认返回的股票数
+# 各选股策略的参数默认值；请求参数先与之合并，再用于计算和结果缓存的键
+SELECTION_PARAM_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    'value_momentum': {'momentum_window_months': 6, 'min_momentum_percent': 5.0, 'roe_threshold_percent': 15.0,
+                       'max_pb_value': 2.5, 'top_k': DEFAULT_TOP_K},
+    'simple_value_screen': {'max_pe_ttm': 30.0, 'max_pb': 2.0, 'min_dividend_yield': 2.0, 'min_total_mv_billions': 50.0},
+}
+PRESENTATION_PARAMS = ('top_k',) # 只决定返回条数、不影响排名的参数
 
 class StrategyService:
     def __init__(self):
         self.ts_client = ts_client
+        self.ts_gateway = ts_gateway # async 方法中通过网关调用，避免阻塞事件循环
+        self.selection_engine = selection_engine # 全市场截面数据，筛选按列向量化
+        self.selection_cache = selection_cache # 进程内共享，EOD 同步落地新数据后失效
+
+    def _momentum_date_range(self, window_months: int) -> Tuple[str, str]:
+        """动量窗口：最近一个已发布交易日，以及其之前 21 * window_months 个交易日。"""
+        return momentum_date_range(window_months)
 
-    async def _calculate_momentum(self, ts_code: str, window_months: int) -> Optional[float]:
-        # ... (此函数保持不变，与上一轮提供的一致) ...
-        end_date_dt = datetime.now()
-        start_date_dt_approx = end_date_dt - timedelta(days=int(window_months * 30.44 + 45))
-        end_date_str = end_date_dt.strftime('%Y%m%d')
-        start_date_str_for_api = start_date_dt_approx.strftime('%Y%m%d')
-        daily_df = self.ts_client.get_daily_data(ts_code=ts_code, start_date=start_date_str_for_api, end_date=end_date_str, adj='qfq')
+    async def _calculate_momentum(self, ts_code: str, window_months: int, daily_df: Optional[pd.DataFrame] = None) -> Optional[float]:
+        """daily_df 为批量预取的日线时直接使用，否则单独拉取该股票的日线。"""
+        start_date_str_for_api, end_date_str = self._momentum_date_range(window_months)
+        if daily_df is None:
+            daily_df = await self.ts_gateway.get_daily_data(ts_code=ts_code, start_date=start_date_str_for_api, end_date=end_date_str, adj='qfq')
         if daily_df is None or daily_df.empty:
             print(f"      Debug ({ts_code}): No daily data found for momentum calculation in range {start_date_str_for_api}-{end_date_str}.")
             return None
         if len(daily_df) < 2:
              print(f"      Debug ({ts_code}): Not enough data points ({len(daily_df)}) for momentum calculation.")
              return None
-        target_trading_days_back = int(window_months * 21) 
-        if len(daily_df) <= target_trading_days_back:
-            start_price_row = daily_df.iloc[0]
-            start_price_date = start_price_row.name
-            start_price = start_price_row['close']
-            # print(f"      Debug ({ts_code}): Data points ({len(daily_df)}) less than target lookback ({target_trading_days_back}). Using earliest price.") # 日志已存在类似信息
-        else:
-            start_price_row = daily_df.iloc[-(target_trading_days_back + 1)]
-            start_price_date = start_price_row.name
-            start_price = start_price_row['close']
+        # 起点价格取窗口起始交易日的收盘价；该日停牌时取之前最近一根，没有则取窗口内最早一根
+        bars_before_start = daily_df[daily_df.index <= pd.Timestamp(start_date_str_for_api)]
+        start_price_row = bars_before_start.iloc[-1] if not bars_before_start.empty else daily_df.iloc[0]
+        start_price_date = start_price_row.name
+        start_price = start_price_row['close']
         end_price_row = daily_df.iloc[-1]
         end_price_date = end_price_row.name
         end_price = end_price_row['close']
@@ -45,197 +61,203 @@ class StrategyService:
         return momentum
 
     async def _get_latest_roe_and_pb(self, ts_code: str) -> Tuple[Optional[float], Optional[float]]:
-        # ... (此函数保持不变，与上一轮提供的一致) ...
-        fina_df = self.ts_client.get_financial_indicator(ts_code=ts_code, fields='ts_code,end_date,roe,roe_yearly,roe_waa,pb')
+        """单只股票截至最新交易日已公告的最新一期 ROE（小数）与 PB，口径与时点财务表的 as-of 查询一致。"""
+        fina_df = await self.ts_gateway.get_financial_indicator(ts_code=ts_code, fields='ts_code,ann_date,end_date,roe,roe_yearly,roe_waa,pb')
         if fina_df is None or fina_df.empty:
             # print(f"    Debug ({ts_code}): No financial data found.") # 日志移到调用处
             return None, None
-        latest_fina = fina_df.iloc[0]
-        roe_value = latest_fina.get('roe_yearly') 
-        if pd.isna(roe_value): roe_value = latest_fina.get('roe_waa')
-        if pd.isna(roe_value): roe_value = latest_fina.get('roe')
-        pb_value = latest_fina.get('pb')
-        processed_roe = pd.to_numeric(roe_value, errors='coerce') / 100.0 if pd.notna(roe_value) else None
-        processed_pb = pd.to_numeric(pb_value, errors='coerce') if pd.notna(pb_value) else None
+        rows = normalize_fina_frame(fina_df)
+        known = rows[rows['ann_date'] <= int(trading_calendar.latest_trade_date())]
+        if known.empty:
+            return None, None
+        roe, pb = roe_and_pb(known.iloc[[-1]]) # 已按 (end_date, ann_date) 排序，最后一行即最新已知
+        processed_roe = float(roe[0]) if pd.notna(roe[0]) else None
+        processed_pb = float(pb[0]) if pd.notna(pb[0]) else None
         return processed_roe, processed_pb
 
-    def _calculate_composite_score(self, roe: Optional[float], pb: Optional[float], momentum: Optional[float], 
-                                   min_momentum_ratio: float, max_pb_value_param: float) -> int:
+    async def _enrich_per_stock(self, universe: pd.DataFrame, max_pb_value: float, roe_threshold_ratio: float,
+                                window_months: int) -> pd.DataFrame:
+        """
+        批量财务指标不可用时的回退：逐只拉取 fina_indicator（最多 SELECTION_ENRICH_CONCURRENCY 个请求同时在途，
+        总速率仍受网关令牌桶限制），只处理日线 PB 未被淘汰的股票，再为通过 PB/ROE 的股票批量预取日线计算动量。
+        返回 index 为 ts_code，列为 name / roe / pb / momentum，行序与 universe 一致。
+        """
+        daily_pb = universe['pb']
+        pending = universe[daily_pb.isna() | ((daily_pb > 0) & (daily_pb <= max_pb_value))]
+        concurrency = max(1, settings.SELECTION_ENRICH_CONCURRENCY)
+        print(f"StrategyService: Bulk fundamentals unavailable, fetching fina_indicator for {len(pending)} stocks ({concurrency} concurrent)...")
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def screen(ts_code: str, name: str, pb_from_daily_basic: float) -> Optional[Tuple[str, str, float, float]]:
+            async with semaphore:
+                roe, pb_from_fina = await self._get_latest_roe_and_pb(ts_code)
+            final_pb = pb_from_daily_basic
+            if pd.isna(final_pb) and pd.notna(pb_from_fina):
+                final_pb = pb_from_fina
+            if pd.isna(final_pb) or not (final_pb > 0 and final_pb <= max_pb_value):
+                return None
+            if roe is None or pd.isna(roe) or not (roe >= roe_threshold_ratio):
+                return None
+            return ts_code, name, roe, final_pb
+
+        screened = await asyncio.gather(*(screen(ts_code, name, pb) for ts_code, name, pb in zip(pending.index, pending['name'], pending['pb'])))
+        candidates: List[Tuple[str, str, float, float]] = [c for c in screened if c is not None] # (ts_code, name, roe, pb) 通过 PB/ROE 筛选的股票
+
+        # 只为通过 PB/ROE 的股票批量预取动量所需的日线
+        momentum_start, momentum_end = self._momentum_date_range(window_months)
+        daily_frames = await self.ts_gateway.get_daily_data_batch([c[0] for c in candidates], momentum_start, momentum_end, adj='qfq', fields=('close',))
+        rows = []
+        for ts_code, name, roe, final_pb in candidates:
+            daily_df = daily_frames.get(ts_code)
+            momentum = await self._calculate_momentum(ts_code, window_months, daily_df=daily_df) if daily_df is not None else None
+            rows.append((ts_code, name, roe, final_pb, momentum if momentum is not None else float('nan')))
+        return pd.DataFrame(rows, columns=['ts_code', 'name', 'roe', 'pb', 'momentum']).set_index('ts_code')
+
+    async def _value_momentum_candidates(self, max_pb_value: float, roe_threshold_ratio: float,
+                                         window_months: int) -> Optional[pd.DataFrame]:
+        """实时计算的候选股（因子表不可用时）：PB -> ROE -> 动量，列为 name / roe / pb / momentum。"""
+        universe = await self.ts_gateway.run(self.selection_engine.universe)
+        if universe.empty:
+            print("StrategyService: Failed to load the stock universe for value_momentum.")
+            return None
+        print(f"StrategyService (value_momentum): Screening {len(universe)} listed stocks...")
+
+        fundamentals = await self.ts_gateway.run(self.selection_engine.latest_fundamentals)
+        if fundamentals.empty:
+            candidates_df = await self._enrich_per_stock(universe, max_pb_value, roe_threshold_ratio, window_months)
+        else:
+            # 筛选顺序与逐只处理时相同：PB -> ROE -> 动量，只为通过前两步的股票加载日线
+            fina = fundamentals.reindex(universe.index)
+            final_pb = universe['pb'].where(universe['pb'].notna(), fina['pb']) # daily_basic 缺失时用财报 PB
+            roe = fina['roe']
+            passed = (final_pb > 0) & (final_pb <= max_pb_value) & (roe >= roe_threshold_ratio)
+            print(f"StrategyService (value_momentum): {int(passed.sum())} stocks passed PB <= {max_pb_value} and ROE >= {roe_threshold_ratio}.")
+            candidates_df = pd.DataFrame({'name': universe['name'], 'roe': roe, 'pb': final_pb})[passed]
+            momentum = await self.ts_gateway.run(self.selection_engine.momentum, candidates_df.index.tolist(), window_months)
+            candidates_df['momentum'] = momentum.reindex(candidates_df.index)
+        return candidates_df
+
+    async def rank_pool(self, strategy_id: str, params: Dict[str, Any]) -> Tuple[str, str, List[SelectedPoolItem]]:
         """
-        计算动量质量策略的综合得分。
-        roe, pb, momentum 应该是已经处理过的小数值。
-        min_momentum_ratio 是用户设定的最小动量阈值（小数）。
-        max_pb_value_param 是用户设定的最大PB值。
+        策略的完整排名结果，返回 (结果快照键, 交易日, 排好序的全部入选股票)。
+        同一交易日内，相同策略与（补齐默认值后的）排名参数直接返回缓存的结果；只影响返回条数的参数 (top_k) 不进入键。
+        因子表重建或 EOD 同步落地新数据后缓存失效。空结果不缓存（可能是数据暂时不可用）。
         """
-        score = 0
-        
-        # ROE Score (max 40)
-        if roe is not None and not pd.isna(roe):
-            if roe >= 0.20: score += 40
-            elif roe >= 0.15: score += 30
-            elif roe >= 0.10: score += 20
-        
-        # PB Score (max 30, lower is better)
-        if pb is not None and not pd.isna(pb) and pb > 0: # PB必须大于0
-            if pb <= 1.0: score += 30
-            elif pb <= 1.5: score += 20
-            elif pb <= 2.0: score += 10
-            elif pb <= max_pb_value_param: score += 5 # 确保通过筛选的至少有分
-            
-        # Momentum Score (max 30, higher is better, based on 6m momentum)
-        if momentum is not None and not pd.isna(momentum):
-            if momentum >= 0.20: score += 30
-            elif momentum >= 0.10: score += 20
-            elif momentum >= min_momentum_ratio: score += 10 # 确保通过筛选的至少有分
-            
-        return score
+        if strategy_id not in SELECTION_PARAM_DEFAULTS:
+            raise ValueError(f"Unknown selection strategy_id: {strategy_id}")
+        params = normalize_params(params, SELECTION_PARAM_DEFAULTS[strategy_id])
+        ranking_params = {k: v for k, v in params.items() if k not in PRESENTATION_PARAMS}
+        trade_date = trading_calendar.latest_trade_date()
+        key = selection_cache_key(strategy_id, ranking_params, trade_date, self.selection_engine.factors.version(trade_date))
+        cached = self.selection_cache.get(key)
+        if cached is not None:
+            print(f"StrategyService: Cache hit for strategy_id='{strategy_id}' on {trade_date}.")
+            return key, trade_date, cached
+        items = await self._compute_pool(strategy_id, ranking_params)
+        if items:
+            self.selection_cache.put(key, strategy_id, ranking_params, trade_date, items)
+        return key, trade_date, items
 
     async def generate_pool_for_selection(self, strategy_id: str, params: Dict[str, Any]) -> List[SelectedPoolItem]:
+        """排名结果的前 top_k 名（策略有 top_k 参数时），否则为全部入选股票。"""
+        _, _, items = await self.rank_pool(strategy_id, params)
+        top_k_count = normalize_params(params, SELECTION_PARAM_DEFAULTS[strategy_id]).get('top_k')
+        return items[:int(top_k_count)] if top_k_count is not None else items
+
+    async def generate_pool_page(self, strategy_id: str, params: Dict[str, Any], sort_by: Optional[str] = None,
+                                 sort_order: str = 'desc', cursor: Optional[str] = None,
+                                 limit: Optional[int] = DEFAULT_PAGE_LIMIT) -> Tuple[List[SelectedPoolItem], Optional[str], int, str]:
+        """
+        在缓存的完整排名上做服务端排序与游标分页，返回 (本页, 下一页游标, 入选总数, 交易日)。
+        游标对应的结果已更新时抛 InvalidCursorError。
+        """
+        key, trade_date, items = await self.rank_pool(strategy_id, params)
+        page, next_cursor = paginate(key, items, sort_by, sort_order, cursor, limit)
+        return page, next_cursor, len(items), trade_date
+
+    async def _compute_pool(self, strategy_id: str, params: Dict[str, Any]) -> List[SelectedPoolItem]:
         print(f"StrategyService: Generating pool for strategy_id='{strategy_id}' with params={params}")
 
         if strategy_id == "value_momentum":
             print("StrategyService: Executing value_momentum strategy.")
-            momentum_window_months = params.get("momentum_window_months", 6)
-            min_momentum_percent = params.get("min_momentum_percent", 5.0)
-            roe_threshold_percent = params.get("roe_threshold_percent", 15.0)
-            max_pb_value = params.get("max_pb_value", 2.5)
+            momentum_window_months = params["momentum_window_months"]
+            min_momentum_percent = params["min_momentum_percent"]
+            roe_threshold_percent = params["roe_threshold_percent"]
+            max_pb_value = params["max_pb_value"]
 
             min_momentum_ratio = min_momentum_percent / 100.0
             roe_threshold_ratio = roe_threshold_percent / 100.0
 
-            stock_list_df = self.ts_client.get_stock_basic(list_status='L', fields='ts_code,name,industry')
-            if stock_list_df is None or stock_list_df.empty:
-                print("StrategyService: Failed to fetch stock basic list for value_momentum.")
-                return []
-
-            sample_stocks_df = stock_list_df.head(50) # 样本数量
-            print(f"StrategyService (value_momentum): Processing a sample of {len(sample_stocks_df)} stocks...")
-            
-            sample_ts_codes_list = sample_stocks_df['ts_code'].tolist()
-            sample_ts_codes_tuple = tuple(sample_ts_codes_list) if sample_ts_codes_list else None
-            daily_basic_df = self.ts_client.get_daily_basic_for_date(ts_codes_tuple=sample_ts_codes_tuple)
-            
-            if daily_basic_df is not None and not daily_basic_df.empty:
-                if 'trade_date' in daily_basic_df.columns:
-                    daily_basic_df = daily_basic_df.sort_values('trade_date').groupby('ts_code').tail(1)
-                stocks_with_pb_df = pd.merge(sample_stocks_df[['ts_code', 'name']],
-                                             daily_basic_df[['ts_code', 'pb']],
-                                             on='ts_code',
-                                             how='left')
-                stocks_with_pb_df['pb'] = pd.to_numeric(stocks_with_pb_df['pb'], errors='coerce')
-            else: # 如果 daily_basic 返回空，则所有PB为NA
-                print(f"Warning: daily_basic returned no data for PB calculation for sample stocks. All PBs will be NA.")
-                stocks_with_pb_df = sample_stocks_df[['ts_code', 'name']].copy()
-                stocks_with_pb_df['pb'] = pd.NA 
-
-            results: List[SelectedPoolItem] = []
-
-            for _, stock_row in stocks_with_pb_df.iterrows():
-                ts_code = stock_row['ts_code']
-                name = stock_row['name']
-                pb_from_daily_basic = stock_row['pb'] 
-                
-                print(f"  Processing {ts_code} - {name} (PB_daily: {pb_from_daily_basic})...")
+            factors = None
+            momentum_column_name = momentum_column(momentum_window_months)
+            if momentum_window_months in FACTOR_MOMENTUM_MONTHS:
+                # 当日因子表已由 EOD 同步构建时，ROE 与动量条件下推到表扫描，只读取用到的列
+                factors = await self.ts_gateway.run(
+                    self.selection_engine.scan_factors, ['roe', 'pb', 'fina_pb', momentum_column_name],
+                    [('roe', '>=', roe_threshold_ratio), (momentum_column_name, '>=', min_momentum_ratio)], require='roe')
+            if factors is not None:
+                final_pb = factors['pb'].where(factors['pb'].notna(), factors['fina_pb']) # daily_basic 缺失时用财报 PB
+                selected_df = pd.DataFrame({'name': factors['name'], 'roe': factors['roe'], 'pb': final_pb,
+                                            'momentum': factors[momentum_column_name]})[(final_pb > 0) & (final_pb <= max_pb_value)]
+                print(f"StrategyService (value_momentum): {len(selected_df)} stocks passed the factor table scan.")
+            else:
+                candidates_df = await self._value_momentum_candidates(max_pb_value, roe_threshold_ratio, momentum_window_months)
+                if candidates_df is None:
+                    return []
+                selected_df = candidates_df[candidates_df['momentum'] >= min_momentum_ratio]
+                print(f"StrategyService (value_momentum): {len(selected_df)} stocks passed momentum >= {min_momentum_ratio}.")
 
-                roe, pb_from_fina = await self._get_latest_roe_and_pb(ts_code)
-                
-                final_pb = pb_from_daily_basic
-                if pd.isna(final_pb) and pd.notna(pb_from_fina):
-                    final_pb = pb_from_fina
-                    print(f"    {ts_code}: Using PB_fina: {final_pb}")
-                
-                print(f"    {ts_code}: Final_PB={final_pb}, ROE={roe}")
-
-                if pd.isna(final_pb) or not (final_pb > 0 and final_pb <= max_pb_value):
-                    print(f"    Skipping {ts_code}: PB not met (PB: {final_pb} vs max: {max_pb_value}).")
-                    continue
-                print(f"    {ts_code}: PB met.")
-
-                if roe is None or pd.isna(roe) or not (roe >= roe_threshold_ratio):
-                    print(f"    Skipping {ts_code}: ROE not met (ROE: {roe} vs threshold: {roe_threshold_ratio}).")
-                    continue
-                print(f"    {ts_code}: ROE met.")
-
-                momentum = await self._calculate_momentum(ts_code, momentum_window_months)
-
-                if momentum is None or pd.isna(momentum) or not (momentum >= min_momentum_ratio):
-                    print(f"    Skipping {ts_code}: Momentum not met (Momentum: {momentum} vs threshold: {min_momentum_ratio}).")
-                    continue
-                print(f"    {ts_code}: Momentum met.")
-                
-                # 计算综合得分
-                composite_score = self._calculate_composite_score(roe, final_pb, momentum, 
-                                                                min_momentum_ratio, max_pb_value)
-                print(f"    {ts_code}: Composite Score = {composite_score}")
-
-                results.append(SelectedPoolItem(
+            # 综合得分按列计算；完整排名供分页使用，前 K 名由 generate_pool_for_selection 截取
+            scores = composite_scores(selected_df['roe'].to_numpy(), selected_df['pb'].to_numpy(),
+                                      selected_df['momentum'].to_numpy(), min_momentum_ratio, max_pb_value)
+            top = rank_by_score(scores) # 得分降序，同分按列表顺序
+            top_df = selected_df.iloc[top]
+            final_results = [
+                SelectedPoolItem(
                     ts_code=ts_code,
                     name=name,
                     roe=round(roe, 4) if pd.notna(roe) else None,
                     pb=round(final_pb, 4) if pd.notna(final_pb) else None,
                     momentum_6m=round(momentum, 4) if momentum_window_months == 6 and pd.notna(momentum) else None,
-                    composite_score=composite_score # 添加综合得分
-                ))
-                # if len(results) >= 5: # 可以暂时去掉这个限制，看看能选出多少
-                #     break
-            
-            # 按综合得分降序排列
-            results.sort(key=lambda item: item.composite_score if item.composite_score is not None else -1, reverse=True)
-            
-            # 取前N名，例如前10名
-            final_results = results[:10]
+                    composite_score=int(score)
+                )
+                for ts_code, name, roe, final_pb, momentum, score in zip(
+                    top_df.index, top_df['name'], top_df['roe'], top_df['pb'], top_df['momentum'], scores[top])
+            ]
 
             print(f"StrategyService (value_momentum): Found {len(final_results)} stocks after scoring and ranking.")
             return final_results
 
         elif strategy_id == "simple_value_screen":
-            # ... (simple_value_screen 逻辑保持不变，与上一轮提供的一致) ...
-            # (省略)
             print("StrategyService: Executing simple_value_screen strategy.")
-            max_pe_ttm = params.get("max_pe_ttm", 30.0)
-            max_pb_value_sv = params.get("max_pb", 2.0)
-            min_dividend_yield_percent = params.get("min_dividend_yield", 2.0)
-            min_total_mv_billions = params.get("min_total_mv_billions", 50.0)
+            max_pe_ttm = params["max_pe_ttm"]
+            max_pb_value_sv = params["max_pb"]
+            min_dividend_yield_percent = params["min_dividend_yield"]
+            min_total_mv_billions = params["min_total_mv_billions"]
             min_dividend_yield_ratio = min_dividend_yield_percent / 100.0
             min_total_mv = min_total_mv_billions * 10000
-            stock_list_df_sv = self.ts_client.get_stock_basic(list_status='L', fields='ts_code,name,industry,list_date')
-            if stock_list_df_sv is None or stock_list_df_sv.empty:
-                print("StrategyService: Failed to fetch stock basic list for simple_value_screen.")
-                return []
-            sample_ts_codes_list_sv = stock_list_df_sv['ts_code'].tolist()[:200]
-            print(f"StrategyService (simple_value_screen): Fetching daily basic for a sample of {len(sample_ts_codes_list_sv)} stocks...")
-            sample_ts_codes_tuple_sv = tuple(sample_ts_codes_list_sv) if sample_ts_codes_list_sv else None
-            daily_basic_df_sv = self.ts_client.get_daily_basic_for_date(ts_codes_tuple=sample_ts_codes_tuple_sv)
-            if daily_basic_df_sv is None or daily_basic_df_sv.empty:
-                print("StrategyService: Failed to fetch daily basic data for simple_value_screen.")
-                return []
-            if 'trade_date' in daily_basic_df_sv.columns:
-                 daily_basic_df_sv = daily_basic_df_sv.sort_values('trade_date').groupby('ts_code').tail(1)
-            merged_df = pd.merge(stock_list_df_sv[['ts_code', 'name', 'industry']], 
-                                 daily_basic_df_sv[['ts_code', 'pe_ttm', 'pb', 'dv_ratio', 'total_mv']], 
-                                 on='ts_code', how='inner')
-            if merged_df.empty:
-                print("StrategyService: No data after merging stock_list and daily_basic for simple_value_screen.")
-                return []
-            merged_df['pe_ttm'] = pd.to_numeric(merged_df['pe_ttm'], errors='coerce')
-            merged_df['pb'] = pd.to_numeric(merged_df['pb'], errors='coerce')
-            merged_df['dv_ratio_actual'] = pd.to_numeric(merged_df['dv_ratio'], errors='coerce') / 100.0
-            merged_df['total_mv_actual'] = pd.to_numeric(merged_df['total_mv'], errors='coerce')
-            print(f"StrategyService (simple_value_screen): Applying filters - max_pe_ttm={max_pe_ttm}, max_pb={max_pb_value_sv}, min_dividend_yield_ratio={min_dividend_yield_ratio}, min_total_mv={min_total_mv} (万元)")
-            filtered_df = merged_df[
-                (merged_df['pe_ttm'] > 0) & (merged_df['pe_ttm'] <= max_pe_ttm) &
-                (merged_df['pb'] > 0) & (merged_df['pb'] <= max_pb_value_sv) &
-                (merged_df['dv_ratio_actual'] >= min_dividend_yield_ratio) &
-                (merged_df['total_mv_actual'] >= min_total_mv)
-            ]
+            filters = [('pe_ttm', '>', 0), ('pe_ttm', '<=', max_pe_ttm), ('pb', '>', 0), ('pb', '<=', max_pb_value_sv),
+                       ('dv_ratio', '>=', min_dividend_yield_percent), ('total_mv', '>=', min_total_mv)] # dv_ratio 单位为 %
+            filtered_df = await self.ts_gateway.run(
+                self.selection_engine.scan_factors, ['pe_ttm', 'pb', 'dv_ratio', 'total_mv'], filters)
+            if filtered_df is None: # 当日因子表尚未构建，按 daily_basic 实时筛选
+                universe = await self.ts_gateway.run(self.selection_engine.universe)
+                if universe.empty or universe['trade_date'].isna().all():
+                    print("StrategyService: Failed to fetch daily basic data for simple_value_screen.")
+                    return []
+                print(f"StrategyService (simple_value_screen): Applying filters to {len(universe)} listed stocks - max_pe_ttm={max_pe_ttm}, max_pb={max_pb_value_sv}, min_dividend_yield_ratio={min_dividend_yield_ratio}, min_total_mv={min_total_mv} (万元)")
+                mask = pd.Series(True, index=universe.index)
+                for column, op, value in filters:
+                    mask &= FACTOR_OPS[op](universe[column], value)
+                filtered_df = universe[mask]
             print(f"StrategyService (simple_value_screen): Found {len(filtered_df)} stocks after filtering.")
-            results_sv = []
-            for _, row in filtered_df.iterrows():
-                results_sv.append(SelectedPoolItem(
-                    ts_code=row['ts_code'], name=row['name'], pe_ttm=row['pe_ttm'], pb=row['pb'],
-                    dividend_yield_ratio=row['dv_ratio_actual'], total_mv=row['total_mv_actual'] / 10000,
-                ))
-            return results_sv
+            return [
+                SelectedPoolItem(ts_code=ts_code, name=name, pe_ttm=pe_ttm, pb=pb,
+                                 dividend_yield_ratio=dv_ratio / 100.0, total_mv=total_mv / 10000)
+                for ts_code, name, pe_ttm, pb, dv_ratio, total_mv in zip(
+                    filtered_df.index, filtered_df['name'], filtered_df['pe_ttm'], filtered_df['pb'],
+                    filtered_df['dv_ratio'], filtered_df['total_mv'])
+            ]
 
         else:
             raise ValueError(f"Unknown selection strategy_id: {strategy_id}")
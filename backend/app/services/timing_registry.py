@@ -0,0 +1,278 @@
+# --- START OF FILE backend/app/services/timing_registry.py ---
+"""
+择时策略注册表：每个策略声明自己的数据需求，并提供一个在共享面板上运行的向量化内核。
+
+- fields(p):      需要的日线字段（close 始终加载）；
+- lookback(p):    评估日之前需要回溯的交易日数（面板路径）；
+- indicators(p):  需要的增量指标状态 (kind, field, period)（状态路径）；
+- kernel(frame, p): 返回 ({signal_type: 事件掩码}, {指标名: 指标矩阵})，矩阵的行是对齐空间里每只股票自己的 K 线，
+                  最后一行即最新 K 线；
+- describe(...):  把单个事件的指标值格式化为 (signal_strength, indicator_values, notes)。
+
+服务层对一次请求中的所有策略取需求的并集，只加载一次数据：
+    PanelFrame  按回溯窗口拉取的日线面板（align_right 之后），指标按 (kind, field, period) 缓存，可供多个策略共用；
+    StateFrame  增量指标状态的两行视图（前一根 / 最新 K 线），接口与 PanelFrame 相同。
+内核只用到最后两行时，两种数据源的结果一致；历史扫描直接在完整面板上运行同一个内核。
+"""
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.indicator_engine import RSI_WARMUP_BARS, align_right, cross_above, cross_below, lag, rsi, sma, source_rows
+
+logger = logging.getLogger(__name__)
+
+# 停牌日没有 K 线，均线类策略在最少所需的交易日之外多取几天，避免短暂停牌的股票因数据不足被跳过
+SUSPENSION_BUFFER_BARS = 10
+
+IndicatorSpec = Tuple[str, str, int] # (kind, field, period)
+KernelResult = Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]
+
+
+class PanelFrame:
+    """日线面板 {field: DataFrame(index=trade_date, columns=ts_code)} 右对齐后的视图。"""
+
+    def __init__(self, panel: Dict[str, pd.DataFrame]):
+        close_panel = panel['close']
+        self.codes = pd.Index(close_panel.columns, name='ts_code')
+        self.dates = close_panel.index
+        raw = close_panel.to_numpy(dtype=np.float64)
+        closes, self.bars, last_rows = align_right(raw)
+        self.rows = source_rows(raw) # 对齐后每个格子在 dates 中的行号，补齐的格子为 -1
+        self.last_dates = pd.DatetimeIndex([self.dates[r] if r >= 0 else pd.NaT for r in last_rows])
+        self._fields = {'close': closes}
+        for name, frame in panel.items():
+            if name != 'close':
+                self._fields[name] = align_right(frame.to_numpy(dtype=np.float64))[0]
+        # 至少保留两行，内核总能取到“最新”和“前一根”
+        missing = max(0, 2 - len(closes))
+        if missing:
+            self.rows = np.vstack([np.full((missing, len(self.codes)), -1, dtype=np.int64), self.rows])
+            self._fields = {name: np.vstack([np.full((missing, len(self.codes)), np.nan), values])
+                            for name, values in self._fields.items()}
+        self._indicators: Dict[IndicatorSpec, np.ndarray] = {}
+
+    def field(self, name: str) -> np.ndarray:
+        return self._fields[name]
+
+    def indicator(self, kind: str, field: str, period: int) -> np.ndarray:
+        key = (kind, field, int(period))
+        if key not in self._indicators:
+            compute = rsi if kind == 'rsi' else sma
+            self._indicators[key] = compute(self.field(field), int(period))
+        return self._indicators[key]
+
+
+class StateFrame:
+    """
+    增量指标状态的两行视图：第 0 行为前一根 K 线，第 1 行为最新 K 线。
+    收盘价和收盘价均线按 scale 折算为前复权口径；原始字段只有最新一行，前一行为 NaN。
+    """
+
+    def __init__(self, ts_codes: Sequence[str], snapshots: Dict[IndicatorSpec, pd.DataFrame]):
+        self.codes = pd.Index(list(ts_codes), name='ts_code')
+        self._snaps = dict(snapshots) # IndicatorStateStore.snapshot 在锁内取得的快照，按 ts_codes 排列
+        by_field: Dict[str, List[pd.DataFrame]] = {}
+        for (kind, field, period), snap in self._snaps.items():
+            by_field.setdefault(field, []).append(snap)
+        primary = by_field.get('close') or next(iter(by_field.values()))
+        self.bars = np.max([snap['count'].to_numpy() for snap in primary], axis=0)
+        self.last_dates = pd.DatetimeIndex(pd.to_datetime(primary[0]['last_date'].astype(str), format='%Y%m%d', errors='coerce'))
+        self._fields: Dict[str, np.ndarray] = {}
+        for field, snaps in by_field.items():
+            latest = snaps[0]['last_input'].to_numpy()
+            if field == 'close':
+                latest = latest / snaps[0]['scale'].to_numpy()
+            self._fields[field] = np.vstack([np.full(len(self.codes), np.nan), latest])
+
+    def field(self, name: str) -> np.ndarray:
+        return self._fields[name]
+
+    def indicator(self, kind: str, field: str, period: int) -> np.ndarray:
+        snap = self._snaps[(kind, field, int(period))]
+        values = np.vstack([snap['prev_value'].to_numpy(), snap['value'].to_numpy()])
+        if kind == 'sma' and field == 'close':
+            values = values / snap['scale'].to_numpy()
+        return values
+
+
+class TimingStrategy(ABC):
+    """
+    择时策略基类。params 先经 parse_params 规范化，其余方法都接收规范化后的参数 p。
+    接口方法都是抽象方法：漏实现的子类在实例化（即注册）时就抛 TypeError，而不是等到第一次请求。
+    """
+    id: str = ''
+    aliases: Tuple[str, ...] = ()
+    signal_types: Tuple[str, ...] = ()
+
+    @abstractmethod
+    def parse_params(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """读取并校验参数，非法时抛出 ValueError。"""
+
+    @abstractmethod
+    def fields(self, p: Dict[str, Any]) -> Tuple[str, ...]:
+        """需要的日线字段。"""
+
+    @abstractmethod
+    def lookback(self, p: Dict[str, Any]) -> int:
+        """评估日之前需要回溯的交易日数。"""
+
+    @abstractmethod
+    def indicators(self, p: Dict[str, Any]) -> List[IndicatorSpec]:
+        """需要的增量指标状态 (kind, field, period)。"""
+
+    @abstractmethod
+    def min_bars(self, p: Dict[str, Any]) -> int:
+        """评估当日信号至少需要的 K 线数，不足的股票跳过。"""
+
+    @abstractmethod
+    def kernel(self, frame, p: Dict[str, Any]) -> KernelResult:
+        """返回 ({signal_type: 事件掩码}, {指标名: 指标矩阵})。"""
+
+    @abstractmethod
+    def describe(self, signal_type: str, point: Dict[str, float], p: Dict[str, Any],
+                 industry: Optional[str]) -> Tuple[Optional[float], Dict[str, Any], str]:
+        """返回 (signal_strength, indicator_values, notes)。"""
+
+
+class RsiOversoldRebound(TimingStrategy):
+    id = "rsi_oversold_rebound"
+    signal_types = ("RSI_OVERSOLD_TURN_UP", "RSI_IN_OVERSOLD_ZONE")
+
+    def parse_params(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "rsi_period": int(params.get("rsi_period", 14)),
+            "rsi_oversold_threshold": float(params.get("rsi_oversold_threshold", 30.0)),
+        }
+
+    def fields(self, p: Dict[str, Any]) -> Tuple[str, ...]:
+        return ('close',)
+
+    def lookback(self, p: Dict[str, Any]) -> int:
+        return p["rsi_period"] + 1 + RSI_WARMUP_BARS
+
+    def indicators(self, p: Dict[str, Any]) -> List[IndicatorSpec]:
+        return [('rsi', 'close', p["rsi_period"])]
+
+    def min_bars(self, p: Dict[str, Any]) -> int:
+        # 当前和前一日 RSI 各需要 rsi_period + 1 根 K 线
+        return p["rsi_period"] + 1
+
+    def kernel(self, frame, p: Dict[str, Any]) -> KernelResult:
+        current_rsi = frame.indicator('rsi', 'close', p["rsi_period"])
+        prev_rsi = lag(current_rsi)
+        with np.errstate(invalid='ignore'):
+            oversold = ~np.isnan(prev_rsi) & (current_rsi < p["rsi_oversold_threshold"])
+            # 1. 拐头型反弹；2. 否则仍在超卖区（观察）
+            turn_up = oversold & (current_rsi > prev_rsi)
+        events = {"RSI_OVERSOLD_TURN_UP": turn_up, "RSI_IN_OVERSOLD_ZONE": oversold & ~turn_up}
+        return events, {"rsi": current_rsi, "prev_rsi": prev_rsi}
+
+    def describe(self, signal_type, point, p, industry):
+        period, threshold = p["rsi_period"], p["rsi_oversold_threshold"]
+        cur, prev = point["rsi"], point["prev_rsi"]
+        if signal_type == "RSI_OVERSOLD_TURN_UP":
+            signal_strength = round((cur - prev) / (threshold - prev + 1e-6), 2) # Normalize strength, avoid div by zero
+            signal_strength = min(max(signal_strength, 0.1), 0.9) # Cap strength between 0.1 and 0.9 for this type
+            return (signal_strength,
+                    {"rsi": round(cur, 2), "prev_rsi": round(prev, 2), "threshold": threshold},
+                    f"RSI({period})在超卖区从{prev:.2f}拐头向上至{cur:.2f} (阈值:{threshold}). 行业：{industry or 'N/A'}")
+        return (round(1 - (cur / threshold), 2),
+                {"rsi": round(cur, 2), "threshold": threshold},
+                f"RSI({period})为{cur:.2f}，处于超卖区 (阈值:{threshold}). 行业：{industry or 'N/A'}")
+
+
+class MaCross(TimingStrategy):
+    id = "ma_cross"
+    aliases = ("ma_golden_cross",) # 服务层历史上使用的 ID
+    signal_types = ("MA_GOLDEN_CROSS", "MA_DEATH_CROSS")
+
+    def parse_params(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        p = {
+            "short_ma_period": int(params.get("short_ma_period", 5)),
+            "long_ma_period": int(params.get("long_ma_period", 20)),
+            "enable_volume_filter": bool(params.get("enable_volume_filter", False)),
+            "volume_avg_days": int(params.get("volume_avg_days", 5)),
+            "volume_multiple": float(params.get("volume_multiple", 1.5)),
+        }
+        if p["short_ma_period"] >= p["long_ma_period"]: # 短周期不能等于或大于长周期
+            raise ValueError(f"Short MA period ({p['short_ma_period']}) must be less than Long MA period ({p['long_ma_period']}).")
+        return p
+
+    def fields(self, p: Dict[str, Any]) -> Tuple[str, ...]:
+        return ('close', 'vol')
+
+    def lookback(self, p: Dict[str, Any]) -> int:
+        # 均线交叉需要 long_ma_period + 1 根，量能过滤需要 volume_avg_days + 1 根
+        return max(p["long_ma_period"] + 1, p["volume_avg_days"] + 1) + SUSPENSION_BUFFER_BARS
+
+    def indicators(self, p: Dict[str, Any]) -> List[IndicatorSpec]:
+        return [('sma', 'close', p["short_ma_period"]), ('sma', 'close', p["long_ma_period"]),
+                ('sma', 'vol', p["volume_avg_days"])]
+
+    def min_bars(self, p: Dict[str, Any]) -> int:
+        return p["long_ma_period"] + 1
+
+    def kernel(self, frame, p: Dict[str, Any]) -> KernelResult:
+        short_ma = frame.indicator('sma', 'close', p["short_ma_period"])
+        long_ma = frame.indicator('sma', 'close', p["long_ma_period"])
+        volumes = frame.field('vol')
+        golden_cross = cross_above(short_ma, long_ma)
+        values = {
+            f"short_ma({p['short_ma_period']})": short_ma,
+            f"long_ma({p['long_ma_period']})": long_ma,
+            "volume": volumes,
+        }
+        if p["enable_volume_filter"]:
+            # 当日成交量需超过过去 N 日（不含当日）均量的 volume_multiple 倍；均量无法计算时不拦截信号
+            avg_volume = lag(frame.indicator('sma', 'vol', p["volume_avg_days"]))
+            with np.errstate(invalid='ignore'):
+                golden_cross &= np.isnan(avg_volume) | (volumes > avg_volume * p["volume_multiple"])
+            values["avg_volume"] = avg_volume
+        # 死叉通常不关注成交量放大
+        events = {"MA_GOLDEN_CROSS": golden_cross, "MA_DEATH_CROSS": cross_below(short_ma, long_ma)}
+        return events, values
+
+    def describe(self, signal_type, point, p, industry):
+        short_period, long_period = p["short_ma_period"], p["long_ma_period"]
+        ma_values = {
+            f"short_ma({short_period})": round(point[f"short_ma({short_period})"], 2),
+            f"long_ma({long_period})": round(point[f"long_ma({long_period})"], 2),
+        }
+        if signal_type == "MA_DEATH_CROSS":
+            return 0.3, ma_values, f"SMA({short_period})下穿SMA({long_period}). 行业：{industry or 'N/A'}"
+        volume = point["volume"]
+        volume_note = ""
+        if p["enable_volume_filter"]:
+            volume_note = " (量能数据不足)" if np.isnan(point["avg_volume"]) else " (量能确认)"
+        indicator_values = {
+            **ma_values,
+            "volume": int(volume) if pd.notna(volume) else None,
+            "filter_active": p["enable_volume_filter"], # 传递成交量过滤是否激活的状态
+        }
+        return 0.7, indicator_values, f"SMA({short_period})上穿SMA({long_period}).{volume_note} 行业：{industry or 'N/A'}"
+
+
+TIMING_STRATEGIES: Dict[str, TimingStrategy] = {}
+
+
+def register_timing_strategy(strategy: TimingStrategy) -> TimingStrategy:
+    for key in (strategy.id, *strategy.aliases):
+        TIMING_STRATEGIES[key] = strategy
+    return strategy
+
+
+def get_timing_strategy(strategy_id: str) -> TimingStrategy:
+    strategy = TIMING_STRATEGIES.get(strategy_id)
+    if strategy is None:
+        logger.error(f"Unknown timing strategy_id: {strategy_id}")
+        raise ValueError(f"Unknown timing strategy_id: {strategy_id}")
+    return strategy
+
+
+register_timing_strategy(RsiOversoldRebound())
+register_timing_strategy(MaCross())
+# --- END OF FILE backend/app/services/timing_registry.py ---
@@ -0,0 +1,216 @@
+# --- START OF FILE backend/app/services/trading_calendar.py ---
+"""
+本地交易日历 (SSE，与 SZSE 相同)。
+
+从 Tushare trade_cal 拉取一次后落盘缓存，提供：
+- 交易日 <-> 整数下标映射 (index_of / date_at)，面板可以按整数偏移对齐；
+- O(1) 的“日期 X 之前第 N 个交易日” (shift)：预先为每个自然日算好
+  “当日或之前最近一个交易日”的下标，查询只需一次数组索引；
+- 收盘数据发布时间相关的推算 (latest_publishable_date / next_publish_time)。
+
+日历只在首次查询和 reload 时加载（可能请求 trade_cal）。API 进程在启动时于线程池中预加载，
+之后由 run_calendar_refresher 定期在线程池中 reload，请求处理中的查询只读内存、不会阻塞事件循环。
+
+没有 token 且本地也没有缓存时，退化为工作日日历（不含节假日），并打印警告。
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.services.columnar_io import load_records, save_records_atomic
+
+logger = logging.getLogger(__name__)
+
+CALENDAR_START = '20000101'
+CALENDAR_REFRESH_DAYS = 7 # 本地日历文件超过该天数后重新拉取（次年日历通常在年底发布）
+CALENDAR_RELOAD_INTERVAL_SECONDS = 24 * 3600 # API 进程内重新加载日历的间隔（文件未过期时只读本地文件）
+
+
+def _parse_hhmm(value: str) -> Tuple[int, int]:
+    hour, minute = value.split(':')
+    return int(hour), int(minute)
+
+
+def latest_publishable_date(now: Optional[datetime] = None) -> str:
+    """
+    当前时刻 Tushare 可能已经发布的最新自然日 (YYYYMMDD)。
+    今天的收盘数据要到 EOD_PUBLISH_TIME 之后才会出现，在此之前最多只能拿到昨天的数据。
+    """
+    now = now or datetime.now()
+    hour, minute = _parse_hhmm(settings.EOD_PUBLISH_TIME)
+    if (now.hour, now.minute) < (hour, minute):
+        now = now - timedelta(days=1)
+    return now.strftime('%Y%m%d')
+
+
+def _day_number(date_str: str) -> int:
+    """YYYYMMDD -> 1970-01-01 起的天数。"""
+    return int(np.datetime64(f'{date_str[:4]}-{date_str[4:6]}-{date_str[6:8]}', 'D').astype(np.int64))
+
+
+class TradingCalendar:
+    def __init__(self, client=None, exchange: str = 'SSE', root: Optional[str] = None):
+        self._client = client
+        self.exchange = exchange
+        self.path = os.path.join(root or settings.MARKET_DATA_DIR, 'calendar', f'{exchange}.npy')
+        self._lock = threading.Lock()
+        self._dates: Optional[Tuple[str, ...]] = None
+        self._pos: Dict[str, int] = {}
+        self._day0 = 0
+        self._floor: np.ndarray = np.empty(0, dtype=np.int64)
+        self.approximate = False
+
+    @property
+    def client(self):
+        # 延迟导入，避免与 tushare_client 的循环依赖
+        if self._client is None:
+            from app.services.tushare_client import ts_client
+            self._client = ts_client
+        return self._client
+
+    # --- 加载 ---
+    def _fetch(self) -> Tuple[str, ...]:
+        end = f'{datetime.now().year + 1}1231'
+        return tuple(self.client.get_trade_dates(CALENDAR_START, end, exchange=self.exchange))
+
+    def _load(self) -> None:
+        dates: Tuple[str, ...] = tuple()
+        stale = not os.path.exists(self.path) or \
+            time.time() - os.path.getmtime(self.path) > CALENDAR_REFRESH_DAYS * 86400
+        if stale:
+            dates = self._fetch()
+            if dates:
+                save_records_atomic(self.path, np.array([int(d) for d in dates], dtype='<i4'))
+        if not dates:
+            records = load_records(self.path, mmap=False)
+            if records is not None and len(records):
+                dates = tuple(str(d) for d in records)
+        self.approximate = not dates
+        if self.approximate:
+            logger.warning("TradingCalendar: trade_cal unavailable, falling back to a weekday calendar (holidays not excluded).")
+            end = f'{datetime.now().year + 1}1231'
+            dates = tuple(d.strftime('%Y%m%d') for d in pd.bdate_range(CALENDAR_START, end))
+        self._build_index(dates)
+
+    def _build_index(self, dates: Tuple[str, ...]) -> None:
+        days = np.array([_day_number(d) for d in dates], dtype=np.int64)
+        floor = np.full(days[-1] - days[0] + 1, -1, dtype=np.int64)
+        floor[days - days[0]] = np.arange(len(days))
+        self._floor = np.maximum.accumulate(floor) # 每个自然日 -> 当日或之前最近一个交易日的下标
+        self._day0 = int(days[0])
+        self._pos = {d: i for i, d in enumerate(dates)}
+        self._dates = dates
+
+    def _ensure_loaded(self) -> None:
+        if self._dates is None:
+            with self._lock:
+                if self._dates is None:
+                    self._load()
+
+    def reload(self) -> None:
+        with self._lock:
+            self._load()
+
+    # --- 查询 ---
+    @property
+    def dates(self) -> Tuple[str, ...]:
+        self._ensure_loaded()
+        return self._dates
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def is_trading_day(self, date_str: str) -> bool:
+        self._ensure_loaded()
+        return date_str in self._pos
+
+    def index_of(self, date_str: str) -> Optional[int]:
+        """交易日 -> 整数下标；非交易日返回 None。"""
+        self._ensure_loaded()
+        return self._pos.get(date_str)
+
+    def date_at(self, index: int) -> str:
+        return self.dates[index]
+
+    def floor_index(self, date_str: str) -> int:
+        """当日或之前最近一个交易日的下标 (O(1))；早于日历起点时返回 -1。"""
+        self._ensure_loaded()
+        offset = _day_number(date_str) - self._day0
+        if offset < 0:
+            return -1
+        if offset >= len(self._floor):
+            return len(self._dates) - 1
+        return int(self._floor[offset])
+
+    def to_indices(self, dates: Iterable[str]) -> np.ndarray:
+        """批量 floor_index，用于把面板日期映射到日历下标。"""
+        self._ensure_loaded()
+        offsets = np.array([_day_number(d) for d in dates], dtype=np.int64) - self._day0
+        clipped = np.clip(offsets, 0, len(self._floor) - 1)
+        return np.where(offsets < 0, -1, self._floor[clipped])
+
+    def shift(self, date_str: str, n: int) -> str:
+        """date_str 当日或之前最近的交易日再平移 n 个交易日（n<0 为向前），越界时截断到日历边界。"""
+        index = self.floor_index(date_str) + n
+        return self.date_at(min(max(index, 0), len(self._dates) - 1))
+
+    def next_trade_date(self, date_str: str) -> str:
+        """严格晚于 date_str 的第一个交易日。"""
+        return self.shift(date_str, 1)
+
+    def window(self, end_date: str, n: int) -> List[str]:
+        """截至 end_date（含）的最后 n 个交易日，升序。"""
+        end_index = self.floor_index(end_date)
+        return list(self.dates[max(end_index - n + 1, 0):end_index + 1])
+
+    def dates_between(self, start_date: str, end_date: str) -> List[str]:
+        """[start_date, end_date] 内的交易日，升序。"""
+        start_index = self.floor_index(start_date)
+        if start_index < 0 or self.date_at(start_index) != start_date:
+            start_index += 1
+        end_index = self.floor_index(end_date)
+        return list(self.dates[start_index:end_index + 1])
+
+    def latest_trade_date(self, now: Optional[datetime] = None) -> str:
+        """当前时刻已经（或应该已经）发布收盘数据的最近一个交易日。"""
+        return self.date_at(self.floor_index(latest_publishable_date(now)))
+
+    def next_publish_time(self, now: Optional[datetime] = None) -> datetime:
+        """下一次收盘数据发布时间：下一个（或当天的）交易日的 EOD_PUBLISH_TIME。"""
+        now = now or datetime.now()
+        hour, minute = _parse_hhmm(settings.EOD_PUBLISH_TIME)
+        today = now.strftime('%Y%m%d')
+        publish_today = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if self.is_trading_day(today) and publish_today > now:
+            return publish_today
+        next_date = datetime.strptime(self.next_trade_date(today), '%Y%m%d')
+        return next_date.replace(hour=hour, minute=minute)
+
+
+trading_calendar = TradingCalendar()
+
+
+def next_publish_time(now: Optional[datetime] = None) -> datetime:
+    return trading_calendar.next_publish_time(now)
+
+
+async def run_calendar_refresher(calendar: TradingCalendar = trading_calendar,
+                                 interval_seconds: float = CALENDAR_RELOAD_INTERVAL_SECONDS) -> None:
+    """进程内定时器：每隔 interval_seconds 在线程池中 reload 一次日历，内存中的日历不会过期。"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await loop.run_in_executor(None, calendar.reload)
+            logger.info(f"TradingCalendar: reloaded, {len(calendar.dates)} trade dates (approximate={calendar.approximate}).")
+        except Exception as e:
+            logger.exception(f"TradingCalendar: reload failed: {e}")
+# --- END OF FILE backend/app/services/trading_calendar.py ---
@@ -0,0 +1,387 @@
+# --- START OF FILE backend/app/services/tushare_backends.py ---
+"""
+TushareClient 的可插拔数据后端 (self.pro)。
+
+通过 TUSHARE_BACKEND 选择：
+- live:      ts.pro_api()，经令牌桶限流 + 失败重试；
+- record:    同 live，并把每次成功的响应以 gzip 压缩写入 TUSHARE_RECORD_DIR；
+- replay:    只从 TUSHARE_RECORD_DIR 回放录制的响应，不需要 token 和网络；
+- synthetic: 按固定随机种子生成全市场（默认 5000 只）的行情、每日指标和财务指标，
+             每次调用可模拟网络延迟，用于离线压测和性能分析。
+
+各后端都实现 TushareClient 用到的接口：stock_basic, trade_cal, daily, adj_factor,
+daily_basic, fina_indicator, fina_indicator_vip，参数和返回列与 Tushare 一致。
+"""
+import gzip
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.services.trading_calendar import latest_publishable_date
+from app.services.tushare_gateway import RateLimitedProApi, tushare_bucket
+
+BACKENDS = ('live', 'record', 'replay', 'synthetic')
+
+
+def _request_key(api_name: str, args: Sequence[Any], kwargs: Dict[str, Any]) -> Tuple[str, str]:
+    """把一次接口调用归一化为 (参数描述, 文件名用的摘要)。值为 None 的参数与未传等价。"""
+    params = {k: str(v) for k, v in sorted(kwargs.items()) if v is not None}
+    description = json.dumps({'api': api_name, 'args': [str(a) for a in args], 'params': params},
+                             ensure_ascii=False, sort_keys=True)
+    return description, hashlib.sha1(description.encode('utf-8')).hexdigest()[:20]
+
+
+class RecordingProApi:
+    """pro_api 的代理：调用真实接口，并把响应写入 <root>/<api>/<digest>.pkl.gz。"""
+
+    def __init__(self, pro: Any, root: str):
+        self._pro = pro
+        self._root = root
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._pro, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            description, digest = _request_key(name, args, kwargs)
+            path = os.path.join(self._root, name, f'{digest}.pkl.gz')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{threading.get_ident()}.tmp'
+            with gzip.open(tmp_path, 'wb') as f:
+                pickle.dump({'request': description, 'response': result}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            return result
+        return call
+
+
+class ReplayProApi:
+    """回放 RecordingProApi 录制的响应。没有录制过的调用抛出 LookupError（与在线接口报错的处理方式相同）。"""
+
+    def __init__(self, root: str):
+        self._root = root
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            description, digest = _request_key(name, args, kwargs)
+            path = os.path.join(self._root, name, f'{digest}.pkl.gz')
+            if not os.path.exists(path):
+                raise LookupError(f"No recorded Tushare response for {description}")
+            with gzip.open(path, 'rb') as f:
+                return pickle.load(f)['response']
+        return call
+
+
+INDUSTRIES = ('银行', '非银金融', '医药生物', '电子', '计算机', '通信', '传媒', '食品饮料', '家用电器', '汽车',
+              '机械设备', '电力设备', '化工', '有色金属', '钢铁', '房地产', '建筑装饰', '交通运输', '公用事业', '农林牧渔')
+AREAS = ('北京', '上海', '深圳', '广东', '浙江', '江苏', '山东', '四川', '湖北', '福建')
+
+
+def _hash_noise(day: Any, ticker: Any, salt: int) -> np.ndarray:
+    """(交易日下标, 股票下标) -> [0, 1) 的确定性伪随机数（逐元素广播），逐股票查询和按日查询得到同样的值。"""
+    x = np.sin(np.asarray(day) * 12.9898 + np.asarray(ticker) * 78.233 + salt * 37.719) * 43758.5453
+    return x - np.floor(x)
+
+
+def _split_codes(ts_code: Optional[str]) -> Optional[List[str]]:
+    return [c for c in ts_code.split(',') if c] if ts_code else None
+
+
+def _project(df: pd.DataFrame, fields: Optional[str]) -> pd.DataFrame:
+    if not fields:
+        return df
+    columns = [f.strip() for f in fields.split(',') if f.strip() in df.columns]
+    return df[columns]
+
+
+class SyntheticProApi:
+    """
+    合成的全市场数据。价格为带漂移的几何随机游走，含分红除权（复权因子跳变）、次新股上市和随机停牌；
+    同一只股票、同一交易日无论按股票还是按日期查询，得到的数值都相同。
+    """
+
+    def __init__(self, n_tickers: int = 5000, start_date: str = '20190101', seed: int = 42, latency_ms: float = 0.0):
+        self.n_tickers = n_tickers
+        self.start_date = start_date
+        self.seed = seed
+        self.latency_ms = latency_ms
+        self._lock = threading.Lock()
+        self._built = False
+
+    # --- 数据生成 ---
+    def _build(self) -> None:
+        with self._lock:
+            if self._built:
+                return
+            rng = np.random.default_rng(self.seed)
+            n = self.n_tickers
+            groups = np.arange(n) // 3
+            self.codes = np.array([
+                f'{600000 + g:06d}.SH' if i % 3 == 0 else f'{1 + g:06d}.SZ' if i % 3 == 1 else f'{300001 + g:06d}.SZ'
+                for i, g in enumerate(groups)
+            ])
+            self.code_index = {c: i for i, c in enumerate(self.codes)}
+            self.dates = np.array([d.strftime('%Y%m%d') for d in
+                                   pd.bdate_range(self.start_date, latest_publishable_date())])
+            self.date_index = {d: i for i, d in enumerate(self.dates)}
+            n_days = len(self.dates)
+            days = np.arange(n_days)
+            tickers = np.arange(n)
+
+            volatility = rng.uniform(0.012, 0.035, n).astype(np.float32)
+            drift = rng.normal(0.0002, 0.0006, n).astype(np.float32)
+            returns = rng.standard_normal((n_days, n), dtype=np.float32) * volatility + drift
+            np.clip(returns, -0.095, 0.095, out=returns) # 涨跌停
+            base_factor = rng.uniform(1.0, 20.0, n).astype(np.float32)
+            dividends = np.where(_hash_noise(days[:, None], tickers[None, :], 1) < 0.002, np.float32(1.02), np.float32(1.0))
+            self.factors = base_factor * np.cumprod(dividends, axis=0, dtype=np.float32)
+            path = rng.uniform(3.0, 80.0, n).astype(np.float32) * base_factor * np.exp(np.cumsum(returns, axis=0))
+            self.close = np.round(path / self.factors, 2)
+
+            # 约 15% 的股票在区间内上市；另有约 0.5% 的随机停牌
+            listed_from = np.where(rng.random(n) < 0.15, rng.integers(0, max(n_days, 1), n), 0)
+            self.listed_from = listed_from
+            self.has_bar = (days[:, None] >= listed_from[None, :]) & (_hash_noise(days[:, None], tickers[None, :], 2) >= 0.005)
+            self.list_date = np.array([
+                self.dates[d] if d > 0 and n_days else
+                (datetime.strptime(self.start_date, '%Y%m%d') - timedelta(days=int(rng.integers(30, 9000)))).strftime('%Y%m%d')
+                for d in listed_from
+            ])
+
+            self.industry = np.array(INDUSTRIES)[rng.integers(0, len(INDUSTRIES), n)]
+            self.area = np.array(AREAS)[rng.integers(0, len(AREAS), n)]
+            self.total_share = np.round(rng.lognormal(11.5, 1.0, n), 2) # 万股
+            self.float_share = np.round(self.total_share * rng.uniform(0.3, 1.0, n), 2)
+            self.eps = rng.normal(0.6, 0.8, n) # 每股收益 (元，TTM)
+            self.bps = np.abs(rng.normal(6.0, 3.0, n)) + 0.5 # 每股净资产
+            self.sps = np.abs(rng.normal(8.0, 5.0, n)) + 0.3 # 每股营收
+            self.dps = np.clip(rng.normal(0.2, 0.25, n), 0.0, None) # 每股分红
+            self.roe = rng.normal(9.0, 8.0, n) # 年化 ROE (%)
+            self.base_vol = rng.lognormal(11.0, 0.8, n) # 日均成交量 (手)
+            self._built = True
+
+    def _sleep(self) -> None:
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000.0)
+
+    def _ticker_indices(self, ts_code: Optional[str]) -> np.ndarray:
+        codes = _split_codes(ts_code)
+        if codes is None:
+            return np.arange(self.n_tickers)
+        return np.array([self.code_index[c] for c in codes if c in self.code_index], dtype=np.int64)
+
+    def _day_indices(self, trade_date: Optional[str], start_date: Optional[str], end_date: Optional[str]) -> np.ndarray:
+        if trade_date:
+            index = self.date_index.get(trade_date)
+            return np.array([] if index is None else [index], dtype=np.int64)
+        lo = np.searchsorted(self.dates, start_date or self.dates[0], side='left')
+        hi = np.searchsorted(self.dates, end_date or self.dates[-1], side='right')
+        return np.arange(lo, hi)
+
+    def _bar_cells(self, ts_code, trade_date, start_date, end_date) -> Tuple[np.ndarray, np.ndarray]:
+        """返回有 K 线的 (交易日下标, 股票下标)，按股票升序、日期降序（与 Tushare 返回顺序一致）。"""
+        days = self._day_indices(trade_date, start_date, end_date)
+        tickers = self._ticker_indices(ts_code)
+        if len(days) == 0 or len(tickers) == 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+        days = days[::-1]
+        mask = self.has_bar[np.ix_(days, tickers)]
+        day_grid, ticker_grid = np.meshgrid(days, tickers, indexing='ij')
+        order = np.lexsort((-day_grid[mask], ticker_grid[mask]))
+        return day_grid[mask][order], ticker_grid[mask][order]
+
+    def _bar_values(self, day: np.ndarray, ticker: np.ndarray) -> Dict[str, np.ndarray]:
+        close = np.round(self.close[day, ticker].astype(np.float64), 2)
+        prev_day = np.maximum(day - 1, 0)
+        pre_close = np.where(day > 0, np.round(self.close[prev_day, ticker].astype(np.float64) * self.factors[prev_day, ticker]
+                                               / self.factors[day, ticker], 2), close)
+        noise = lambda salt: _hash_noise(day, ticker, salt)
+        open_ = np.round(pre_close * (1 + (noise(3) - 0.5) * 0.02), 2)
+        high = np.round(np.maximum(open_, close) * (1 + noise(4) * 0.01), 2)
+        low = np.round(np.minimum(open_, close) * (1 - noise(5) * 0.01), 2)
+        change = np.round(close - pre_close, 2)
+        pct_chg = np.round(change / pre_close * 100, 4)
+        vol = np.round(self.base_vol[ticker] * (0.5 + noise(6)) * (1 + np.abs(pct_chg) / 2), 2)
+        return {'open': open_, 'high': high, 'low': low, 'close': close, 'pre_close': pre_close,
+                'change': change, 'pct_chg': pct_chg, 'vol': vol, 'amount': np.round(vol * close / 10, 3)}
+
+    # --- Tushare 接口 ---
+    def stock_basic(self, exchange: str = '', list_status: str = 'L', fields: Optional[str] = None, **kwargs) -> pd.DataFrame:
+        self._build()
+        self._sleep()
+        df = pd.DataFrame({
+            'ts_code': self.codes,
+            'symbol': [c[:6] for c in self.codes],
+            'name': [f'合成{i:04d}' for i in range(self.n_tickers)],
+            'area': self.area,
+            'industry': self.industry,
+            'market': np.where(np.char.startswith(self.codes, '300'), '创业板', '主板'),
+            'list_status': 'L',
+            'list_date': self.list_date,
+            'is_hs': np.where(np.arange(self.n_tickers) % 4 == 0, 'H', 'N'),
+        })
+        if list_status and list_status != 'L':
+            df = df.iloc[0:0]
+        return _project(df, fields)
+
+    def trade_cal(self, exchange: str = 'SSE', start_date: Optional[str] = None, end_date: Optional[str] = None,
+                  is_open: Optional[str] = None, fields: Optional[str] = None, **kwargs) -> pd.DataFrame:
+        self._sleep()
+        days = pd.date_range(start_date or self.start_date, end_date or f'{datetime.now().year}1231')
+        df = pd.DataFrame({
+            'exchange': exchange,
+            'cal_date': days.strftime('%Y%m%d'),
+            'is_open': (days.weekday < 5).astype(int),
+        })
+        if is_open is not None and str(is_open) != '':
+            df = df[df['is_open'] == int(is_open)]
+        return _project(df.iloc[::-1].reset_index(drop=True), fields)
+
+    def daily(self, ts_code: Optional[str] = None, trade_date: Optional[str] = None, start_date: Optional[str] = None,
+              end_date: Optional[str] = None, fields: Optional[str] = None, **kwargs) -> pd.DataFrame:
+        self._build()
+        self._sleep()
+        day, ticker = self._bar_cells(ts_code, trade_date, start_date, end_date)
+        df = pd.DataFrame({'ts_code': self.codes[ticker], 'trade_date': self.dates[day], **self._bar_values(day, ticker)})
+        return _project(df, fields)
+
+    def adj_factor(self, ts_code: Optional[str] = None, trade_date: Optional[str] = None, start_date: Optional[str] = None,
+                   end_date: Optional[str] = None, fields: Optional[str] = None, **kwargs) -> pd.DataFrame:
+        self._build()
+        self._sleep()
+        days = self._day_indices(trade_date, start_date, end_date)[::-1]
+        tickers = self._ticker_indices(ts_code)
+        mask = days[:, None] >= self.listed_from[tickers][None, :]
+        day_grid, ticker_grid = np.meshgrid(days, tickers, indexing='ij')
+        day, ticker = day_grid[mask], ticker_grid[mask]
+        order = np.lexsort((-day, ticker))
+        day, ticker = day[order], ticker[order]
+        df = pd.DataFrame({'ts_code': self.codes[ticker], 'trade_date': self.dates[day],
+                           'adj_factor': np.round(self.factors[day, ticker].astype(np.float64), 4)})
+        return _project(df, fields)
+
+    def daily_basic(self, ts_code: Optional[str] = None, trade_date: Optional[str] = None, start_date: Optional[str] = None,
+                    end_date: Optional[str] = None, fields: Optional[str] = None, **kwargs) -> pd.DataFrame:
+        self._build()
+        self._sleep()
+        if not (trade_date or start_date or end_date) and len(self.dates):
+            trade_date = self.dates[-1] # 不指定日期时返回最新交易日
+        day, ticker = self._bar_cells(ts_code, trade_date, start_date, end_date)
+        values = self._bar_values(day, ticker)
+        close = values['close']
+        eps = self.eps[ticker]
+        turnover_rate = np.round(values['vol'] / self.float_share[ticker], 4)
+        df = pd.DataFrame({
+            'ts_code': self.codes[ticker],
+            'trade_date': self.dates[day],
+            'close': close,
+            'turnover_rate': turnover_rate,
+            'turnover_rate_f': np.round(turnover_rate * 1.3, 4),
+            'volume_ratio': np.round(0.5 + _hash_noise(day, ticker, 7) * 1.5, 2),
+            'pe': np.where(eps > 0, np.round(close / np.where(eps > 0, eps, 1) * 1.05, 4), np.nan),
+            'pe_ttm': np.where(eps > 0, np.round(close / np.where(eps > 0, eps, 1), 4), np.nan),
+            'pb': np.round(close / self.bps[ticker], 4),
+            'ps': np.round(close / self.sps[ticker] * 1.05, 4),
+            'ps_ttm': np.round(close / self.sps[ticker], 4),
+            'dv_ratio': np.round(self.dps[ticker] / close * 100, 4),
+            'dv_ttm': np.round(self.dps[ticker] / close * 100, 4),
+            'total_share': self.total_share[ticker],
+            'float_share': self.float_share[ticker],
+            'free_share': np.round(self.float_share[ticker] * 0.8, 2),
+            'total_mv': np.round(close * self.total_share[ticker], 2), # 万元
+            'circ_mv': np.round(close * self.float_share[ticker], 2),
+        })
+        return _project(df, fields)
+
+    def _fina_rows(self, tickers: np.ndarray, periods: List[str]) -> pd.DataFrame:
+        today = latest_publishable_date()
+        frames = []
+        for period in periods:
+            period_dt = datetime.strptime(period, '%Y%m%d')
+            delay = (25 + _hash_noise(int(period) % 100000, tickers, 8) * 90).astype(int)
+            ann_dates = np.array([(period_dt + timedelta(days=int(d))).strftime('%Y%m%d') for d in delay])
+            published = ann_dates <= today
+            if not published.any():
+                continue
+            t = tickers[published]
+            quarter = period_dt.month // 3
+            roe_yearly = np.round(self.roe[t] + (_hash_noise(int(period) % 100000, t, 9) - 0.5) * 4, 4)
+            roe = np.round(roe_yearly * quarter / 4, 4)
+            period_day = min(np.searchsorted(self.dates, period, side='right') - 1, len(self.dates) - 1)
+            close = self.close[max(period_day, 0), t].astype(np.float64) if len(self.dates) else np.full(len(t), np.nan)
+            frames.append(pd.DataFrame({
+                'ts_code': self.codes[t],
+                'ann_date': ann_dates[published],
+                'end_date': period,
+                'roe': roe,
+                'roe_yearly': roe_yearly,
+                'roe_waa': np.round(roe * 0.98, 4),
+                'q_roe': np.round(roe_yearly / 4, 4),
+                'pb': np.round(close / self.bps[t], 4),
+            }))
+        if not frames:
+            return pd.DataFrame(columns=['ts_code', 'ann_date', 'end_date', 'roe', 'roe_yearly', 'roe_waa', 'q_roe', 'pb'])
+        return pd.concat(frames, ignore_index=True)
+
+    def _periods(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[str]:
+        end_date = end_date or latest_publishable_date()
+        periods = []
+        for year in range(int(self.start_date[:4]), int(end_date[:4]) + 1):
+            for month_day in ('0331', '0630', '0930', '1231'):
+                period = f'{year}{month_day}'
+                if (start_date or self.start_date) <= period <= end_date:
+                    periods.append(period)
+        return periods
+
+    def fina_indicator(self, ts_code: Optional[str] = None, period: Optional[str] = None, start_date: Optional[str] = None,
+                       end_date: Optional[str] = None, fields: Optional[str] = None, **kwargs) -> pd.DataFrame:
+        self._build()
+        self._sleep()
+        periods = [period] if period else self._periods(start_date, end_date)
+        df = self._fina_rows(self._ticker_indices(ts_code), periods)
+        df = df.sort_values(['ts_code', 'end_date'], ascending=[True, False]).reset_index(drop=True)
+        return _project(df, fields)
+
+    def fina_indicator_vip(self, period: Optional[str] = None, fields: Optional[str] = None, **kwargs) -> pd.DataFrame:
+        return self.fina_indicator(period=period, fields=fields, **kwargs)
+
+
+def create_pro_api(token: Optional[str]) -> Optional[Any]:
+    """按 TUSHARE_BACKEND 创建 TushareClient.pro；live / record 模式没有 token 时返回 None。"""
+    backend = settings.TUSHARE_BACKEND.lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown TUSHARE_BACKEND '{settings.TUSHARE_BACKEND}', expected one of {BACKENDS}")
+    if backend == 'synthetic':
+        print(f"Tushare synthetic backend: {settings.TUSHARE_SYNTHETIC_TICKERS} tickers, latency {settings.TUSHARE_SYNTHETIC_LATENCY_MS}ms.")
+        return SyntheticProApi(n_tickers=settings.TUSHARE_SYNTHETIC_TICKERS, start_date=settings.TUSHARE_SYNTHETIC_START,
+                               seed=settings.TUSHARE_SYNTHETIC_SEED, latency_ms=settings.TUSHARE_SYNTHETIC_LATENCY_MS)
+    if backend == 'replay':
+        print(f"Tushare replay backend: {settings.TUSHARE_RECORD_DIR}")
+        return ReplayProApi(settings.TUSHARE_RECORD_DIR)
+    if not token:
+        print("Warning: Tushare token is not set. Some functionalities might be limited.")
+        return None
+    import tushare as ts # 只有在线模式需要 tushare，离线压测环境可以不安装
+    ts.set_token(token)
+    pro = ts.pro_api()
+    if backend == 'record':
+        print(f"Tushare record backend: responses are saved to {settings.TUSHARE_RECORD_DIR}")
+        pro = RecordingProApi(pro, settings.TUSHARE_RECORD_DIR)
+    print("Tushare Pro API initialized.")
+    # 所有在线接口调用统一经过令牌桶限流，失败时指数退避重试
+    return RateLimitedProApi(pro, tushare_bucket, max_retries=settings.TUSHARE_MAX_RETRIES,
+                             backoff_seconds=settings.TUSHARE_RETRY_BACKOFF_SECONDS)
+# --- END OF FILE backend/app/services/tushare_backends.py ---
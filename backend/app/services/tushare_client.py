@@ -1,23 +1,29 @@
 # --- START OF FILE backend/app/services/tushare_client.py ---
-import tushare as ts
-from functools import lru_cache
 from app.core.config import settings
-from typing import Optional, List, Tuple # <--- 导入 Tuple
+from app.services.bar_store import BarStore, bar_store
+from app.services.bulk_loader import bulk_loader
+from app.services.columnar_io import records_to_frame
+from app.services.eod_sync import eod_sync_job
+from app.services.trading_calendar import latest_publishable_date, trading_calendar
+from app.services.tushare_backends import create_pro_api
+from app.services.single_flight import single_flight
+from app.services.data_cache import cached_dataset, data_cache
+from typing import Optional, List, Tuple, Dict, Sequence # <--- 导入 Tuple
 import pandas as pd
 from datetime import datetime, timedelta 
 
+DAILY_BASIC_FIELDS = 'ts_code,trade_date,close,turnover_rate,turnover_rate_f,volume_ratio,pe,pe_ttm,pb,ps,ps_ttm,dv_ratio,dv_ttm,total_share,float_share,free_share,total_mv,circ_mv'
+FINA_INDICATOR_FIELDS = 'ts_code,ann_date,end_date,roe,roe_yearly,roe_waa,q_roe,pb'
+
 class TushareClient:
     def __init__(self, token: Optional[str] = None):
         self.token = token or settings.TUSHARE_TOKEN
-        if not self.token:
-            print("Warning: Tushare token is not set. Some functionalities might be limited.")
-            self.pro = None
-        else:
-            ts.set_token(self.token)
-            self.pro = ts.pro_api()
-            print("Tushare Pro API initialized.")
-
-    @lru_cache(maxsize=128)
+        self.bar_store: BarStore = bar_store
+        # 数据后端由 TUSHARE_BACKEND 决定：在线 / 录制 / 回放 / 合成，接口与 ts.pro_api() 一致
+        self.pro = create_pro_api(self.token)
+
+    @cached_dataset('stock_basic')
+    @single_flight
     def get_stock_basic(self, list_status: str = 'L', fields: str = 'ts_code,symbol,name,area,industry,list_date,is_hs') -> Optional[pd.DataFrame]:
         if not self.pro: return None
         try:
@@ -27,20 +33,24 @@ class TushareClient:
             print(f"Error fetching stock_basic from Tushare: {e}")
             return None
 
-    @lru_cache(maxsize=10)
+    @cached_dataset('daily_basic', is_latest=lambda a: a['trade_date'] is None)
+    @single_flight
     def get_daily_basic_for_date(self, trade_date: Optional[str] = None, ts_codes_tuple: Optional[Tuple[str, ...]] = None) -> Optional[pd.DataFrame]: # <--- 参数名改为 ts_codes_tuple，类型改为 Tuple
         """
         获取指定交易日的每日基本指标数据。
         trade_date: YYYYMMDD 格式，如果为 None，则获取最新交易日数据。
         ts_codes_tuple: 股票代码元组，如果为 None，则获取全市场。
         """
+        local_df = self._read_local_daily_basic(trade_date, ts_codes_tuple)
+        if local_df is not None:
+            return local_df
         if not self.pro: return None
         
         # 将元组转换回列表以进行Tushare API调用
         ts_codes_list: Optional[List[str]] = list(ts_codes_tuple) if ts_codes_tuple else None
 
         try:
-            fields = 'ts_code,trade_date,close,turnover_rate,turnover_rate_f,volume_ratio,pe,pe_ttm,pb,ps,ps_ttm,dv_ratio,dv_ttm,total_share,float_share,free_share,total_mv,circ_mv'
+            fields = DAILY_BASIC_FIELDS
             
             # 使用转换后的 ts_codes_list
             if ts_codes_list and isinstance(ts_codes_list, list):
@@ -53,34 +63,169 @@ class TushareClient:
                         all_data.append(df_batch)
                 if not all_data:
                     return None
-                return pd.concat(all_data, ignore_index=True)
+                df = pd.concat(all_data, ignore_index=True)
             else: # 获取全市场
                 # 注意：即使 ts_codes_list 为 None，Tushare API 的 ts_code 参数也期望是字符串
                 # 如果是 None，ts.pro.daily_basic 的 ts_code 参数会使用默认值（全市场）
                 # 如果我们想明确传递空字符串给 Tushare 以获取全市场，可以这样做：
                 # ts_code_param = ','.join(ts_codes_list) if ts_codes_list else ''
                 # 或者让 Tushare 客户端库处理 None
-                return self.pro.daily_basic(ts_code=','.join(ts_codes_list) if ts_codes_list else None, trade_date=trade_date, fields=fields)
+                df = self.pro.daily_basic(ts_code=','.join(ts_codes_list) if ts_codes_list else None, trade_date=trade_date, fields=fields)
+            if trade_date is None and df is not None and not df.empty:
+                # “最新”查询返回了新的交易日时，让其它“最新”类缓存立即失效
+                data_cache.publish_trade_date(df['trade_date'].max())
+            return df
 
         except Exception as e:
             print(f"Error fetching daily_basic from Tushare for date {trade_date}: {e}")
             return None
 
+    def _read_local_daily_basic(self, trade_date: Optional[str], ts_codes_tuple: Optional[Tuple[str, ...]]) -> Optional[pd.DataFrame]:
+        """
+        EOD 同步已落盘时直接读本地 daily_basic 横截面。
+        trade_date 为 None 时，只有本地已提交最新一个已发布的交易日，本地最新日期才算“最新”。
+        """
+        if trade_date is None:
+            if not eod_sync_job.is_fresh():
+                return None
+            trade_date = eod_sync_job.latest_committed_date()
+        records = bulk_loader.store.read('daily_basic', trade_date) if trade_date else None
+        if records is None:
+            return None
+        df = records_to_frame(records)
+        if ts_codes_tuple:
+            df = df[df['ts_code'].isin(ts_codes_tuple)].reset_index(drop=True)
+        return df if not df.empty else None
+
+    @single_flight
     def get_daily_data(self, ts_code: str, start_date: str, end_date: str,adj: str = 'qfq') -> Optional[pd.DataFrame]:
+        """
+        获取日线数据。本地只保存未复权日线和复权因子，qfq/hfq 在读取时计算；
+        只有本地未覆盖的日期区间才会请求 Tushare。
+        """
+        publishable = int(latest_publishable_date())
+        for gap_start, gap_end in self.bar_store.missing_ranges(ts_code, start_date, end_date):
+            if not self.pro: break
+            gap_end = min(gap_end, publishable) # 尚未发布的日期不去请求
+            if gap_start > gap_end:
+                continue
+            try:
+                bars_df = self.pro.daily(ts_code=ts_code, start_date=str(gap_start), end_date=str(gap_end))
+                factors_df = self.pro.adj_factor(ts_code=ts_code, start_date=str(gap_start), end_date=str(gap_end))
+            except Exception as e:
+                print(f"Error fetching daily data for {ts_code} from {gap_start} to {gap_end}: {e}")
+                continue
+            if bars_df is None or factors_df is None: # 出错时不记录覆盖区间，下次重试
+                continue
+            self.bar_store.write_bars(ts_code, bars_df)
+            self.bar_store.write_adj_factors(ts_code, factors_df)
+            # 区间包含今天时，只把覆盖区间记到已返回的最后一个交易日，收盘后的新数据下次仍会补拉
+            today = int(datetime.now().strftime('%Y%m%d'))
+            covered_end = gap_end
+            if gap_end >= today:
+                covered_end = int(bars_df['trade_date'].max()) if not bars_df.empty else gap_start - 1
+            self.bar_store.mark_covered(ts_code, gap_start, min(covered_end, gap_end))
+        return self.bar_store.read_bars(ts_code, start_date, end_date, adj=adj)
+
+    def get_daily_data_batch(self, ts_codes: Sequence[str], start_date: str, end_date: str,
+                             adj: str = 'qfq', fields: Sequence[str] = ('close', 'vol')) -> Dict[str, pd.DataFrame]:
+        """
+        批量获取多只股票的日线，返回 {ts_code: DataFrame}，没有数据的股票不出现在结果中。
+        比较两种方式还需要的 Tushare 请求数：
+        - 按交易日拉全市场横截面 (daily + adj_factor)，请求数随回溯天数增长；
+        - 逐只拉取 (daily + adj_factor)，请求数随本地未覆盖的股票数增长。
+        取请求更少的一种。
+        """
+        ts_codes = list(dict.fromkeys(ts_codes))
+        trade_dates = trading_calendar.dates_between(start_date, end_date)
+        n_per_ticker = sum(1 for c in ts_codes if self.bar_store.missing_ranges(c, start_date, end_date))
+        if trade_dates and n_per_ticker and bulk_loader.prefers_bulk(2 * n_per_ticker, trade_dates):
+            return bulk_loader.load_frames(trade_dates, ts_codes, fields=fields, adj=adj)
+        frames: Dict[str, pd.DataFrame] = {}
+        for ts_code in ts_codes:
+            df = self.get_daily_data(ts_code=ts_code, start_date=start_date, end_date=end_date, adj=adj)
+            if df is not None and not df.empty:
+                frames[ts_code] = df
+        return frames
+
+    def get_daily_panel(self, ts_codes: Optional[Sequence[str]], start_date: str, end_date: str,
+                        adj: str = 'qfq', fields: Sequence[str] = ('close', 'vol')) -> Dict[str, pd.DataFrame]:
+        """
+        批量获取日线面板，返回 {field: DataFrame(index=trade_date, columns=ts_code)}，停牌日为 NaN。
+        ts_codes 为 None 时返回全市场（按交易日横截面拉取）。
+        本地已有这些交易日的横截面时直接按日读取（文件数随天数而不是股票数增长）；
+        否则与 get_daily_data_batch 一样按请求数选择拉取方式。
+        """
+        trade_dates = trading_calendar.dates_between(start_date, end_date)
+        if ts_codes is None:
+            return bulk_loader.load_panel(trade_dates, fields=fields, adj=adj)
+        ts_codes = list(dict.fromkeys(ts_codes))
+        if trade_dates and bulk_loader.estimated_requests(trade_dates) == 0:
+            return bulk_loader.load_panel(trade_dates, fields=fields, adj=adj, ts_codes=ts_codes)
+        frames = self.get_daily_data_batch(ts_codes, start_date, end_date, adj=adj, fields=fields)
+        index = pd.DatetimeIndex(sorted(set().union(*(df.index for df in frames.values()))), name='trade_date')
+        panel: Dict[str, pd.DataFrame] = {}
+        for f in fields:
+            panel[f] = pd.DataFrame(
+                {c: frames[c][f] for c in ts_codes if c in frames}, index=index, columns=pd.Index(ts_codes), dtype='float64')
+        return panel
+
+    @cached_dataset('trade_dates', is_latest=lambda a: False)
+    @single_flight
+    def get_trade_dates(self, start_date: str, end_date: str, exchange: str = 'SSE') -> Tuple[str, ...]:
+        """返回 [start_date, end_date] 内的交易日 (YYYYMMDD, 升序)。"""
+        if not self.pro: return tuple()
+        try:
+            df = self.pro.trade_cal(exchange=exchange, start_date=start_date, end_date=end_date, is_open='1', fields='cal_date')
+            if df is None or df.empty:
+                return tuple()
+            return tuple(sorted(df['cal_date'].astype(str)))
+        except Exception as e:
+            print(f"Error fetching trade_cal from Tushare for {start_date}-{end_date}: {e}")
+            return tuple()
+
+    @single_flight
+    def get_daily_cross_section(self, trade_date: str) -> Optional[pd.DataFrame]:
+        """获取某个交易日全市场的未复权日线 (pro.daily 按 trade_date 查询，一次请求)。"""
         if not self.pro: return None
         try:
-            df = ts.pro_bar(ts_code=ts_code, adj=adj, start_date=start_date, end_date=end_date)
-            if df is not None and not df.empty:
-                if 'trade_date' in df.columns:
-                    df['trade_date'] = pd.to_datetime(df['trade_date']) # 转换为 datetime 对象
-                    df = df.set_index('trade_date').sort_index()
-                return df
+            return self.pro.daily(trade_date=trade_date)
+        except Exception as e:
+            print(f"Error fetching daily cross section for {trade_date}: {e}")
+            return None
+
+    @single_flight
+    def get_adj_factor_cross_section(self, trade_date: str) -> Optional[pd.DataFrame]:
+        """获取某个交易日全市场的复权因子。"""
+        if not self.pro: return None
+        try:
+            return self.pro.adj_factor(trade_date=trade_date)
+        except Exception as e:
+            print(f"Error fetching adj_factor cross section for {trade_date}: {e}")
             return None
+
+    @single_flight
+    def get_daily_basic_cross_section(self, trade_date: str) -> Optional[pd.DataFrame]:
+        """获取某个交易日全市场的每日指标（不走缓存，供 EOD 同步使用）。"""
+        if not self.pro: return None
+        try:
+            return self.pro.daily_basic(trade_date=trade_date, fields=DAILY_BASIC_FIELDS)
+        except Exception as e:
+            print(f"Error fetching daily_basic cross section for {trade_date}: {e}")
+            return None
+
+    @single_flight
+    def get_fina_indicator_for_period(self, period: str, fields: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """按报告期获取全市场财务指标 (fina_indicator_vip，一次请求)。"""
+        if not self.pro: return None
+        try:
+            return self.pro.fina_indicator_vip(period=period, fields=fields or FINA_INDICATOR_FIELDS)
         except Exception as e:
-            print(f"Error fetching daily data for {ts_code} from {start_date} to {end_date}: {e}")
+            print(f"Error fetching fina_indicator_vip for period {period}: {e}")
             return None
 
-    @lru_cache(maxsize=50) # 缓存财务数据
+    @cached_dataset('fina_indicator') # 缓存财务数据，新交易日发布后失效（可能有新公告）
+    @single_flight
     def get_financial_indicator(self, ts_code: str, period: Optional[str] = None, fields: Optional[str] = None) -> Optional[pd.DataFrame]:
         """
         获取单只股票的财务指标数据。
@@ -104,8 +249,7 @@ class TushareClient:
             # 接口默认按 end_date 降序返回，第一条通常是较新的 (但不一定是最新公告的)
             # 需要的字段：roe_yearly（年化ROE）, roe_waa（加权平均ROE）, q_roe（单季度ROE）等
             # 这里的 fields 可以根据需要调整
-            default_fields = 'ts_code,ann_date,end_date,roe,roe_yearly,roe_waa,q_roe,pb' # 同时获取pb
-            df = self.pro.fina_indicator(ts_code=ts_code, fields=fields or default_fields)
+            df = self.pro.fina_indicator(ts_code=ts_code, fields=fields or FINA_INDICATOR_FIELDS) # 默认字段同时获取pb
             if df is not None and not df.empty:
                 df = df.sort_values(by='end_date', ascending=False) # 按报告期倒序
             return df
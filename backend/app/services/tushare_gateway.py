@@ -0,0 +1,132 @@
+# --- START OF FILE backend/app/services/tushare_gateway.py ---
+"""
+Tushare 异步网关。
+
+TushareClient 的方法都是同步阻塞的网络调用，直接在 async 路由里调用会卡住整个事件循环。
+这里提供：
+- TokenBucket: 线程安全的令牌桶，按 Tushare 每分钟配额限流；
+- RateLimitedProApi: 包装 ts.pro_api()，每次底层接口调用先取令牌，失败时指数退避重试；
+- AsyncTushareGateway: 在有界线程池中执行 TushareClient 方法，提供可 await 的接口。
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """容量为 capacity、每秒补充 rate 个令牌的令牌桶。acquire 在令牌不足时阻塞当前线程。"""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, rate_per_minute / 10.0)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimitedProApi:
+    """ts.pro_api() 的代理：所有接口调用统一限流 + 失败重试。"""
+
+    def __init__(self, pro: Any, bucket: TokenBucket, max_retries: int = 3, backoff_seconds: float = 1.0):
+        self._pro = pro
+        self._bucket = bucket
+        self._max_retries = max_retries
+        self._backoff_seconds = backoff_seconds
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._pro, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            for attempt in range(self._max_retries + 1):
+                self._bucket.acquire()
+                try:
+                    return attr(*args, **kwargs)
+                except Exception as e:
+                    if attempt >= self._max_retries:
+                        raise
+                    delay = self._backoff_seconds * (2 ** attempt) * (1 + random.random() * 0.25)
+                    logger.warning(f"Tushare {name} failed ({e}), retry {attempt + 1}/{self._max_retries} in {delay:.1f}s")
+                    time.sleep(delay)
+        return call
+
+
+tushare_bucket = TokenBucket(settings.TUSHARE_RATE_LIMIT_PER_MINUTE)
+
+
+class AsyncTushareGateway:
+    def __init__(self, client=None, max_workers: Optional[int] = None):
+        self._client = client
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or settings.TUSHARE_MAX_WORKERS,
+                                            thread_name_prefix='tushare')
+
+    @property
+    def client(self):
+        # 延迟导入，避免与 tushare_client 的循环依赖
+        if self._client is None:
+            from app.services.tushare_client import ts_client
+            self._client = ts_client
+        return self._client
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """在网关线程池中执行任意同步函数。"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(*args, **kwargs))
+
+    async def get_stock_basic(self, list_status: str = 'L', fields: str = 'ts_code,symbol,name,area,industry,list_date,is_hs') -> Optional[pd.DataFrame]:
+        return await self.run(self.client.get_stock_basic, list_status=list_status, fields=fields)
+
+    async def get_daily_basic_for_date(self, trade_date: Optional[str] = None, ts_codes_tuple: Optional[Tuple[str, ...]] = None) -> Optional[pd.DataFrame]:
+        return await self.run(self.client.get_daily_basic_for_date, trade_date=trade_date, ts_codes_tuple=ts_codes_tuple)
+
+    async def get_daily_data(self, ts_code: str, start_date: str, end_date: str, adj: str = 'qfq') -> Optional[pd.DataFrame]:
+        return await self.run(self.client.get_daily_data, ts_code=ts_code, start_date=start_date, end_date=end_date, adj=adj)
+
+    async def get_daily_data_batch(self, ts_codes: Sequence[str], start_date: str, end_date: str,
+                                   adj: str = 'qfq', fields: Sequence[str] = ('close', 'vol')) -> Dict[str, pd.DataFrame]:
+        return await self.run(self.client.get_daily_data_batch, ts_codes, start_date, end_date, adj=adj, fields=fields)
+
+    async def get_daily_panel(self, ts_codes: Optional[Sequence[str]], start_date: str, end_date: str,
+                              adj: str = 'qfq', fields: Sequence[str] = ('close', 'vol')) -> Dict[str, pd.DataFrame]:
+        return await self.run(self.client.get_daily_panel, ts_codes, start_date, end_date, adj=adj, fields=fields)
+
+    async def get_financial_indicator(self, ts_code: str, period: Optional[str] = None, fields: Optional[str] = None) -> Optional[pd.DataFrame]:
+        return await self.run(self.client.get_financial_indicator, ts_code=ts_code, period=period, fields=fields)
+
+    async def get_trade_dates(self, start_date: str, end_date: str) -> Tuple[str, ...]:
+        return await self.run(self.client.get_trade_dates, start_date, end_date)
+
+    async def gather_daily_data(self, ts_codes: Sequence[str], start_date: str, end_date: str,
+                                adj: str = 'qfq') -> List[Optional[pd.DataFrame]]:
+        """并发获取多只股票的日线，并发度受线程池大小和令牌桶共同约束。"""
+        return await asyncio.gather(*(self.get_daily_data(c, start_date, end_date, adj) for c in ts_codes))
+
+
+ts_gateway = AsyncTushareGateway()
+# --- END OF FILE backend/app/services/tushare_gateway.py ---
@@ -0,0 +1,10 @@
+# --- START OF FILE backend/tests/conftest.py ---
+"""
+测试环境：在导入 app 之前切到合成数据后端和临时数据目录，测试不访问 Tushare、不写项目目录。
+"""
+import os
+import tempfile
+
+os.environ.setdefault('TUSHARE_BACKEND', 'synthetic')
+os.environ.setdefault('MARKET_DATA_DIR', tempfile.mkdtemp(prefix='nexusquant-test-'))
+# --- END OF FILE backend/tests/conftest.py ---
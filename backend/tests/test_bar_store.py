@@ -0,0 +1,101 @@
+# --- START OF FILE backend/tests/test_bar_store.py ---
+"""本地日线存储：读取时复权（前复权 close * f / f_last，后复权 close * f）、change / pct_chg 重算、覆盖区间合并。"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.bar_store import BarStore, merge_ranges, subtract_ranges
+from app.services.tushare_backends import SyntheticProApi
+
+START, END = '20230601', '20240630' # 跨年，两个年份分区
+INNER = ('20231115', '20240315')
+
+
+@pytest.fixture(scope='module')
+def market():
+    api = SyntheticProApi(n_tickers=300, start_date='20230101', seed=5)
+    factors = api.adj_factor(start_date=START, end_date=END)
+    inner = factors[(factors['trade_date'] >= INNER[0]) & (factors['trade_date'] <= INNER[1])]
+    changes = inner.groupby('ts_code')['adj_factor'].nunique()
+    ts_code = changes[changes > 1].index[0] # 两个窗口内都有分红除权（复权因子跳变）的股票
+    bars = api.daily(ts_code=ts_code, start_date=START, end_date=END)
+    return ts_code, bars, factors[factors['ts_code'] == ts_code]
+
+
+@pytest.fixture
+def store(tmp_path, market):
+    ts_code, bars, factors = market
+    store = BarStore(str(tmp_path))
+    store.write_bars(ts_code, bars)
+    store.write_adj_factors(ts_code, factors)
+    return store
+
+
+def _expected(bars: pd.DataFrame, factors: pd.DataFrame, start: str, end: str, adj: str) -> pd.DataFrame:
+    """按公式逐行计算：前复权除以区间内最后一个复权因子。"""
+    f = factors.set_index('trade_date')['adj_factor']
+    f = f[(f.index >= start) & (f.index <= end)].sort_index()
+    rows = bars[(bars['trade_date'] >= start) & (bars['trade_date'] <= end)].sort_values('trade_date')
+    scale = rows['trade_date'].map(f).to_numpy()
+    if adj == 'qfq':
+        scale = scale / f.iloc[-1]
+    out = pd.DataFrame({field: rows[field].to_numpy() * scale for field in ('open', 'high', 'low', 'close', 'pre_close')})
+    out['change'] = out['close'] - out['pre_close']
+    out['pct_chg'] = out['change'] / out['pre_close'] * 100
+    out.index = pd.to_datetime(rows['trade_date'].to_numpy(), format='%Y%m%d')
+    return out
+
+
+@pytest.mark.parametrize('adj', ['qfq', 'hfq'])
+@pytest.mark.parametrize('start, end', [(START, END), INNER])
+def test_adjusted_prices_match_formula(store, market, adj, start, end):
+    ts_code, bars, factors = market
+    df = store.read_bars(ts_code, start, end, adj=adj)
+    expected = _expected(bars, factors, start, end, adj)
+    window = factors[(factors['trade_date'] >= start) & (factors['trade_date'] <= end)]
+    assert window['adj_factor'].nunique() > 1 # 窗口内确有因子变化
+    assert df.index.equals(expected.index)
+    for field in expected.columns:
+        np.testing.assert_allclose(df[field].to_numpy(), expected[field].to_numpy(), rtol=1e-12, err_msg=field)
+    if adj == 'qfq': # 前复权：窗口最后一天等于未复权价
+        raw_last = bars[bars['trade_date'] <= end].sort_values('trade_date')['close'].iloc[-1]
+        assert df['close'].iloc[-1] == pytest.approx(raw_last)
+
+
+def test_unadjusted_read_returns_raw_bars(store, market):
+    ts_code, bars, _ = market
+    df = store.read_bars(ts_code, START, END)
+    raw = bars.sort_values('trade_date')
+    np.testing.assert_array_equal(df['close'].to_numpy(), raw['close'].to_numpy())
+    np.testing.assert_array_equal(df['pct_chg'].to_numpy(), raw['pct_chg'].to_numpy())
+    assert df.index.min() == pd.Timestamp(raw['trade_date'].iloc[0])
+
+
+def test_rewrite_same_day_replaces_row(store, market):
+    ts_code, bars, _ = market
+    day = bars.sort_values('trade_date').iloc[[5]].copy()
+    day['close'] = 123.45
+    store.write_bars(ts_code, day)
+    df = store.read_bars(ts_code, START, END)
+    assert len(df) == len(bars)
+    assert df.loc[pd.Timestamp(day['trade_date'].iloc[0]), 'close'] == 123.45
+
+
+def test_merge_and_subtract_ranges():
+    # 相邻（1 月 31 日与 2 月 1 日）与重叠的区间合并
+    assert merge_ranges([(20240201, 20240229), (20240101, 20240131), (20240220, 20240310)]) == [(20240101, 20240310)]
+    assert merge_ranges([(20240101, 20240110), (20240112, 20240120)]) == [(20240101, 20240110), (20240112, 20240120)]
+    assert subtract_ranges((20240101, 20240331), [(20240110, 20240131), (20240301, 20240315)]) == \
+        [(20240101, 20240109), (20240201, 20240229), (20240316, 20240331)]
+    assert subtract_ranges((20240101, 20240131), [(20231201, 20240215)]) == []
+
+
+def test_coverage_includes_market_ranges(tmp_path):
+    store = BarStore(str(tmp_path))
+    store.mark_covered('000001.SZ', 20240101, 20240131)
+    store.mark_covered('000001.SZ', 20240201, 20240215)
+    assert store.get_coverage('000001.SZ') == [(20240101, 20240215)]
+    store.mark_market_covered('20240301', '20240331')
+    assert store.missing_ranges('000001.SZ', '20240101', '20240410') == [(20240216, 20240229), (20240401, 20240410)]
+    assert store.missing_ranges('000002.SZ', '20240305', '20240320') == []
+# --- END OF FILE backend/tests/test_bar_store.py ---
@@ -0,0 +1,99 @@
+# --- START OF FILE backend/tests/test_data_cache.py ---
+"""按数据集 TTL 的内存缓存：“最新”类键在下一次发布时过期、新交易日发布时失效，按字节预算 LRU 淘汰。"""
+from datetime import datetime
+
+import pytest
+
+import app.services.data_cache as data_cache_module
+from app.services.data_cache import DATASET_TTLS, DatasetCache, cached_dataset, data_cache, estimate_size
+
+NOW = datetime(2025, 6, 30, 10, 0).timestamp()
+NEXT_PUBLISH = datetime(2025, 6, 30, 17, 0)
+
+
+class _Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock(NOW)
+    monkeypatch.setattr(data_cache_module, 'time', clock)
+    monkeypatch.setattr(data_cache_module, 'next_publish_time', lambda: NEXT_PUBLISH)
+    return clock
+
+
+def test_latest_keys_expire_at_next_publish(clock):
+    cache = DatasetCache(max_bytes=1 << 20)
+    cache.put('daily_basic', 'latest', 'snapshot', is_latest=True)
+    cache.put('daily_basic', '20250627', 'history', is_latest=False)
+
+    clock.now = NEXT_PUBLISH.timestamp() - 1
+    assert cache.get('daily_basic', 'latest') == (True, 'snapshot')
+    clock.now = NEXT_PUBLISH.timestamp()
+    assert cache.get('daily_basic', 'latest') == (False, None)
+    # 指定历史日期的键按数据集 TTL 过期，不受发布时间影响
+    assert cache.get('daily_basic', '20250627') == (True, 'history')
+    clock.now = NOW + DATASET_TTLS['daily_basic']
+    assert cache.get('daily_basic', '20250627') == (False, None)
+    assert cache.stats()['datasets']['daily_basic'] == {'hits': 2, 'misses': 2, 'entries': 0}
+
+
+def test_publish_trade_date_invalidates_only_on_new_date(clock):
+    cache = DatasetCache(max_bytes=1 << 20)
+    cache.put('stock_basic', 'latest', 'basic', is_latest=True)
+    cache.put('daily_basic', '20250627', 'history', is_latest=False)
+
+    cache.publish_trade_date('20250627') # 第一次观察到的交易日只记录，不失效
+    assert cache.get('stock_basic', 'latest')[0]
+    cache.publish_trade_date('20250627')
+    cache.publish_trade_date('20250626') # 更早的日期忽略
+    assert cache.get('stock_basic', 'latest')[0]
+    assert cache.latest_trade_date == '20250627'
+
+    cache.publish_trade_date('20250630')
+    assert cache.get('stock_basic', 'latest') == (False, None)
+    assert cache.get('daily_basic', '20250627') == (True, 'history') # 历史键不受影响
+    assert cache.latest_trade_date == '20250630'
+
+
+def test_lru_eviction_respects_byte_budget(clock):
+    value = b'x' * 1000
+    size = estimate_size(value)
+    cache = DatasetCache(max_bytes=3 * size)
+    for key in ('a', 'b', 'c'):
+        cache.put('daily_basic', key, value, is_latest=False)
+    assert cache.get('daily_basic', 'a')[0] # a 变为最近使用
+    cache.put('daily_basic', 'd', value, is_latest=False)
+
+    assert cache.get('daily_basic', 'b') == (False, None) # 最久未使用的 b 被淘汰
+    assert all(cache.get('daily_basic', k)[0] for k in ('a', 'c', 'd'))
+    assert cache.stats()['bytes'] == 3 * size <= cache.max_bytes
+
+    cache.put('daily_basic', 'huge', b'x' * (4 * size), is_latest=False) # 超过总预算的值不缓存
+    assert cache.get('daily_basic', 'huge') == (False, None)
+    assert cache.stats()['entries'] == 3
+
+
+def test_cached_dataset_normalizes_arguments_and_skips_none(clock):
+    class Client:
+        def __init__(self):
+            self.calls = 0
+
+        @cached_dataset('daily_basic', is_latest=lambda a: a['trade_date'] is None)
+        def get(self, trade_date=None, fields='close'):
+            self.calls += 1
+            return None if trade_date == 'bad' else (trade_date, fields)
+
+    data_cache.invalidate()
+    client = Client()
+    assert client.get('20250627') == client.get(trade_date='20250627', fields='close') == ('20250627', 'close')
+    assert client.calls == 1
+    assert client.get('bad') is None and client.get('bad') is None # 失败结果不缓存
+    assert client.calls == 3
+    data_cache.invalidate()
+# --- END OF FILE backend/tests/test_data_cache.py ---
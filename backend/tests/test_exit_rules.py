@@ -0,0 +1,99 @@
+# --- START OF FILE backend/tests/test_exit_rules.py ---
+"""向量化退出规则与原来逐只持仓的标量规则逐项一致（信号类型、目标价取整、备注文本）。"""
+from collections import namedtuple
+
+import numpy as np
+import pytest
+
+from app.services.exit_rules import HoldingBook, evaluate_exit_rules
+from app.services.price_snapshot import PriceSnapshot
+
+Holding = namedtuple('Holding', ['id', 'ts_code', 'cost_price', 'quantity'])
+TRIGGER_DATE = '2025-06-30'
+
+
+def _name_of(ts_code):
+    return f'名称{ts_code[:6]}'
+
+
+def _scalar_fixed_profit_loss(holding, current_price, params):
+    """原 check_exit_signals_for_holdings 中 fixed_profit_loss 的逐只实现，作为对照。"""
+    take_profit_percent = params.get("take_profit_percent", 20.0) / 100.0
+    stop_loss_percent = params.get("stop_loss_percent", -10.0) / 100.0
+    profit_target_price = holding.cost_price * (1 + take_profit_percent)
+    loss_target_price = holding.cost_price * (1 + stop_loss_percent)
+    if current_price >= profit_target_price:
+        return dict(signal_type="TAKE_PROFIT_FIXED", target_price=round(profit_target_price, 2),
+                    notes=f"达到固定止盈目标 ({params.get('take_profit_percent')}%)。成本价: {holding.cost_price:.2f}, 目标价: {profit_target_price:.2f}")
+    if current_price <= loss_target_price:
+        return dict(signal_type="STOP_LOSS_FIXED", target_price=round(loss_target_price, 2),
+                    notes=f"触发固定止损 ({params.get('stop_loss_percent')}%)。成本价: {holding.cost_price:.2f}, 止损价: {loss_target_price:.2f}")
+    return None
+
+
+def _book(n=500, seed=3):
+    rng = np.random.default_rng(seed)
+    holdings = [Holding(i + 1, f'{i:06d}.SZ', round(float(rng.uniform(2, 50)), 3), int(rng.integers(1, 50)) * 100)
+                for i in range(n)]
+    prices = {}
+    for h in holdings:
+        if h.id % 17 == 0: # 缺价：不在快照中
+            continue
+        prices[h.ts_code] = (round(h.cost_price * float(rng.uniform(0.7, 1.4)), 2), '20250630')
+    return holdings, PriceSnapshot(prices)
+
+
+@pytest.mark.parametrize('params', [
+    {'take_profit_percent': 20, 'stop_loss_percent': -10},
+    {'take_profit_percent': 7.5, 'stop_loss_percent': -3.3},
+    {},
+    {'take_profit_percent': -50, 'stop_loss_percent': 50}, # 止盈、止损同时满足：止盈优先
+])
+def test_masks_reproduce_scalar_rule(params):
+    holdings, snapshot = _book()
+    signals = evaluate_exit_rules('fixed_profit_loss', HoldingBook(holdings, snapshot), params, TRIGGER_DATE, _name_of)
+
+    expected = []
+    for h in holdings:
+        price, _ = snapshot.price_of(h.ts_code)
+        if price is None:
+            continue
+        hit = _scalar_fixed_profit_loss(h, price, params)
+        if hit:
+            expected.append(dict(holding_id=h.id, ts_code=h.ts_code, name=_name_of(h.ts_code),
+                                 trigger_date=TRIGGER_DATE, trigger_price=price, **hit))
+    assert [s.dict() for s in signals] == expected
+    assert expected # 每组参数都至少有信号
+
+
+def test_take_profit_wins_and_missing_price_is_skipped():
+    holdings = [Holding(1, '000001.SZ', 10.0, 100), Holding(2, '000002.SZ', 10.0, 100), Holding(3, '000003.SZ', 10.0, 100)]
+    snapshot = PriceSnapshot({'000001.SZ': (10.0, '20250630'), '000002.SZ': (8.0, '20250627')})
+    book = HoldingBook(holdings, snapshot)
+    assert book.priced.tolist() == [True, True, False]
+    assert book.latest_trade_date() == '20250630'
+
+    params = {'take_profit_percent': 0, 'stop_loss_percent': 0} # 价格等于成本时两条规则都触发
+    signals = evaluate_exit_rules('fixed_profit_loss', book, params, TRIGGER_DATE, _name_of)
+    assert [(s.holding_id, s.signal_type) for s in signals] == [(1, 'TAKE_PROFIT_FIXED'), (2, 'STOP_LOSS_FIXED')]
+    assert signals[0].notes == "达到固定止盈目标 (0%)。成本价: 10.00, 目标价: 10.00"
+    assert signals[1].notes == "触发固定止损 (0%)。成本价: 10.00, 止损价: 10.00"
+
+
+def test_target_price_rounding_and_notes():
+    holdings = [Holding(7, '600000.SH', 3.335, 100)]
+    params = {'take_profit_percent': 12.5, 'stop_loss_percent': -10}
+    signals = evaluate_exit_rules('fixed_profit_loss', HoldingBook(holdings, PriceSnapshot({'600000.SH': (3.9, '20250630')})),
+                                  params, TRIGGER_DATE, _name_of)
+    target = 3.335 * (1 + 0.125)
+    assert len(signals) == 1
+    assert signals[0].target_price == round(target, 2)
+    assert signals[0].trigger_price == 3.9
+    assert signals[0].notes == f"达到固定止盈目标 (12.5%)。成本价: 3.33, 目标价: {target:.2f}"
+
+
+def test_unknown_strategy_and_empty_book():
+    holdings, snapshot = _book(20)
+    assert evaluate_exit_rules('no_such_rule', HoldingBook(holdings, snapshot), {}, TRIGGER_DATE, _name_of) == []
+    assert evaluate_exit_rules('fixed_profit_loss', HoldingBook([], PriceSnapshot({})), {}, TRIGGER_DATE, _name_of) == []
+# --- END OF FILE backend/tests/test_exit_rules.py ---
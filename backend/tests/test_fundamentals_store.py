@@ -0,0 +1,158 @@
+# --- START OF FILE backend/tests/test_fundamentals_store.py ---
+"""时点财务表的 as-of 查询：不能看到 D 日之后的公告（无未来函数），每只股票取已知的最新一期。"""
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.fundamentals_store import FUNDAMENTAL_TABLE, FundamentalsStore, normalize_fina_frame, report_periods
+
+# 000001.SZ：一季报公告后又更正了两次（同一 end_date，不同 ann_date），半年报之后才发布第二次更正；
+# 000002.SZ：缺少 ann_date，按 end_date 视为公告日；600000.SH：首份报告在查询窗口中间才公告。
+ROWS = [
+    ('000001.SZ', '20250420', '20250331', 10.0, 1.5),
+    ('000001.SZ', '20250610', '20250331', 11.0, 1.4),
+    ('000001.SZ', '20250820', '20250630', 12.0, 1.3),
+    ('000001.SZ', '20250901', '20250331', 10.5, 1.4),
+    ('000002.SZ', None, '20250331', 8.0, 0.9),
+    ('000002.SZ', '20250828', '20250630', 9.0, 0.8),
+    ('600000.SH', '20250715', '20250630', 6.0, 0.6),
+]
+
+
+def _frame(rows=ROWS) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=['ts_code', 'ann_date', 'end_date', 'roe', 'pb'])
+
+
+def _brute_force(frame: pd.DataFrame, as_of: int) -> pd.DataFrame:
+    """逐只股票：ann_date <= as_of 的行中 end_date 最大、同 end_date 取 ann_date 最大的一行。"""
+    known = frame[frame['ann_date'] <= as_of]
+    return known.sort_values(['end_date', 'ann_date']).groupby('ts_code').tail(1).set_index('ts_code').sort_index()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = FundamentalsStore(root=str(tmp_path), client=object())
+    store.ingest(_frame())
+    return store
+
+
+@pytest.mark.parametrize('as_of, expected', [
+    ('20250330', {}),
+    ('20250331', {'000002.SZ': ('20250331', 8.0)}),
+    ('20250419', {'000002.SZ': ('20250331', 8.0)}),
+    ('20250420', {'000001.SZ': ('20250331', 10.0), '000002.SZ': ('20250331', 8.0)}),
+    ('20250609', {'000001.SZ': ('20250331', 10.0), '000002.SZ': ('20250331', 8.0)}),
+    ('20250610', {'000001.SZ': ('20250331', 11.0), '000002.SZ': ('20250331', 8.0)}),
+    ('20250715', {'000001.SZ': ('20250331', 11.0), '000002.SZ': ('20250331', 8.0), '600000.SH': ('20250630', 6.0)}),
+    ('20250820', {'000001.SZ': ('20250630', 12.0), '000002.SZ': ('20250331', 8.0), '600000.SH': ('20250630', 6.0)}),
+    # 一季报的更正晚于半年报公告：最新一期仍是半年报
+    ('20250905', {'000001.SZ': ('20250630', 12.0), '000002.SZ': ('20250630', 9.0), '600000.SH': ('20250630', 6.0)}),
+])
+def test_as_of_picks_latest_known_report(store, as_of, expected):
+    rows = store.as_of(as_of)
+    assert {code: (row['end_date'], row['roe']) for code, row in rows.iterrows()} == expected
+    assert (rows['ann_date'].astype(int) <= int(as_of)).all()
+
+
+def test_as_of_never_looks_ahead(store):
+    """逐日扫描：结果与暴力计算一致，且没有任何一行的 ann_date 晚于查询日。"""
+    frame = normalize_fina_frame(_frame())
+    for day in pd.date_range('2025-03-01', '2025-10-01').strftime('%Y%m%d'):
+        rows = store.as_of(day)
+        assert (rows['ann_date'].astype(int) <= int(day)).all()
+        expected = _brute_force(frame, int(day))
+        assert rows.index.tolist() == expected.index.tolist()
+        np.testing.assert_array_equal(rows['ann_date'].astype(int).to_numpy(), expected['ann_date'].to_numpy())
+        np.testing.assert_array_equal(rows['end_date'].astype(int).to_numpy(), expected['end_date'].to_numpy())
+        np.testing.assert_array_equal(rows['roe'].to_numpy(), expected['roe'].to_numpy())
+
+
+def test_restatement_reingest_and_reload(store, tmp_path):
+    """同键的新数据覆盖旧值；落盘后新实例读到同样的时点表。"""
+    store.ingest(_frame([('000001.SZ', '20250610', '20250331', 11.5, 1.4)]))
+    assert store.as_of('20250701').loc['000001.SZ', 'roe'] == 11.5
+    assert len(store.table()) == len(ROWS)
+
+    reloaded = FundamentalsStore(root=str(tmp_path), client=object())
+    pd.testing.assert_frame_equal(reloaded.as_of('20250905'), store.as_of('20250905'))
+
+
+def test_as_of_reindexes_requested_codes(store):
+    rows = store.as_of('20250420', ts_codes=['600000.SH', '000001.SZ', '999999.SZ'])
+    assert rows.index.tolist() == ['600000.SH', '000001.SZ', '999999.SZ']
+    assert rows['roe'].isna().tolist() == [True, False, True]
+
+
+class _PeriodClient:
+    """按报告期返回预先设定的 fina_indicator 批量结果，记录调用次数。"""
+
+    def __init__(self, pulls):
+        self.pulls = list(pulls)
+        self.calls = 0
+
+    def get_fina_indicator_for_period(self, period):
+        self.calls += 1
+        return self.pulls.pop(0) if self.pulls else None
+
+
+def _age_pull(store: FundamentalsStore, period: str, days: int = 7) -> None:
+    """把上一次拉取（内存记录与落盘的横截面）往前挪 days 天，模拟之后又发布过收盘数据。"""
+    past = (datetime.now() - timedelta(days=days)).timestamp()
+    store._fetched_at[period] = past
+    path = store.xsection_store._path(FUNDAMENTAL_TABLE, period)
+    os.utime(path, (past, past))
+
+
+def test_open_period_is_repulled_after_next_publish(tmp_path):
+    """公告窗口内的报告期：第一次拉到的是部分公司，过期后重新拉取，晚公告的公司出现在时点表中。"""
+    today = datetime.now().strftime('%Y%m%d')
+    period = report_periods((datetime.now() - timedelta(days=100)).strftime('%Y%m%d'), today)[-1]
+    early = pd.DataFrame([('000001.SZ', today, period, 10.0, 1.5)], columns=['ts_code', 'ann_date', 'end_date', 'roe', 'pb'])
+    late = pd.DataFrame([('000001.SZ', today, period, 10.0, 1.5), ('000002.SZ', today, period, 7.0, 0.9)],
+                        columns=['ts_code', 'ann_date', 'end_date', 'roe', 'pb'])
+    client = _PeriodClient([early, late])
+    store = FundamentalsStore(root=str(tmp_path), client=client)
+
+    assert store.ensure_periods([period]) == [period]
+    assert store.as_of(today).index.tolist() == ['000001.SZ']
+    assert store.ensure_periods([period]) == [period] # 下一次发布之前不重复拉取
+    assert client.calls == 1
+
+    _age_pull(store, period)
+    assert store.ensure_periods([period]) == [period]
+    assert client.calls == 2
+    assert store.as_of(today).index.tolist() == ['000001.SZ', '000002.SZ']
+
+    # 新进程：落盘的横截面仍在有效期内，直接读取，不再请求
+    restarted = FundamentalsStore(root=str(tmp_path), client=_PeriodClient([]))
+    assert restarted.ensure_periods([period]) == [period]
+    assert restarted.client.calls == 0
+    assert restarted.as_of(today).index.tolist() == ['000001.SZ', '000002.SZ']
+
+
+def test_expired_period_keeps_local_data_when_pull_is_empty(tmp_path):
+    today = datetime.now().strftime('%Y%m%d')
+    period = report_periods((datetime.now() - timedelta(days=100)).strftime('%Y%m%d'), today)[-1]
+    first = pd.DataFrame([('000001.SZ', today, period, 10.0, 1.5)], columns=['ts_code', 'ann_date', 'end_date', 'roe', 'pb'])
+    client = _PeriodClient([first])
+    store = FundamentalsStore(root=str(tmp_path), client=client)
+    store.ensure_periods([period])
+
+    _age_pull(store, period)
+    restarted = FundamentalsStore(root=str(tmp_path), client=client)
+    assert restarted.ensure_periods([period]) == [period]
+    assert client.calls == 2
+    assert restarted.as_of(today).index.tolist() == ['000001.SZ']
+
+
+def test_closed_period_is_never_repulled(tmp_path):
+    client = _PeriodClient([_frame([('000001.SZ', '20200428', '20200331', 10.0, 1.5)])])
+    store = FundamentalsStore(root=str(tmp_path), client=client)
+    assert store.ensure_periods(['20200331']) == ['20200331']
+    _age_pull(store, '20200331', days=400)
+    assert store.ensure_periods(['20200331']) == ['20200331']
+    assert client.calls == 1
+# --- END OF FILE backend/tests/test_fundamentals_store.py ---
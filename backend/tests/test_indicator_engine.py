@@ -0,0 +1,83 @@
+# --- START OF FILE backend/tests/test_indicator_engine.py ---
+"""indicator_engine 与 talib 的一致性，以及右对齐后与逐只计算（停牌日没有 K 线）的一致性。"""
+import numpy as np
+import pytest
+
+talib = pytest.importorskip('talib')
+
+from app.services.indicator_engine import align_right, rsi, sma, source_rows
+
+N_ROWS = 120
+
+
+def _panel() -> np.ndarray:
+    """5 只股票：0-1 连续交易，2 有若干停牌日，3 中途上市（开头为 NaN），4 全部停牌。"""
+    rng = np.random.default_rng(7)
+    values = 10.0 * np.exp(np.cumsum(rng.normal(0, 0.02, size=(N_ROWS, 5)), axis=0))
+    values[[5, 6, 7, 40, 41, 90], 2] = np.nan
+    values[:30, 3] = np.nan
+    values[:, 4] = np.nan
+    return values
+
+
+def _per_ticker(values: np.ndarray, compute) -> list:
+    """逐只计算：去掉停牌日后单独调用 compute。"""
+    return [compute(column[~np.isnan(column)]) for column in values.T]
+
+
+@pytest.mark.parametrize('period', [5, 14, 20])
+def test_sma_matches_talib(period):
+    values = _panel()
+    out = sma(values, period)
+    for j in (0, 1):
+        np.testing.assert_allclose(out[:, j], talib.SMA(values[:, j], period), rtol=1e-10, equal_nan=True)
+
+
+@pytest.mark.parametrize('period', [6, 14])
+def test_rsi_matches_talib(period):
+    values = _panel()
+    out = rsi(values, period)
+    for j in (0, 1, 3): # 3 开头为 NaN：与 talib 一样从第一个有效值开始
+        np.testing.assert_allclose(out[:, j], talib.RSI(values[:, j], period), rtol=1e-10, equal_nan=True)
+    assert np.isnan(out[:, 4]).all()
+
+
+def test_align_right_and_source_rows_match_per_ticker():
+    values = _panel()
+    aligned, counts, last_rows = align_right(values)
+    rows = source_rows(values)
+    for j, column in enumerate(values.T):
+        valid_rows = np.flatnonzero(~np.isnan(column))
+        n = len(valid_rows)
+        assert counts[j] == n
+        assert last_rows[j] == (valid_rows[-1] if n else -1)
+        np.testing.assert_array_equal(aligned[N_ROWS - n:, j], column[valid_rows])
+        assert np.isnan(aligned[:N_ROWS - n, j]).all()
+        np.testing.assert_array_equal(rows[N_ROWS - n:, j], valid_rows)
+        assert (rows[:N_ROWS - n, j] == -1).all()
+
+
+@pytest.mark.parametrize('compute, reference', [
+    (lambda v: sma(v, 10), lambda s: talib.SMA(s, 10)),
+    (lambda v: rsi(v, 14), lambda s: talib.RSI(s, 14)),
+])
+def test_indicators_on_aligned_panel_match_per_ticker(compute, reference):
+    """停牌的股票 2 在对齐空间里的指标与去掉停牌日后逐只计算的结果相同。"""
+    values = _panel()
+    aligned, counts, _ = align_right(values)
+    out = compute(aligned)
+    for j, expected in enumerate(_per_ticker(values, reference)):
+        if counts[j] == 0:
+            assert np.isnan(out[:, j]).all()
+            continue
+        np.testing.assert_allclose(out[N_ROWS - counts[j]:, j], expected, rtol=1e-10, equal_nan=True)
+
+
+def test_empty_panel():
+    values = np.empty((0, 3))
+    aligned, counts, last_rows = align_right(values)
+    assert aligned.shape == (0, 3)
+    assert counts.tolist() == [0, 0, 0]
+    assert last_rows.tolist() == [-1, -1, -1]
+    assert source_rows(values).shape == (0, 3)
+# --- END OF FILE backend/tests/test_indicator_engine.py ---
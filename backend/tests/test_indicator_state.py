@@ -0,0 +1,112 @@
+# --- START OF FILE backend/tests/test_indicator_state.py ---
+"""逐日喂入的增量指标状态与按完整前复权面板用 indicator_engine 重算的结果一致。"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.indicator_engine import align_right, rsi, sma
+from app.services.bulk_loader import CrossSectionStore
+from app.services.indicator_state import IndicatorState, IndicatorStateStore
+from app.services.trading_calendar import trading_calendar
+
+N_DAYS = 60
+CODES = np.array(['000001.SZ', '000002.SZ', '600000.SH'], dtype=object)
+DATES = pd.bdate_range('2025-01-02', periods=N_DAYS).strftime('%Y%m%d').tolist()
+
+
+def _market():
+    """(未复权收盘价, 复权因子)，date x ticker。股票 1 在第 55 天除权（价格下跳、因子上调，落在最后的均线窗口内），股票 2 有停牌日。"""
+    rng = np.random.default_rng(11)
+    closes = 10.0 * np.exp(np.cumsum(rng.normal(0, 0.02, size=(N_DAYS, len(CODES))), axis=0))
+    factors = np.ones((N_DAYS, len(CODES)))
+    closes[55:, 1] /= 1.25
+    factors[55:, 1] = 1.25
+    closes[[10, 11, 40], 2] = np.nan
+    return closes, factors
+
+
+def _feed(state: IndicatorState, closes: np.ndarray, factors: np.ndarray, days=range(N_DAYS)) -> None:
+    for day in days:
+        state.update(DATES[day], CODES, closes[day] * factors[day], factors[day])
+
+
+def _reference(compute, closes: np.ndarray, factors: np.ndarray) -> np.ndarray:
+    """前复权面板（以最新因子为基准）右对齐后计算，最后两行是每只股票的前一根 / 最新 K 线。"""
+    qfq = closes * factors / factors[-1]
+    return compute(align_right(qfq)[0])
+
+
+@pytest.mark.parametrize('kind, period, compute', [
+    ('rsi', 14, lambda v: rsi(v, 14)),
+    ('sma', 10, lambda v: sma(v, 10)), # 60 天喂入，环形缓冲区转了多圈
+    ('sma', 7, lambda v: sma(v, 7)),
+])
+def test_incremental_matches_full_panel(tmp_path, kind, period, compute):
+    closes, factors = _market()
+    state = IndicatorState(kind, 'close', period, str(tmp_path / f'{kind}_close_{period}.npy'))
+    _feed(state, closes, factors)
+
+    expected = _reference(compute, closes, factors)
+    snap = state.snapshot(list(CODES))
+    scale = snap['scale'].to_numpy() if kind == 'sma' else 1.0 # SMA 按后复权累计，除以最新因子即前复权
+    np.testing.assert_allclose(snap['value'].to_numpy() / scale, expected[-1], rtol=1e-9)
+    np.testing.assert_allclose(snap['prev_value'].to_numpy() / scale, expected[-2], rtol=1e-9)
+    assert snap['count'].tolist() == [N_DAYS, N_DAYS, N_DAYS - 3]
+    assert state.as_of == DATES[-1]
+
+
+@pytest.mark.parametrize('kind', ['rsi', 'sma'])
+def test_refeeding_same_day_is_noop(tmp_path, kind):
+    closes, factors = _market()
+    state = IndicatorState(kind, 'close', 10, str(tmp_path / 'state.npy'))
+    _feed(state, closes, factors)
+    before = {name: values.copy() for name, values in state.arrays.items()}
+
+    assert state.update(DATES[-1], CODES, closes[-1] * factors[-1] * 2.0, factors[-1]) == 0
+    assert state.update(DATES[-2], CODES, closes[-2] * factors[-2], factors[-2]) == 0
+    for name, values in state.arrays.items():
+        np.testing.assert_array_equal(values, before[name])
+
+
+def test_persisted_state_resumes(tmp_path):
+    """中途落盘再加载，继续喂入的结果与一次喂完相同。"""
+    closes, factors = _market()
+    path = str(tmp_path / 'sma_close_10.npy')
+    state = IndicatorState('sma', 'close', 10, path)
+    _feed(state, closes, factors, range(33))
+    state.save()
+    resumed = IndicatorState('sma', 'close', 10, path).load()
+    _feed(resumed, closes, factors, range(33, N_DAYS))
+
+    expected = _reference(lambda v: sma(v, 10), closes, factors)
+    snap = resumed.snapshot(list(CODES))
+    np.testing.assert_allclose(snap['value'].to_numpy() / snap['scale'].to_numpy(), expected[-1], rtol=1e-9)
+
+
+def _write_sections(xsection: CrossSectionStore, trade_dates) -> None:
+    closes, factors = _market()
+    for day, trade_date in enumerate(trade_dates):
+        xsection.write('daily', trade_date, pd.DataFrame({'ts_code': CODES, 'close': closes[day], 'vol': 1000.0}))
+        xsection.write('adj_factor', trade_date, pd.DataFrame({'ts_code': CODES, 'adj_factor': factors[day]}))
+
+
+def test_short_local_history_does_not_build_state(tmp_path):
+    """本地只同步了最近几天：不建立状态（返回 None，调用方改用面板），补齐历史后正常建立。"""
+    xsection = CrossSectionStore(str(tmp_path))
+    store = IndicatorStateStore(str(tmp_path), xsection)
+    as_of = trading_calendar.latest_trade_date()
+    needed = 10 + 10 # SMA(10) 的建立窗口：period + SMA_BOOTSTRAP_BUFFER
+    window = trading_calendar.window(as_of, needed)
+
+    _write_sections(xsection, window[-5:])
+    assert store.ensure_current('sma', 'close', 10, as_of) is None
+    assert store.tracked() == [] # 不完整的状态没有落盘
+
+    _write_sections(xsection, window)
+    assert store.ensure_current('sma', 'close', 10, as_of) is None # 同一交易日内不重复尝试
+    store._short_history.clear()
+    state = store.ensure_current('sma', 'close', 10, as_of)
+    assert state is not None and state.as_of == as_of
+    assert store.snapshot('sma', 'close', 10, list(CODES))['count'].tolist() == [needed, needed, needed - 2] # 股票 2 第 11、12 天停牌
+    assert store.tracked() == [('sma', 'close', 10)]
+# --- END OF FILE backend/tests/test_indicator_state.py ---
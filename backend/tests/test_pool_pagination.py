@@ -0,0 +1,67 @@
+# --- START OF FILE backend/tests/test_pool_pagination.py ---
+"""选股结果分页：空值排序、游标翻页、过期与损坏游标。"""
+import base64
+import json
+
+import pytest
+
+from app.models.strategy import SelectedPoolItem
+from app.services.pool_pagination import InvalidCursorError, decode_cursor, encode_cursor, paginate, sort_pool_items
+
+SNAPSHOT = 'a1b2c3d4e5f60718' + '0' * 48
+
+
+def _items():
+    roes = [0.12, None, 0.30, 0.05, None, 0.30, 0.20]
+    return [SelectedPoolItem(ts_code=f'00000{i}.SZ', name=f'S{i}', roe=roe, composite_score=len(roes) - i)
+            for i, roe in enumerate(roes)]
+
+
+def _codes(items):
+    return [item.ts_code for item in items]
+
+
+@pytest.mark.parametrize('sort_order, expected', [
+    ('desc', ['000002.SZ', '000005.SZ', '000006.SZ', '000000.SZ', '000003.SZ', '000001.SZ', '000004.SZ']),
+    ('asc', ['000003.SZ', '000000.SZ', '000006.SZ', '000002.SZ', '000005.SZ', '000001.SZ', '000004.SZ']),
+])
+def test_null_sort_keys_go_last_in_both_orders(sort_order, expected):
+    assert _codes(sort_pool_items(_items(), 'roe', sort_order)) == expected # 同值保持排名顺序
+
+
+def test_pages_cover_all_items_and_last_page_has_no_cursor():
+    items = _items()
+    seen, cursor, pages = [], None, 0
+    page, cursor = paginate(SNAPSHOT, items, 'roe', 'asc', limit=3)
+    while True:
+        seen += _codes(page)
+        pages += 1
+        if cursor is None:
+            break
+        page, cursor = paginate(SNAPSHOT, items, cursor=cursor, limit=3) # 排序键与方向取自游标
+    assert pages == 3
+    assert seen == _codes(sort_pool_items(items, 'roe', 'asc'))
+
+    page, cursor = paginate(SNAPSHOT, items, limit=len(items))
+    assert _codes(page) == _codes(items) and cursor is None
+    page, cursor = paginate(SNAPSHOT, items, limit=None)
+    assert len(page) == len(items) and cursor is None
+
+
+def test_stale_cursor_is_rejected():
+    _, cursor = paginate(SNAPSHOT, _items(), limit=2)
+    with pytest.raises(InvalidCursorError, match='stale'):
+        paginate('f' * 64, _items(), cursor=cursor, limit=2)
+
+
+@pytest.mark.parametrize('cursor', [
+    'not-a-cursor!!',
+    base64.urlsafe_b64encode(b'{"k":"x"').decode('ascii'),
+    base64.urlsafe_b64encode(json.dumps({'k': SNAPSHOT[:16], 's': None}).encode()).decode('ascii'),
+    encode_cursor(SNAPSHOT, None, 'desc', -1),
+])
+def test_garbled_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursorError, match='Malformed'):
+        decode_cursor(cursor, SNAPSHOT)
+    assert issubclass(InvalidCursorError, ValueError)
+# --- END OF FILE backend/tests/test_pool_pagination.py ---
@@ -0,0 +1,62 @@
+# --- START OF FILE backend/tests/test_selection_cache.py ---
+"""选股结果缓存：参数归一化后的缓存键、LRU 淘汰，以及磁盘持久化与失效。"""
+import os
+
+from app.models.strategy import SelectedPoolItem
+from app.services.selection_cache import SelectionResultCache, normalize_params, selection_cache_key
+
+DEFAULTS = {'roe_min': 0.1, 'top_n': 30, 'momentum_months': 6}
+
+
+def _items(n: int = 3):
+    return [SelectedPoolItem(ts_code=f'00000{i}.SZ', name=f'S{i}', roe=0.1 * i, composite_score=n - i) for i in range(n)]
+
+
+def test_integral_floats_and_int_produce_the_same_key():
+    a = normalize_params({'momentum_months': 6, 'top_n': 30.0}, DEFAULTS)
+    b = normalize_params({'top_n': 30, 'momentum_months': 6.0}, DEFAULTS)
+    assert a == b
+    assert selection_cache_key('value_momentum', a, '20250627', 'v1') == selection_cache_key('value_momentum', b, '20250627', 'v1')
+    c = normalize_params({'momentum_months': 6.5}, DEFAULTS)
+    assert selection_cache_key('value_momentum', c, '20250627', 'v1') != selection_cache_key('value_momentum', a, '20250627', 'v1')
+
+
+def test_none_param_falls_back_to_default():
+    assert normalize_params({'top_n': None, 'roe_min': 0.15}, DEFAULTS) == {'momentum_months': 6, 'roe_min': 0.15, 'top_n': 30}
+    assert normalize_params({'top_n': None}, DEFAULTS) == normalize_params(None, DEFAULTS)
+
+
+def test_key_changes_with_trade_date_version_and_strategy():
+    params = normalize_params({}, DEFAULTS)
+    base = selection_cache_key('value_momentum', params, '20250627', 'v1')
+    assert base != selection_cache_key('value_momentum', params, '20250630', 'v1')
+    assert base != selection_cache_key('value_momentum', params, '20250627', 'v2')
+    assert base != selection_cache_key('low_pb', params, '20250627', 'v1')
+
+
+def test_lru_keeps_max_entries():
+    cache = SelectionResultCache(max_entries=2)
+    for key in ('a', 'b'):
+        cache.put(key, 'value_momentum', {}, '20250627', _items())
+    assert cache.get('a') is not None # a 变为最近使用
+    cache.put('c', 'value_momentum', {}, '20250627', _items())
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.stats()['entries'] == 2
+
+
+def test_persisted_results_survive_restart_and_invalidate_removes_files(tmp_path):
+    directory = str(tmp_path / 'selection_cache')
+    params = normalize_params({}, DEFAULTS)
+    key = selection_cache_key('value_momentum', params, '20250627', 'v1')
+    SelectionResultCache(max_entries=4, directory=directory).put(key, 'value_momentum', params, '20250627', _items())
+    assert os.listdir(directory) == [f'{key}.json']
+
+    restarted = SelectionResultCache(max_entries=4, directory=directory)
+    assert restarted.get(key) == _items() # 内存为空，从磁盘命中
+
+    restarted.invalidate()
+    assert [name for name in os.listdir(directory) if name.endswith('.json')] == []
+    assert restarted.get(key) is None
+    assert SelectionResultCache(max_entries=4, directory=directory).get(key) is None
+# --- END OF FILE backend/tests/test_selection_cache.py ---
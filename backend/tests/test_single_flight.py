@@ -0,0 +1,90 @@
+# --- START OF FILE backend/tests/test_single_flight.py ---
+"""Single-flight：相同键的并发调用只执行一次，结果与异常都传给等待的调用方。"""
+import threading
+import time
+
+import pytest
+
+from app.services.single_flight import SingleFlight, single_flight
+
+N_FOLLOWERS = 7
+
+
+def _run_concurrently(flight: SingleFlight, key, fn):
+    """先让 leader 进入 fn，再启动 followers，等它们都挂到同一个调用上之后放行 fn。"""
+    entered, release = threading.Event(), threading.Event()
+    results, errors = [], []
+
+    def blocking():
+        entered.set()
+        release.wait(5)
+        return fn()
+
+    def call(target):
+        try:
+            results.append(flight.do(key, target))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call, args=(blocking,))]
+    threads[0].start()
+    assert entered.wait(5)
+    threads += [threading.Thread(target=call, args=(fn,)) for _ in range(N_FOLLOWERS)]
+    for t in threads[1:]:
+        t.start()
+    deadline = time.time() + 5
+    while flight.shared_count < N_FOLLOWERS and time.time() < deadline:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join(5)
+    return results, errors
+
+
+def test_concurrent_identical_calls_run_once():
+    flight = SingleFlight()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return object()
+
+    results, errors = _run_concurrently(flight, ('daily', '000001.SZ'), fn)
+    assert not errors
+    assert len(calls) == 1
+    assert len(results) == N_FOLLOWERS + 1
+    assert all(r is results[0] for r in results) # 共享同一个结果对象
+    assert flight.shared_count == N_FOLLOWERS
+    assert flight.do(('daily', '000001.SZ'), lambda: 'again') == 'again' # 完成后不缓存，下一次重新执行
+
+
+def test_leader_exception_reaches_followers():
+    flight = SingleFlight()
+
+    def fn():
+        raise RuntimeError('quota exceeded')
+
+    results, errors = _run_concurrently(flight, 'k', fn)
+    assert results == []
+    assert len(errors) == N_FOLLOWERS + 1
+    assert all(isinstance(e, RuntimeError) and str(e) == 'quota exceeded' for e in errors)
+    assert flight.do('k', lambda: 1) == 1 # 失败的调用不会卡住后续请求
+
+
+def test_decorator_keys_by_instance_and_arguments():
+    class Client:
+        def __init__(self):
+            self.calls = []
+
+        @single_flight
+        def fetch(self, trade_date, fields=None):
+            self.calls.append((trade_date, fields))
+            return trade_date
+
+    a, b = Client(), Client()
+    assert a.fetch('20250102') == '20250102'
+    assert a.fetch('20250103', fields='close') == '20250103'
+    assert b.fetch('20250102') == '20250102'
+    assert a.calls == [('20250102', None), ('20250103', 'close')]
+    assert b.calls == [('20250102', None)]
+# --- END OF FILE backend/tests/test_single_flight.py ---
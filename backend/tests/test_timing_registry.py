@@ -0,0 +1,45 @@
+# --- START OF FILE backend/tests/test_timing_registry.py ---
+"""择时策略注册表：接口不完整的策略在注册时失败，已注册策略实现了全部接口。"""
+import pytest
+
+from app.services.timing_registry import (
+    TIMING_STRATEGIES, MaCross, TimingStrategy, get_timing_strategy, register_timing_strategy,
+)
+
+
+def test_incomplete_strategy_fails_at_registration():
+    class MissingKernel(TimingStrategy):
+        id = 'missing_kernel'
+
+        def parse_params(self, params):
+            return {}
+
+        def fields(self, p):
+            return ('close',)
+
+        def lookback(self, p):
+            return 1
+
+        def indicators(self, p):
+            return []
+
+        def min_bars(self, p):
+            return 1
+
+        def describe(self, signal_type, point, p, industry):
+            return None, {}, ''
+
+    with pytest.raises(TypeError, match='kernel'):
+        register_timing_strategy(MissingKernel())
+    assert 'missing_kernel' not in TIMING_STRATEGIES
+
+
+def test_registered_strategies_resolve_by_id_and_alias():
+    assert isinstance(get_timing_strategy('ma_golden_cross'), MaCross)
+    for strategy in set(TIMING_STRATEGIES.values()):
+        p = strategy.parse_params({})
+        assert 'close' in strategy.fields(p)
+        assert strategy.lookback(p) >= strategy.min_bars(p)
+    with pytest.raises(ValueError):
+        get_timing_strategy('no_such_strategy')
+# --- END OF FILE backend/tests/test_timing_registry.py ---